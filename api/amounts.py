@@ -0,0 +1,49 @@
+"""
+Exact token amounts. Invoices store `amount_minor`, the amount as an integer
+number of minor units (AMOUNT_DECIMALS places, as used by Tempo's USD
+stablecoins), so the database can sum it exactly; the `amount` text column
+keeps the canonical decimal rendering that the API returns.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+AMOUNT_DECIMALS = 6
+SCALE = 10 ** AMOUNT_DECIMALS
+# Largest amount accepted: well inside BIGINT, with room for the per-day
+# totals in wallet_summaries to add thousands of them up
+MAX_AMOUNT = 10 ** 9
+MAX_MINOR = MAX_AMOUNT * SCALE
+
+
+def to_minor(value) -> int:
+    """Exact conversion of a decimal amount; ValueError if it doesn't fit AMOUNT_DECIMALS places."""
+    try:
+        amount = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError("invalid amount")
+    if not amount.is_finite():
+        raise ValueError("invalid amount")
+    minor = amount * SCALE
+    if minor != minor.to_integral_value():
+        raise ValueError(f"amount has more than {AMOUNT_DECIMALS} decimal places")
+    if abs(minor) > MAX_MINOR:
+        raise ValueError(f"amount must be at most {MAX_AMOUNT}")
+    return int(minor)
+
+
+def parse_legacy(text) -> int:
+    """Best-effort conversion of a stored TEXT amount (rounded, 0 if unparseable)."""
+    try:
+        amount = Decimal(str(text).strip())
+    except InvalidOperation:
+        return 0
+    if not amount.is_finite():
+        return 0
+    return int((amount * SCALE).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def format_minor(minor: int) -> str:
+    """Canonical decimal string: no exponent, no trailing zeros ("12.5", "10")."""
+    sign = "-" if minor < 0 else ""
+    whole, frac = divmod(abs(int(minor)), SCALE)
+    frac_text = f"{frac:0{AMOUNT_DECIMALS}d}".rstrip("0")
+    return f"{sign}{whole}.{frac_text}" if frac_text else f"{sign}{whole}"
@@ -0,0 +1,59 @@
+"""
+Invoice archiving.
+
+Pending invoices are what payment pages poll; paid and expired ones stop
+changing but would otherwise stay in the same table and indexes forever. With
+ARCHIVE_AFTER_DAYS set, PAID / EXPIRED invoices created longer ago than that
+move to `invoices_archive` in bounded batches, each in its own short
+transaction. Reads (GET /invoices/{id}, listings, export, search) go over
+both tables (repository.from_invoices), so archived invoices look the same to
+clients; a hot lookup by id never touches the archive.
+
+The archiver runs in-process every ARCHIVE_INTERVAL seconds (started from the
+app lifespan), or as a one-shot for cron / serverless deployments:
+
+    python archive.py [--days N]
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from starlette.concurrency import run_in_threadpool
+
+from config import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE
+from database import get_db, get_cursor, utc_timestamp
+import repository
+
+
+def archive_settled(days: float = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Archive every settled invoice older than `days`, batch_size per transaction. Returns the count."""
+    before = utc_timestamp(datetime.utcnow() - timedelta(days=days))
+    total = 0
+    while True:
+        with get_db() as conn:
+            moved = repository.archive_invoices(get_cursor(conn), before, batch_size)
+            conn.commit()
+        total += moved
+        if moved < batch_size:
+            return total
+
+
+async def run_archiver(interval: float):
+    """Archive every `interval` seconds until cancelled."""
+    while True:
+        try:
+            archived = await run_in_threadpool(archive_settled)
+            if archived:
+                print(f"Archived {archived} invoice(s)")
+        except Exception as e:
+            print(f"ERROR: invoice archiving failed: {e}")
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old PAID / EXPIRED invoices to invoices_archive.")
+    parser.add_argument("--days", type=float, default=ARCHIVE_AFTER_DAYS, help="archive invoices created more than this many days ago")
+    args = parser.parse_args()
+    if args.days <= 0:
+        parser.error("set ARCHIVE_AFTER_DAYS or pass --days")
+    print(f"Archived {archive_settled(args.days)} invoice(s)")
@@ -0,0 +1,239 @@
+"""
+Async data access for the `async def` endpoints in async_routes.
+Postgres goes through an asyncpg pool, local mode through a small pool of
+aiosqlite connections. Both drivers are imported lazily so the sync
+deployment does not need them installed.
+"""
+import asyncio
+import itertools
+import re
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from config import (
+    DB_PATH,
+    DATABASE_URL,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_MAX_USES,
+    DB_POOL_TIMEOUT,
+    DB_POOL_HEALTHCHECK_IDLE,
+)
+from database import postgres_dsn
+from metrics import add_timing, observe_query, timed
+
+_PG_PARAM_RE = re.compile(r"%s")
+
+
+def _to_dollar_params(sql: str) -> str:
+    """Rewrite psycopg2-style %s placeholders as asyncpg's $1, $2, ..."""
+    counter = itertools.count(1)
+    return _PG_PARAM_RE.sub(lambda _: f"${next(counter)}", sql)
+
+
+class AsyncConnection:
+    """
+    Driver-neutral facade used by the async endpoints. SQL is written with
+    get_placeholder() exactly like the sync routes.
+    """
+
+    def __init__(self, conn, is_pg: bool):
+        self.raw = conn
+        self.is_pg = is_pg
+
+    async def fetchone(self, sql: str, params: tuple = ()):
+        start = time.perf_counter()
+        try:
+            if self.is_pg:
+                return await self.raw.fetchrow(_to_dollar_params(sql), *params)
+            async with self.raw.execute(sql, params) as cursor:
+                return await cursor.fetchone()
+        finally:
+            observe_query(sql, time.perf_counter() - start)
+
+    async def fetchall(self, sql: str, params: tuple = ()) -> list:
+        start = time.perf_counter()
+        try:
+            if self.is_pg:
+                return await self.raw.fetch(_to_dollar_params(sql), *params)
+            async with self.raw.execute(sql, params) as cursor:
+                return await cursor.fetchall()
+        finally:
+            observe_query(sql, time.perf_counter() - start)
+
+    async def execute(self, sql: str, params: tuple = ()):
+        start = time.perf_counter()
+        try:
+            if self.is_pg:
+                await self.raw.execute(_to_dollar_params(sql), *params)
+            else:
+                await self.raw.execute(sql, params)
+        finally:
+            observe_query(sql, time.perf_counter() - start)
+
+    async def iterate(self, sql: str, params: tuple = (), batch_size: int = 500):
+        """Yield lists of rows from a server-side cursor without loading the full result."""
+        if self.is_pg:
+            cursor = self.raw.cursor(_to_dollar_params(sql), *params, prefetch=batch_size)
+            batch = []
+            async for row in cursor:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+            return
+        async with self.raw.execute(sql, params) as cursor:
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+
+class AsyncSQLitePool:
+    """Bounded pool of aiosqlite connections (each runs on its own thread), in WAL mode."""
+
+    def __init__(self, path: str, max_size: int, max_uses: int):
+        self.path = path
+        self.max_size = max(1, max_size)
+        self.max_uses = max_uses
+        self._idle: asyncio.LifoQueue = asyncio.LifoQueue()
+        self._slots = asyncio.Semaphore(self.max_size)
+        self._uses: dict = {}
+        self._stats = {"created": 0, "reused": 0, "recycled": 0, "timeouts": 0}
+
+    async def _connect(self):
+        import aiosqlite
+
+        conn = await aiosqlite.connect(self.path, timeout=DB_POOL_TIMEOUT)
+        conn.row_factory = sqlite3.Row
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        self._stats["created"] += 1
+        return conn
+
+    async def acquire(self):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=DB_POOL_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            raise RuntimeError("database pool exhausted")
+        try:
+            if self._idle.empty():
+                conn = await self._connect()
+                self._uses[conn] = 0
+            else:
+                conn = self._idle.get_nowait()
+                self._stats["reused"] += 1
+        except Exception:
+            self._slots.release()
+            raise
+        self._uses[conn] += 1
+        return conn
+
+    async def release(self, conn, broken: bool = False):
+        try:
+            if broken or self._uses[conn] >= self.max_uses:
+                self._uses.pop(conn, None)
+                self._stats["recycled"] += 1
+                await conn.close()
+            else:
+                if conn.in_transaction:
+                    await conn.rollback()
+                self._idle.put_nowait(conn)
+        finally:
+            self._slots.release()
+
+    async def close(self):
+        while not self._idle.empty():
+            await self._idle.get_nowait().close()
+        self._uses.clear()
+
+    def stats(self) -> dict:
+        return {
+            "backend": "aiosqlite",
+            "max_size": self.max_size,
+            "max_uses": self.max_uses,
+            "open": len(self._uses),
+            "idle": self._idle.qsize(),
+            **self._stats,
+        }
+
+
+_pool = None
+_pool_lock = None
+
+
+async def get_async_pool():
+    global _pool, _pool_lock
+    if _pool is not None:
+        return _pool
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+    async with _pool_lock:
+        if _pool is None:
+            if DATABASE_URL:
+                import asyncpg
+
+                _pool = await asyncpg.create_pool(
+                    postgres_dsn(),
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    max_queries=DB_POOL_MAX_USES,
+                    max_inactive_connection_lifetime=DB_POOL_HEALTHCHECK_IDLE,
+                    timeout=DB_POOL_TIMEOUT,
+                )
+            else:
+                _pool = AsyncSQLitePool(DB_PATH, DB_POOL_MAX_SIZE, DB_POOL_MAX_USES)
+    return _pool
+
+
+def async_pool_stats() -> dict:
+    if _pool is None:
+        return {}
+    if isinstance(_pool, AsyncSQLitePool):
+        return _pool.stats()
+    return {
+        "backend": "asyncpg",
+        "min_size": _pool.get_min_size(),
+        "max_size": _pool.get_max_size(),
+        "open": _pool.get_size(),
+        "idle": _pool.get_idle_size(),
+    }
+
+
+async def close_async_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+@asynccontextmanager
+async def get_async_db():
+    """
+    Yield an AsyncConnection wrapped in a transaction: committed when the
+    block exits cleanly, rolled back if it raises.
+    """
+    pool = await get_async_pool()
+    start = time.perf_counter()
+    if DATABASE_URL:
+        async with pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+            add_timing("db-connect", time.perf_counter() - start)
+            async with conn.transaction():
+                yield AsyncConnection(conn, is_pg=True)
+        return
+
+    with timed("db-connect"):
+        conn = await pool.acquire()
+    broken = False
+    try:
+        yield AsyncConnection(conn, is_pg=False)
+        await conn.commit()
+    except sqlite3.OperationalError:
+        broken = True
+        raise
+    finally:
+        await pool.release(conn, broken=broken)
@@ -0,0 +1,253 @@
+"""
+`async def` versions of the invoice and contact endpoints, served from the
+async data layer when DB_ASYNC=true. Validation and query building are
+shared with routes.py; only the database calls differ.
+"""
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+import repository
+import search
+from async_database import get_async_db
+from database import row_to_dict, contact_to_dict
+from middleware import normalize_address
+from notifier import notifier
+from cache import invoice_cache, MISS
+from coalescer import write_coalescer
+from config import WRITE_COALESCE
+from models import CreateInvoiceRequest, MarkPaidRequest, CreateContactRequest, ResolveContactsRequest
+from serializers import (
+    FastJSONResponse,
+    invoice_from_row,
+    contact_from_row,
+    json_array_chunk,
+    ndjson_chunk,
+)
+from routes import (
+    MAX_PAGE_SIZE,
+    STREAM_BATCH_SIZE,
+    STREAM_FORMATS,
+    make_etag,
+    not_modified,
+    set_cache_headers,
+    invoice_entry,
+    cached_invoice_response,
+    invoice_list_query,
+    invoice_page,
+    contact_list_query,
+    contact_page,
+    search_params,
+    search_page,
+    new_invoice_params,
+    mark_paid_params,
+    paid_invoice,
+    lookup_query,
+    resolve_query,
+    resolve_result,
+    resolve_wallet,
+    new_contact_params,
+)
+
+router = APIRouter()
+
+
+async def cache_call(fn, *args):
+    """Call an invoice_cache method without blocking the event loop on a network backend."""
+    if invoice_cache.is_blocking:
+        return await run_in_threadpool(fn, *args)
+    return fn(*args)
+
+
+def astream_rows(sql: str, params: tuple, from_row, fmt: str) -> StreamingResponse:
+    """Async counterpart of routes.stream_rows."""
+    if fmt not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be json or ndjson")
+
+    async def generate():
+        async with get_async_db() as db:
+            first = True
+            if fmt == "json":
+                yield b"["
+            async for rows in db.iterate(sql, params, STREAM_BATCH_SIZE):
+                items = [from_row(r) for r in rows]
+                yield json_array_chunk(items, first) if fmt == "json" else ndjson_chunk(items)
+                first = False
+            if fmt == "json":
+                yield b"]"
+
+    media_type = "application/json" if fmt == "json" else "application/x-ndjson"
+    return StreamingResponse(generate(), media_type=media_type)
+
+
+# ── invoices ──────────────────────────────────────────────
+
+@router.post("/invoices", status_code=201)
+async def create_invoice(req: CreateInvoiceRequest, request: Request):
+    params = new_invoice_params(req)
+    if WRITE_COALESCE:
+        row = await write_coalescer.arun(repository.insert_invoice, params)
+    else:
+        async with get_async_db() as db:
+            row = await repository.ainsert_invoice(db, params)
+    await cache_call(notifier.publish, params[0])
+    return row_to_dict(row)
+
+
+@router.get("/invoices")
+async def list_invoices(
+    request: Request,
+    wallet: str = "",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = "",
+    format: str = "json",
+):
+    sql, params, page_size = invoice_list_query(wallet, limit, cursor)
+    scope = repository.invoice_list_scope(normalize_address(wallet))
+    async with get_async_db() as db:
+        etag = make_etag(scope, await repository.aget_version(db, scope), limit, cursor, format)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        if page_size is not None:
+            rows = await db.fetchall(sql, params)
+
+    if page_size is None:
+        return set_cache_headers(astream_rows(sql, params, invoice_from_row, format), etag)
+    return set_cache_headers(FastJSONResponse(invoice_page(rows, page_size)), etag)
+
+
+@router.get("/invoices/search")
+async def search_invoices(
+    wallet: str = "",
+    q: str = "",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = "",
+):
+    wallet, terms, page_size, offset = search_params(wallet, q, limit, cursor)
+    sql, params = search.invoice_search_query(wallet, terms, page_size + 1, offset)
+    async with get_async_db() as db:
+        rows = await db.fetchall(sql, params)
+    return FastJSONResponse(search_page(rows, page_size, offset, invoice_from_row))
+
+
+@router.get("/invoices/{invoice_id}")
+async def get_invoice(invoice_id: str, request: Request):
+    entry = await cache_call(invoice_cache.get, invoice_id)
+    if entry is not MISS:
+        return cached_invoice_response(request, entry)
+
+    token = await cache_call(invoice_cache.token, invoice_id)
+    async with get_async_db() as db:
+        row = await db.fetchone(repository.SELECT_INVOICE_VERSIONED, repository.invoice_params(f"invoice:{invoice_id}", invoice_id))
+    entry, max_ttl = invoice_entry(invoice_id, row)
+    await cache_call(invoice_cache.set, invoice_id, entry, token, max_ttl)
+    return cached_invoice_response(request, entry)
+
+
+@router.delete("/invoices/{invoice_id}", status_code=204)
+async def delete_invoice(invoice_id: str, request: Request):
+    async with get_async_db() as db:
+        outcome = await repository.adelete_invoice(db, invoice_id, request.state.wallet)
+    if outcome == repository.NOT_FOUND:
+        raise HTTPException(status_code=404, detail="invoice not found")
+    if outcome == repository.FORBIDDEN:
+        raise HTTPException(status_code=403, detail="not your invoice")
+    await cache_call(notifier.publish, invoice_id)
+    return None
+
+
+@router.post("/invoices/{invoice_id}/pay")
+async def mark_paid(invoice_id: str, req: MarkPaidRequest, request: Request):
+    params = mark_paid_params(invoice_id, req)
+    if WRITE_COALESCE:
+        row = await write_coalescer.arun(repository.mark_invoice_paid, params)
+    else:
+        async with get_async_db() as db:
+            row = await repository.amark_invoice_paid(db, params)
+    invoice = paid_invoice(row, req)
+    await cache_call(notifier.publish, invoice_id)
+    return invoice
+
+
+# ── contacts ──────────────────────────────────────────────
+
+@router.get("/contacts")
+async def list_contacts(
+    request: Request,
+    wallet: str = "",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = "",
+    format: str = "json",
+):
+    sql, params, page_size = contact_list_query(wallet, limit, cursor)
+    scope = repository.contact_list_scope(normalize_address(wallet))
+    async with get_async_db() as db:
+        etag = make_etag(scope, await repository.aget_version(db, scope), limit, cursor, format)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        if page_size is not None:
+            rows = await db.fetchall(sql, params)
+
+    if page_size is None:
+        return set_cache_headers(astream_rows(sql, params, contact_from_row, format), etag)
+    return set_cache_headers(FastJSONResponse(contact_page(rows, page_size)), etag)
+
+
+@router.get("/contacts/lookup")
+async def lookup_contact(wallet: str = "", email: str = "", phone: str = ""):
+    sql, params = lookup_query(wallet, email, phone)
+    async with get_async_db() as db:
+        row = await db.fetchone(sql, params)
+    if row is None:
+        return FastJSONResponse({"found": False, "contact": None})
+    return FastJSONResponse({"found": True, "contact": contact_from_row(row)})
+
+
+@router.get("/contacts/search")
+async def search_contacts(
+    wallet: str = "",
+    q: str = "",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = "",
+):
+    wallet, terms, page_size, offset = search_params(wallet, q, limit, cursor)
+    sql, params = search.contact_search_query(wallet, terms, page_size + 1, offset)
+    async with get_async_db() as db:
+        rows = await db.fetchall(sql, params)
+    return FastJSONResponse(search_page(rows, page_size, offset, contact_from_row))
+
+
+@router.post("/contacts/resolve")
+async def resolve_contacts(req: ResolveContactsRequest, request: Request):
+    sql, params, wanted = resolve_query(resolve_wallet(req, request.state.wallet), req.emails, req.phones)
+    rows = []
+    if sql:
+        async with get_async_db() as db:
+            rows = await db.fetchall(sql, params)
+    return FastJSONResponse(resolve_result(wanted, rows))
+
+
+@router.post("/contacts", status_code=201)
+async def create_contact(req: CreateContactRequest, request: Request):
+    params = new_contact_params(req, request.state.wallet)
+    if WRITE_COALESCE:
+        row = await write_coalescer.arun(repository.insert_contact, params)
+    else:
+        async with get_async_db() as db:
+            row = await repository.ainsert_contact(db, params)
+    return contact_to_dict(row)
+
+
+@router.delete("/contacts/{contact_id}", status_code=204)
+async def delete_contact(contact_id: str, request: Request):
+    async with get_async_db() as db:
+        outcome = await repository.adelete_contact(db, contact_id, request.state.wallet)
+    if outcome == repository.NOT_FOUND:
+        raise HTTPException(status_code=404, detail="contact not found")
+    if outcome == repository.FORBIDDEN:
+        raise HTTPException(status_code=403, detail="not your contact")
+    return None
@@ -0,0 +1,315 @@
+"""
+Mixed-workload load test against the real app (index:app, all middlewares,
+rate limiting disabled). Seeds a database with invoices and contacts spread
+over many wallets, then drives a traffic mix modeled on production:
+
+  poll     GET  /invoices/{id}              payment page status polling
+  history  GET  /invoices?wallet=..&limit   activity history, first page
+  lookup   GET  /contacts/lookup            contact lookup by email
+  create   POST /invoices                   create ...
+  pay      POST /invoices/{id}/pay          ... then pay the same invoice
+
+and reports throughput plus p50/p95/p99 latency per operation. Results can be
+written as JSON (--output) and diffed against an earlier run (--compare).
+
+    python benchmarks/bench_load.py --requests 5000 --concurrency 32
+    python benchmarks/bench_load.py --server --output after.json --compare before.json
+    python benchmarks/bench_load.py --database-url postgresql://localhost/mikuu_bench
+
+--server runs uvicorn in a subprocess and goes over TCP; the default is
+in-process ASGI. --database-url seeds and targets a (scratch) Postgres
+database instead of a throwaway SQLite file. Requires httpx.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Relative weight of each workload step; "create" also issues the paired "pay"
+MIX = {"poll": 50, "history": 20, "lookup": 15, "create": 15}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invoices", type=int, default=20000)
+    parser.add_argument("--contacts", type=int, default=5000)
+    parser.add_argument("--wallets", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--server", action="store_true", help="serve over uvicorn instead of in-process ASGI")
+    parser.add_argument("--database-url", default="", help="Postgres DSN; default is a throwaway SQLite file")
+    parser.add_argument("--db-async", action="store_true", help="serve with DB_ASYNC=true")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="JSON results of an earlier run to diff against")
+    return parser.parse_args()
+
+
+def configure_env(args) -> dict:
+    """Environment for the app under test; must be applied before importing it."""
+    env = {
+        "DATABASE_URL": args.database_url,
+        "DB_PATH": os.path.join(tempfile.mkdtemp(), "bench.db"),
+        "DB_ASYNC": "true" if args.db_async else "false",
+        "RATE_LIMIT_ENABLED": "false",
+        "AUTO_MIGRATE": "false",
+    }
+    os.environ.update(env)
+    sys.path.insert(0, API_DIR)
+    return env
+
+
+def wallet(i: int) -> str:
+    return "0x" + f"{i:040x}"
+
+
+# ── seeding ───────────────────────────────────────────────
+
+def seed(args, rng: random.Random) -> dict:
+    """Insert the dataset directly (not via the API) and return ids to target."""
+    from migrations import migrate
+    from database import get_db, get_placeholder
+    from routes import get_cursor
+
+    migrate()
+    p = get_placeholder()
+    token = wallet(10**6)
+    invoices, contacts = [], []
+    for i in range(args.invoices):
+        merchant = wallet(rng.randrange(args.wallets))
+        paid = rng.random() < 0.6
+        created = f"2026-01-{1 + i % 28:02d}T{i % 24:02d}:00:00.{i:06d}Z"
+        cents = rng.randint(1, 50000)
+        invoices.append((
+            str(uuid.uuid4()), merchant, f"customer{i}@example.com", f"{cents / 100:.2f}", cents * 10**4,
+            token, f"INV-{i}", "PAID" if paid else "PENDING", created, created if paid else None,
+            f"http://localhost:5173/?invoiceId={i}", "0x" + "f" * 64 if paid else "",
+            wallet(rng.randrange(args.wallets)) if paid else "", "42431", "https://rpc.moderato.tempo.xyz",
+        ))
+    for i in range(args.contacts):
+        contacts.append((
+            str(uuid.uuid4()), wallet(i % args.wallets), f"contact {i}", wallet(rng.randrange(args.wallets)),
+            f"contact{i}@example.com", f"+1555{i:07d}",
+        ))
+
+    with get_db() as conn:
+        cursor = get_cursor(conn)
+        cursor.executemany(
+            "INSERT INTO invoices (id, merchant_address, customer_email, amount, amount_minor, token_address, memo, status,"
+            " created_at, paid_at, payment_link, tempo_tx_hash, payer_address, tempo_chain_id, tempo_rpc)"
+            f" VALUES ({', '.join([p] * 15)})",
+            invoices,
+        )
+        cursor.executemany(
+            f"INSERT INTO contacts (id, owner_wallet, name, wallet_address, email, phone) VALUES ({', '.join([p] * 6)})",
+            contacts,
+        )
+        conn.commit()
+    return {
+        "invoice_ids": [row[0] for row in invoices],
+        "contacts": [(row[1], row[4]) for row in contacts],
+        "token": token,
+    }
+
+
+# ── workload ──────────────────────────────────────────────
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, name: str, request, expected=(200, 201)):
+        start = time.perf_counter()
+        try:
+            response = await request
+        except Exception:
+            self.errors[name] += 1
+            return None
+        self.latencies[name].append(time.perf_counter() - start)
+        if response.status_code not in expected:
+            self.errors[name] += 1
+            return None
+        return response
+
+
+async def step(client, rec: Recorder, op: str, data: dict, args, rng: random.Random):
+    if op == "poll":
+        await rec.call("poll", client.get(f"/invoices/{rng.choice(data['invoice_ids'])}"))
+    elif op == "history":
+        params = {"wallet": wallet(rng.randrange(args.wallets)), "limit": args.page_size}
+        await rec.call("history", client.get("/invoices", params=params))
+    elif op == "lookup":
+        owner, email = rng.choice(data["contacts"])
+        await rec.call("lookup", client.get("/contacts/lookup", params={"wallet": owner, "email": email}))
+    else:
+        merchant, payer = wallet(rng.randrange(args.wallets)), wallet(rng.randrange(args.wallets))
+        body = {"merchantAddress": merchant, "amount": "10.00", "tokenAddress": data["token"], "memo": "bench"}
+        created = await rec.call("create", client.post("/invoices", json=body, headers={"X-Wallet-Address": merchant}))
+        if created is not None:
+            pay = {"txHash": "0x" + "e" * 64, "payerAddress": payer}
+            await rec.call("pay", client.post(f"/invoices/{created.json()['id']}/pay", json=pay, headers={"X-Wallet-Address": payer}))
+
+
+async def drive(client, args, data: dict) -> tuple:
+    rng = random.Random(args.seed)
+    ops = rng.choices(list(MIX), weights=list(MIX.values()), k=args.requests)
+    queue = iter(ops)
+    rec = Recorder()
+
+    async def worker(n: int):
+        worker_rng = random.Random(args.seed * 1000 + n)
+        for op in queue:
+            await step(client, rec, op, data, args, worker_rng)
+
+    # Warm up connections, caches and prepared statements before timing
+    warmup = Recorder()
+    for op in MIX:
+        await step(client, warmup, op, data, args, random.Random(0))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(args.concurrency)))
+    return rec, time.perf_counter() - start
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(rec: Recorder, elapsed: float) -> dict:
+    results = {}
+    for name in sorted(set(rec.latencies) | set(rec.errors)):
+        values = sorted(rec.latencies[name])
+        results[name] = {
+            "requests": len(values),
+            "errors": rec.errors[name],
+            "rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(percentile(values, 50) * 1000, 2) if values else None,
+            "p95_ms": round(percentile(values, 95) * 1000, 2) if values else None,
+            "p99_ms": round(percentile(values, 99) * 1000, 2) if values else None,
+            "mean_ms": round(statistics.fmean(values) * 1000, 2) if values else None,
+        }
+    total = sum(r["requests"] for r in results.values())
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "total_requests": total,
+        "total_errors": sum(r["errors"] for r in results.values()),
+        "total_rps": round(total / elapsed, 1),
+        "endpoints": results,
+    }
+
+
+# ── transports ────────────────────────────────────────────
+
+async def run_asgi(args, data: dict) -> dict:
+    import httpx
+    import index
+
+    # ASGITransport does not send lifespan events; run it so the pools are closed afterwards
+    transport = httpx.ASGITransport(app=index.app)
+    async with index.lifespan(index.app), httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        rec, elapsed = await drive(client, args, data)
+    return summarize(rec, elapsed)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_server(args, data: dict, env: dict) -> dict:
+    import httpx
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "index:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=API_DIR, env={**os.environ, **env},
+    )
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+            for _ in range(100):
+                try:
+                    await client.get("/health")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn did not start")
+            rec, elapsed = await drive(client, args, data)
+    finally:
+        server.terminate()
+        server.wait()
+    return summarize(rec, elapsed)
+
+
+# ── reporting ─────────────────────────────────────────────
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=API_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def report(results: dict, baseline: dict = None):
+    base = (baseline or {}).get("results", {}).get("endpoints", {})
+    print(f"{'endpoint':<10}{'reqs':>7}{'err':>5}{'r/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'Δ p95':>9}")
+    for name, r in results["endpoints"].items():
+        delta = ""
+        if name in base and base[name]["p95_ms"] and r["p95_ms"]:
+            delta = f"{(r['p95_ms'] / base[name]['p95_ms'] - 1) * 100:+.1f}%"
+        print(f"{name:<10}{r['requests']:>7}{r['errors']:>5}{r['rps']:>9.1f}"
+              f"{r['p50_ms'] or 0:>9.2f}{r['p95_ms'] or 0:>9.2f}{r['p99_ms'] or 0:>9.2f}{delta:>9}")
+    line = f"total     {results['total_requests']:>7}{results['total_errors']:>5}{results['total_rps']:>9.1f} r/s"
+    if baseline:
+        line += f"   ({(results['total_rps'] / baseline['results']['total_rps'] - 1) * 100:+.1f}% vs {baseline.get('commit') or 'baseline'})"
+    print(line)
+
+
+def main():
+    args = parse_args()
+    env = configure_env(args)
+    rng = random.Random(args.seed)
+
+    start = time.perf_counter()
+    data = seed(args, rng)
+    print(f"seeded {args.invoices} invoices, {args.contacts} contacts over {args.wallets} wallets "
+          f"in {time.perf_counter() - start:.1f}s ({'postgres' if args.database_url else 'sqlite'})")
+
+    results = asyncio.run(run_server(args, data, env) if args.server else run_asgi(args, data))
+    output = {
+        "commit": git_commit(),
+        "transport": "uvicorn" if args.server else "asgi",
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "database_url")},
+        "database": "postgres" if args.database_url else "sqlite",
+        "results": results,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Requests/sec through the rate-limit + wallet-auth middleware stack, comparing
+the pure-ASGI middlewares with the same checks wrapped in Starlette's
+BaseHTTPMiddleware (the previous implementation).
+
+Runs in-process over ASGI against a throwaway SQLite database, so it measures
+framework + middleware overhead rather than network time. Requires httpx.
+
+    python benchmarks/bench_middleware.py --requests 5000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "bench.db"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from migrations import init_db
+from middleware import RateLimitMiddleware, WalletAuthMiddleware
+from ratelimit import RateLimiter, Limit, MemoryBackend
+from routes import router
+
+UNLIMITED = Limit(10**9, 1)
+WALLET = "0x" + "a" * 40
+
+
+class WrappedMiddleware(BaseHTTPMiddleware):
+    """Runs a pure-ASGI middleware's checks through BaseHTTPMiddleware for comparison."""
+
+    def __init__(self, app, inner_cls, **kwargs):
+        super().__init__(app)
+        self.inner = inner_cls(self._passthrough, **kwargs)
+
+    @staticmethod
+    async def _passthrough(scope, receive, send):
+        pass
+
+    async def dispatch(self, request, call_next):
+        # The benchmark only issues allowed GETs, so the inner check never responds itself
+        await self.inner(request.scope, request.receive, None)
+        return await call_next(request)
+
+
+def build_app(wrapped: bool) -> FastAPI:
+    app = FastAPI()
+    limiter_kwargs = {"limiter": RateLimiter(MemoryBackend()), "ip_limit": UNLIMITED, "wallet_limit": UNLIMITED}
+    if wrapped:
+        app.add_middleware(WrappedMiddleware, inner_cls=RateLimitMiddleware, **limiter_kwargs)
+        app.add_middleware(WrappedMiddleware, inner_cls=WalletAuthMiddleware)
+    else:
+        app.add_middleware(RateLimitMiddleware, **limiter_kwargs)
+        app.add_middleware(WalletAuthMiddleware)
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok"}
+
+    app.include_router(router)
+    return app
+
+
+async def run(app: FastAPI, path: str, requests: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        remaining = iter(range(requests))
+
+        async def worker():
+            for _ in remaining:
+                r = await client.get(path)
+                assert r.status_code == 200, r.status_code
+
+        await client.get(path)  # warm up
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - start)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    init_db()
+    seed = build_app(wrapped=False)
+    transport = httpx.ASGITransport(app=seed)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        r = await client.post(
+            "/invoices",
+            json={"merchantAddress": WALLET, "amount": 1, "tokenAddress": WALLET},
+            headers={"X-Wallet-Address": WALLET},
+        )
+        invoice_id = r.json()["id"]
+
+    print(f"{'endpoint':<28}{'BaseHTTPMiddleware':>20}{'pure ASGI':>12}{'change':>10}")
+    for path in ("/health", f"/invoices/{invoice_id}"):
+        before = await run(build_app(wrapped=True), path, args.requests, args.concurrency)
+        after = await run(build_app(wrapped=False), path, args.requests, args.concurrency)
+        label = "/invoices/{id}" if path != "/health" else path
+        print(f"GET {label:<24}{before:>16.0f} r/s{after:>8.0f} r/s{(after / before - 1) * 100:>+9.1f}%")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+"""
+Per-row cost of serializing an invoice history, comparing the previous path
+(SELECT *, row_to_dict, jsonable_encoder, stdlib json) with the projected
+path (aliased SELECT, invoice_from_row, serializers.dumps).
+
+Runs against a throwaway SQLite database seeded with --rows invoices for one
+merchant; timings include the query, row mapping and encoding.
+
+    python benchmarks/bench_serialization.py --rows 10000 --repeat 10
+"""
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "bench.db"))
+os.environ["DATABASE_URL"] = ""
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+
+from config import DB_PATH
+from database import row_to_dict
+from migrations import migrate
+from serializers import INVOICE_COLUMNS, invoice_from_row, dumps, orjson
+
+WALLET = "0x" + "a" * 40
+
+
+def seed(conn, rows: int):
+    conn.executemany(
+        "INSERT INTO invoices (id, merchant_address, customer_email, amount, token_address, memo, created_at, payment_link, tempo_chain_id, tempo_rpc)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (str(uuid.uuid4()), WALLET, "payer@example.com", "12.50", WALLET, f"INV-{i}",
+             f"2026-01-01T00:00:{i:06d}Z", "http://localhost:5173/?invoiceId=x", "42431", "https://rpc")
+            for i in range(rows)
+        ],
+    )
+    conn.commit()
+
+
+def previous(conn) -> bytes:
+    rows = conn.execute("SELECT * FROM invoices WHERE merchant_address = ? ORDER BY created_at DESC", (WALLET,)).fetchall()
+    items = jsonable_encoder([row_to_dict(r) for r in rows])
+    return json.dumps(items, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def projected(conn) -> bytes:
+    rows = conn.execute(f"SELECT {INVOICE_COLUMNS} FROM invoices WHERE merchant_address = ? ORDER BY created_at DESC", (WALLET,)).fetchall()
+    return dumps([invoice_from_row(r) for r in rows])
+
+
+def measure(fn, conn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(conn)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    migrate()
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    seed(conn, args.rows)
+    assert json.loads(previous(conn)) == json.loads(projected(conn))
+
+    print(f"{args.rows} invoices, median of {args.repeat} (orjson {'on' if orjson else 'off'})")
+    for name, fn in (("previous", previous), ("projected", projected)):
+        total = measure(fn, conn, args.repeat)
+        print(f"  {name:<10} {total * 1000:8.1f} ms   {total / args.rows * 1e6:6.2f} us/row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Cold-start cost: time to `import index` and serve the first request in a fresh
+interpreter, against an already-migrated SQLite database. Compares startup with
+AUTO_MIGRATE on (one schema_version check) and off (migrations run on deploy).
+
+Each run is a separate subprocess so module caches start cold. Requires httpx.
+
+    python benchmarks/bench_startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {api_dir!r})
+import index
+t1 = time.perf_counter()
+import httpx
+
+async def first_request():
+    transport = httpx.ASGITransport(app=index.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        t = time.perf_counter()
+        resp = await client.get("/invoices/missing")
+        return time.perf_counter() - t, resp.status_code
+
+elapsed, status = asyncio.run(first_request())
+print(json.dumps({{"import": t1 - t0, "first_request": elapsed, "status": status}}))
+"""
+
+
+def probe(env: dict) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(api_dir=API_DIR)],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    base_env = {**os.environ, "DB_PATH": db_path, "DATABASE_URL": ""}
+    subprocess.run([sys.executable, os.path.join(API_DIR, "migrations.py")], env=base_env,
+                   capture_output=True, check=True)
+
+    for auto_migrate in ("true", "false"):
+        env = {**base_env, "AUTO_MIGRATE": auto_migrate}
+        runs = [probe(env) for _ in range(args.runs)]
+        imports = statistics.median(r["import"] for r in runs) * 1000
+        firsts = statistics.median(r["first_request"] for r in runs) * 1000
+        print(f"AUTO_MIGRATE={auto_migrate:<5}  import {imports:7.1f} ms   first request {firsts:6.1f} ms   (median of {args.runs})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Stub Tempo JSON-RPC server for exercising the payment verifier locally.
+
+    python benchmarks/stub_rpc.py --port 8545 [--receipts receipts.json]
+    TEMPO_RPC_URL=http://127.0.0.1:8545 VERIFY_PAYMENTS=true python verifier.py
+
+Answers eth_getTransactionReceipt, single or batched, from a table of
+receipts (hash -> receipt). Unknown hashes return null, the same as a
+transaction that has not been mined yet. Receipts can be added at runtime:
+- `stub_setReceipt` takes [hash, receipt].
+- `stub_payment` takes [hash, token, from, to, value, succeeded] and builds a
+  receipt with one Transfer log.
+
+`stub_stats` returns the number of HTTP requests and receipt lookups served.
+Scripts can also call serve() to run the server on a background thread.
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+
+def payment_receipt(tx_hash: str, token: str, sender: str, recipient: str, value: int, succeeded: bool = True) -> dict:
+    """A minimal receipt with a single Transfer(sender -> recipient, value) log."""
+    return {
+        "transactionHash": tx_hash,
+        "status": "0x1" if succeeded else "0x0",
+        "logs": [{
+            "address": token,
+            "topics": [TRANSFER_TOPIC, "0x" + sender[2:].rjust(64, "0"), "0x" + recipient[2:].rjust(64, "0")],
+            "data": hex(value),
+        }],
+    }
+
+
+class StubRPC:
+    def __init__(self, receipts: dict = None):
+        self.receipts = {k.lower(): v for k, v in (receipts or {}).items()}
+        self.stats = {"requests": 0, "lookups": 0}
+        self._lock = threading.Lock()
+
+    def call(self, request: dict) -> dict:
+        method, params = request.get("method"), request.get("params") or []
+        with self._lock:
+            if method == "eth_getTransactionReceipt":
+                self.stats["lookups"] += 1
+                result = self.receipts.get(str(params[0]).lower())
+            elif method == "stub_setReceipt":
+                self.receipts[params[0].lower()] = result = params[1]
+            elif method == "stub_payment":
+                self.receipts[params[0].lower()] = result = payment_receipt(*params)
+            elif method == "stub_stats":
+                result = dict(self.stats)
+            else:
+                return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": -32601, "message": "method not found"}}
+        return {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like a real node
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                with stub._lock:
+                    stub.stats["requests"] += 1
+                if isinstance(payload, list):
+                    body = [stub.call(item) for item in payload]
+                else:
+                    body = stub.call(payload)
+                raw = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def serve(port: int = 0, receipts: dict = None):
+    """Start a stub on a background thread; returns (server, stub). Port 0 picks a free one."""
+    stub = StubRPC(receipts)
+    server = ThreadingHTTPServer(("127.0.0.1", port), stub.handler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stub
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8545)
+    parser.add_argument("--receipts", help="JSON file mapping tx hash -> receipt")
+    args = parser.parse_args()
+    receipts = None
+    if args.receipts:
+        with open(args.receipts) as f:
+            receipts = json.load(f)
+    server, _ = serve(args.port, receipts)
+    print(f"Stub RPC listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Read-through cache of serialized GET /invoices/{id} responses.
+
+Entries are (body, etag) pairs, or None for a cached 404. Invoice rows only
+change on mark_paid and delete, and every invoice write publishes the id on
+the notifier, which invalidates the entry. With Postgres that reaches other
+workers and instances through LISTEN/NOTIFY (the listener starts with the
+app); TTLs bound staleness for anything that slips past that.
+
+Backends:
+- MemoryCache: per-process LRU with TTLs.
+- RedisCache: shared between workers (needs the optional `redis` package),
+  with a per-key invalidation generation guarding `set`.
+- NullCache: caching off. Used for SQLite with several worker processes,
+  where nothing carries invalidations from one process to another.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from config import DATABASE_URL, WEB_WORKERS, CACHE_REDIS_URL, INVOICE_CACHE_SIZE, INVOICE_CACHE_TTL, INVOICE_CACHE_NEGATIVE_TTL
+from notifier import notifier
+
+MISS = object()
+
+
+class MemoryCache:
+    is_blocking = False
+
+    def __init__(self, max_entries: int, ttl: float, negative_ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+        self._invalidations = 0
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0, "stale_sets": 0}
+
+    def token(self, key: str):
+        """Snapshot to pass to `set`, so a read racing with a write can't cache stale data."""
+        return self._invalidations
+
+    def get(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return MISS
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return MISS
+            self._entries.move_to_end(key)
+            self._stats["hits" if value is not None else "negative_hits"] += 1
+            return value
+
+    def set(self, key: str, value, token=None, max_ttl=None):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if max_ttl is not None:
+            ttl = min(ttl, max_ttl)
+        with self._lock:
+            if token is not None and token != self._invalidations:
+                self._stats["stale_sets"] += 1
+                return
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._invalidations += 1
+            if self._entries.pop(key, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": "memory", "size": len(self._entries), "max_entries": self.max_entries, **self._stats}
+
+
+# SET the entry only if the key's invalidation generation is still the one read
+# before the database fetch: KEYS = entry, generation; ARGV = generation, value, ttl ms
+_SET_IF_CURRENT = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3])
+return 1
+"""
+
+
+class RedisCache:
+    """
+    Each key has an invalidation generation (`gen:` prefix) that `invalidate`
+    increments. `token` reads it before the database fetch and `set` only
+    writes if it is unchanged (a Lua script, so check and write are atomic),
+    so a read that raced with a write can't put the stale row back.
+    """
+
+    is_blocking = True
+    # Generations outlive any in-flight read by a wide margin
+    GENERATION_TTL = 3600
+
+    def __init__(self, url: str, ttl: float, negative_ttl: float, prefix: str = "mikuu:invoice:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.prefix = prefix
+        self._set_if_current = self.client.register_script(_SET_IF_CURRENT)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0, "invalidations": 0, "errors": 0, "stale_sets": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _generation_key(self, key: str) -> str:
+        return f"{self.prefix}gen:{key}"
+
+    def token(self, key: str):
+        try:
+            return (self.client.get(self._generation_key(key)) or b"0").decode()
+        except Exception:
+            self._count("errors")
+            return None
+
+    def get(self, key: str):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception:
+            self._count("errors")
+            return MISS
+        if raw is None:
+            self._count("misses")
+            return MISS
+        entry = json.loads(raw)
+        if entry is None:
+            self._count("negative_hits")
+            return None
+        self._count("hits")
+        return entry["body"].encode(), entry["etag"]
+
+    def set(self, key: str, value, token=None, max_ttl=None):
+        if token is None:
+            # No generation was read (e.g. Redis was unreachable): don't risk a stale entry
+            return
+        if value is None:
+            raw, ttl = "null", self.negative_ttl
+        else:
+            body, etag = value
+            raw, ttl = json.dumps({"body": body.decode(), "etag": etag}), self.ttl
+        if max_ttl is not None:
+            ttl = min(ttl, max_ttl)
+        try:
+            stored = self._set_if_current(
+                keys=[self.prefix + key, self._generation_key(key)],
+                args=[token, raw, max(1, int(ttl * 1000))],
+            )
+        except Exception:
+            self._count("errors")
+            return
+        if not stored:
+            self._count("stale_sets")
+
+    def invalidate(self, key: str):
+        generation = self._generation_key(key)
+        try:
+            with self.client.pipeline() as pipe:
+                pipe.incr(generation)
+                pipe.expire(generation, self.GENERATION_TTL)
+                pipe.delete(self.prefix + key)
+                pipe.execute()
+            self._count("invalidations")
+        except Exception:
+            self._count("errors")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": "redis", **self._stats}
+
+
+class NullCache:
+    is_blocking = False
+
+    def token(self, key: str):
+        return None
+
+    def get(self, key: str):
+        return MISS
+
+    def set(self, key: str, value, token=None, max_ttl=None):
+        pass
+
+    def invalidate(self, key: str):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "none"}
+
+
+def make_cache(redis_url: str, max_entries: int, ttl: float, negative_ttl: float):
+    if redis_url:
+        return RedisCache(redis_url, ttl=ttl, negative_ttl=negative_ttl)
+    if not DATABASE_URL and WEB_WORKERS > 1:
+        # SQLite has no NOTIFY: one worker's writes would never evict another's entries
+        return NullCache()
+    return MemoryCache(max_entries=max_entries, ttl=ttl, negative_ttl=negative_ttl)
+
+
+invoice_cache = make_cache(CACHE_REDIS_URL, INVOICE_CACHE_SIZE, INVOICE_CACHE_TTL, INVOICE_CACHE_NEGATIVE_TTL)
+notifier.add_callback(invoice_cache.invalidate)
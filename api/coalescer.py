@@ -0,0 +1,119 @@
+"""
+Group commit for single-row writes.
+
+With WRITE_COALESCE, create_invoice / create_contact / mark_paid hand their
+statement to a writer thread instead of committing their own transaction.
+The writer takes the first queued write and keeps collecting for up to
+WRITE_COALESCE_DELAY_MS or WRITE_COALESCE_MAX_BATCH writes. It then runs
+them all in one transaction, each inside a SAVEPOINT so a failing write rolls
+back alone, commits once, and completes every caller with its own result.
+Under bursts, N commits (and fsyncs) become one. A lone write waits at most
+the delay.
+
+Batch sizes and the time each write spent queued are exported as the
+mikuu_write_batch_size / mikuu_write_wait_seconds histograms.
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from config import DATABASE_URL, WRITE_COALESCE_DELAY_MS, WRITE_COALESCE_MAX_BATCH
+from database import get_db, get_cursor
+import metrics
+
+_STOP = object()
+
+
+class WriteCoalescer:
+    def __init__(self, max_batch: int, max_delay: float):
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, fn, *args) -> Future:
+        """Queue `fn(cursor, *args)` for the next group commit; the Future resolves once it is committed."""
+        future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-coalescer", daemon=True)
+                self._thread.start()
+        self._queue.put((fn, args, future, time.perf_counter()))
+        return future
+
+    def run(self, fn, *args):
+        """Blocking submit(), for sync routes; the wait counts as the request's db time."""
+        with metrics.timed("db"):
+            return self.submit(fn, *args).result()
+
+    async def arun(self, fn, *args):
+        with metrics.timed("db"):
+            return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def close(self):
+        """Commit whatever is queued and stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.perf_counter() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch: list):
+        outcomes = []
+        try:
+            with get_db() as conn:
+                cursor = get_cursor(conn)
+                if not DATABASE_URL:
+                    # sqlite3 would otherwise commit when the first savepoint is released
+                    cursor.execute("BEGIN")
+                for fn, args, future, _ in batch:
+                    cursor.execute("SAVEPOINT coalesced_write")
+                    try:
+                        result = fn(cursor, *args)
+                    except Exception as e:
+                        cursor.execute("ROLLBACK TO SAVEPOINT coalesced_write")
+                        outcomes.append((future, None, e))
+                    else:
+                        outcomes.append((future, result, None))
+                    cursor.execute("RELEASE SAVEPOINT coalesced_write")
+                conn.commit()
+        except Exception as e:
+            for _, _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        now = time.perf_counter()
+        metrics.write_batch_size.observe(len(batch))
+        for _, _, _, queued_at in batch:
+            metrics.write_wait.observe(now - queued_at)
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+write_coalescer = WriteCoalescer(WRITE_COALESCE_MAX_BATCH, WRITE_COALESCE_DELAY_MS / 1000)
@@ -17,3 +17,77 @@ if not FRONTEND_BASE_URL:
 TEMPO_CHAIN_ID = os.getenv("TEMPO_CHAIN_ID", "42431")
 TEMPO_RPC_URL = os.getenv("TEMPO_RPC_URL", "https://rpc.moderato.tempo.xyz")
 PORT = int(os.getenv("PORT", "8080"))
+
+# Apply pending schema migrations at startup; disable when migrations run on deploy
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "true").lower() == "true"
+
+# Production server (serve.py): worker processes, threadpool size per worker for
+# sync endpoints, and how long a stopping worker waits for in-flight requests.
+# serve.py exports WEB_WORKERS to the workers it starts.
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+WEB_THREADS = int(os.getenv("WEB_THREADS", "40"))
+WEB_GRACEFUL_TIMEOUT = float(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))
+
+# Connection pool sizing (per process). DB_MAX_CONNECTIONS, when set, is the
+# budget for the whole server and is split evenly between the WEB_WORKERS.
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "0"))
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(
+    os.getenv("DB_POOL_MAX_SIZE")
+    or (max(1, DB_MAX_CONNECTIONS // max(1, WEB_WORKERS)) if DB_MAX_CONNECTIONS else 10)
+)
+DB_POOL_MAX_USES = int(os.getenv("DB_POOL_MAX_USES", "500"))  # recycle a connection after N checkouts
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE", "30"))  # ping connections idle longer than this
+
+# Serve invoice/contact endpoints from the async (asyncpg / aiosqlite) data layer
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() == "true"
+
+# Rate limit state: "memory" (per process) or "db" (shared via the rate_limits table)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"  # off only for load tests
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+
+# Longest a /invoices/{id}/events stream stays open before the client reconnects
+SSE_MAX_SECONDS = float(os.getenv("SSE_MAX_SECONDS", "300"))
+
+# Instrumentation: Server-Timing header + /metrics, and the slow-query log threshold (0 disables)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "250"))
+
+# Invoice expiry: default TTL for new invoices (0 = never), the longest TTL a
+# client may ask for, and the in-process sweeper (interval 0 disables it)
+INVOICE_DEFAULT_TTL = int(os.getenv("INVOICE_DEFAULT_TTL", "0"))
+INVOICE_MAX_TTL = int(os.getenv("INVOICE_MAX_TTL", str(90 * 24 * 3600)))
+EXPIRY_SWEEP_INTERVAL = float(os.getenv("EXPIRY_SWEEP_INTERVAL", "60"))
+EXPIRY_BATCH_SIZE = int(os.getenv("EXPIRY_BATCH_SIZE", "500"))
+
+# Archiving (archive.py): PAID / EXPIRED invoices created more than
+# ARCHIVE_AFTER_DAYS ago move to invoices_archive every ARCHIVE_INTERVAL
+# seconds, ARCHIVE_BATCH_SIZE per transaction (0 days disables it)
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "0"))
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "3600"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+
+# On-chain payment verification (verifier.py): claimed tx hashes are checked
+# against TEMPO_RPC_URL with batched eth_getTransactionReceipt calls
+VERIFY_PAYMENTS = os.getenv("VERIFY_PAYMENTS", "false").lower() == "true"
+VERIFY_INTERVAL = float(os.getenv("VERIFY_INTERVAL", "5"))
+VERIFY_BATCH_SIZE = int(os.getenv("VERIFY_BATCH_SIZE", "200"))  # invoices claimed per round
+VERIFY_RPC_BATCH = int(os.getenv("VERIFY_RPC_BATCH", "50"))  # receipts per JSON-RPC request
+VERIFY_CONCURRENCY = int(os.getenv("VERIFY_CONCURRENCY", "4"))  # JSON-RPC requests in flight
+VERIFY_RETRY_DELAY = float(os.getenv("VERIFY_RETRY_DELAY", "15"))  # before an unconfirmed hash is retried
+VERIFY_TIMEOUT = float(os.getenv("VERIFY_TIMEOUT", "900"))  # an unmined hash is rejected after this
+VERIFY_CACHE_SIZE = int(os.getenv("VERIFY_CACHE_SIZE", "10000"))
+
+# Group commit: single-row writes queued within WRITE_COALESCE_DELAY_MS of each
+# other (up to WRITE_COALESCE_MAX_BATCH) share one transaction and commit
+WRITE_COALESCE = os.getenv("WRITE_COALESCE", "false").lower() == "true"
+WRITE_COALESCE_DELAY_MS = float(os.getenv("WRITE_COALESCE_DELAY_MS", "2"))
+WRITE_COALESCE_MAX_BATCH = int(os.getenv("WRITE_COALESCE_MAX_BATCH", "64"))
+
+# GET /invoices/{id} response cache
+INVOICE_CACHE_SIZE = int(os.getenv("INVOICE_CACHE_SIZE", "10000"))
+INVOICE_CACHE_TTL = float(os.getenv("INVOICE_CACHE_TTL", "60"))
+INVOICE_CACHE_NEGATIVE_TTL = float(os.getenv("INVOICE_CACHE_NEGATIVE_TTL", "5"))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "")  # shared cache across workers (optional)
@@ -1,113 +1,350 @@
 import sqlite3
-import os
-import psycopg2
-import psycopg2.extras
+import time
+from datetime import datetime
+import threading
+from collections import deque
 from contextlib import contextmanager
-from config import DB_PATH, DATABASE_URL
+from typing import Optional
+from metrics import timed, TimedCursor
+from config import (
+    DB_PATH,
+    DATABASE_URL,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_MAX_USES,
+    DB_POOL_TIMEOUT,
+    DB_POOL_HEALTHCHECK_IDLE,
+)
 
 
-@contextmanager
-def get_db():
-    if DATABASE_URL:
-        # PostgreSQL (Supabase)
-        # Fix: psycopg2 (and some other libs) occasionally prefer 'postgresql://' over 'postgres://'
-        url = DATABASE_URL
-        if url.startswith("postgres://"):
-            url = url.replace("postgres://", "postgresql://", 1)
-            
-        print(f"DEBUG: Attempting to connect to PostgreSQL (url present: {bool(url)})")
+# ── connection pooling ────────────────────────────────────
+
+class PostgresPool:
+    """
+    Thread-safe, bounded pool of psycopg2 connections.
+    Keeps at least `min_size` connections warm, never opens more than
+    `max_size`, pings connections that sat idle longer than
+    `healthcheck_idle` seconds before handing them out, and recycles
+    each connection after `max_uses` checkouts.
+    """
+
+    def __init__(self, dsn: str, min_size: int, max_size: int, max_uses: int,
+                 timeout: float, healthcheck_idle: float):
+        self.dsn = dsn
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max(1, max_size)
+        self.max_uses = max_uses
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._lock = threading.Lock()
+        self._idle: deque = deque()  # (conn, uses, last_used)
+        self._open = 0
+        self._in_use = 0
+        self._stats = {"created": 0, "reused": 0, "recycled": 0, "discarded": 0, "timeouts": 0}
+        for _ in range(self.min_size):
+            self._idle.append((self._connect(), 0, time.monotonic()))
+
+    def _connect(self):
+        import psycopg2
+
         try:
-            conn = psycopg2.connect(url, connect_timeout=10)
-            print("DEBUG: Connection successful")
-            yield conn
+            conn = psycopg2.connect(self.dsn, connect_timeout=10)
         except Exception as e:
             print(f"ERROR: Could not connect to PostgreSQL: {e}")
             raise
+        with self._lock:
+            self._open += 1
+            self._stats["created"] += 1
+        return conn
+
+    def _close(self, conn, reason: str):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._open -= 1
+            self._stats[reason] += 1
+
+    def _healthy(self, conn, last_used: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.healthcheck_idle:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise RuntimeError("database pool exhausted")
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    conn, uses = self._connect(), 0
+                    break
+                conn, uses, last_used = entry
+                if self._healthy(conn, last_used):
+                    with self._lock:
+                        self._stats["reused"] += 1
+                    break
+                self._close(conn, "discarded")
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+        return conn, uses + 1
+
+    def putconn(self, conn, uses: int, broken: bool = False):
+        try:
+            if broken or conn.closed:
+                self._close(conn, "discarded")
+            elif uses >= self.max_uses:
+                self._close(conn, "recycled")
+            else:
+                try:
+                    from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+                    # Never hand out a connection with an open transaction
+                    if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                    with self._lock:
+                        self._idle.append((conn, uses, time.monotonic()))
+                except Exception:
+                    self._close(conn, "discarded")
         finally:
-            if 'conn' in locals():
-                conn.close()
-    else:
-        # SQLite (Local)
-        conn = sqlite3.connect(DB_PATH)
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _, _ in idle:
+            self._close(conn, "discarded")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "postgres",
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "max_uses": self.max_uses,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                **self._stats,
+            }
+
+
+class SQLitePool:
+    """
+    Per-thread SQLite connections, reused across requests served by the
+    same worker thread. Connections run in WAL mode so readers never
+    block on the single writer, and are recycled after `max_uses`.
+    """
+
+    def __init__(self, path: str, max_uses: int):
+        self.path = path
+        self.max_uses = max_uses
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conns: set = set()
+        self._stats = {"created": 0, "reused": 0, "recycled": 0, "discarded": 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=DB_POOL_TIMEOUT, check_same_thread=False)
         conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            self._conns.add(conn)
+            self._stats["created"] += 1
+        return conn
+
+    def _close(self, conn, reason: str):
         try:
-            yield conn
-        finally:
             conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._conns.discard(conn)
+            self._stats[reason] += 1
+        self._local.conn = None
 
+    def getconn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            self._local.uses = 0
+        else:
+            with self._lock:
+                self._stats["reused"] += 1
+        self._local.uses += 1
+        return conn, self._local.uses
 
-def get_placeholder():
-    return "%s" if DATABASE_URL else "?"
+    def putconn(self, conn, uses: int, broken: bool = False):
+        if broken:
+            self._close(conn, "discarded")
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        if uses >= self.max_uses:
+            self._close(conn, "recycled")
 
+    def closeall(self):
+        with self._lock:
+            conns, self._conns = list(self._conns), set()
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "sqlite",
+                "max_uses": self.max_uses,
+                "open": len(self._conns),
+                **self._stats,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def postgres_dsn() -> str:
+    # Fix: psycopg2 (and some other libs) occasionally prefer 'postgresql://' over 'postgres://'
+    url = DATABASE_URL
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url
 
-def init_db():
-    if not DATABASE_URL:
-        # Check if we are in a production/serverless environment like Vercel
-        # Vercel's filesystem is read-only except for /tmp
-        if os.getenv("VERCEL") or os.getenv("NOW_REGION"):
-            print("WARNING: DATABASE_URL not set in production. Skipping SQLite initialization as filesystem is read-only.")
-            return
 
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if DATABASE_URL:
+                    _pool = PostgresPool(
+                        postgres_dsn(),
+                        min_size=DB_POOL_MIN_SIZE,
+                        max_size=DB_POOL_MAX_SIZE,
+                        max_uses=DB_POOL_MAX_USES,
+                        timeout=DB_POOL_TIMEOUT,
+                        healthcheck_idle=DB_POOL_HEALTHCHECK_IDLE,
+                    )
+                else:
+                    _pool = SQLitePool(DB_PATH, max_uses=DB_POOL_MAX_USES)
+    return _pool
+
+
+def pool_stats() -> dict:
+    """Counters for sizing the pool; empty until the first connection is made."""
+    return _pool.stats() if _pool is not None else {}
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+_broken_errors = None
+
+
+def broken_connection_errors() -> tuple:
+    """Exceptions after which a pooled connection is discarded rather than reused."""
+    global _broken_errors
+    if _broken_errors is None:
+        if DATABASE_URL:
+            # psycopg2 is only imported when Postgres is configured; it is the
+            # slowest import on the SQLite cold-start path.
+            import psycopg2
+
+            _broken_errors = (psycopg2.OperationalError, psycopg2.InterfaceError, sqlite3.OperationalError)
+        else:
+            _broken_errors = (sqlite3.OperationalError,)
+    return _broken_errors
+
+
+@contextmanager
+def get_db():
+    pool = get_pool()
+    with timed("db-connect"):
+        conn, uses = pool.getconn()
+    broken = False
     try:
+        yield conn
+    except broken_connection_errors():
+        broken = True
+        raise
+    finally:
+        pool.putconn(conn, uses, broken=broken)
+
+
+def get_cursor(conn, name: Optional[str] = None, as_dict: bool = True):
+    """
+    Cursor whose rows support key access (`as_dict`), or plain tuples for
+    queries selecting a serializers projection.
+    """
+    if DATABASE_URL:
+        from psycopg2.extras import RealDictCursor
+
+        # A named cursor is server-side: rows are fetched in batches instead of all at once
+        return TimedCursor(conn.cursor(name=name, cursor_factory=RealDictCursor if as_dict else None))
+    return TimedCursor(conn.cursor())
+
+
+@contextmanager
+def get_stream_db():
+    """
+    Connection for long-lived streaming reads. Streaming responses are
+    iterated across threadpool threads, so SQLite gets a private connection
+    instead of the calling thread's pooled one.
+    """
+    if DATABASE_URL:
         with get_db() as conn:
-            cursor = conn.cursor()
-            p = get_placeholder()
-            
-            # Note: SQLite uses 'id TEXT PRIMARY KEY', Postgres uses same.
-            cursor.execute(f"""
-                CREATE TABLE IF NOT EXISTS invoices (
-                    id TEXT PRIMARY KEY,
-                    merchant_address TEXT NOT NULL,
-                    customer_email TEXT DEFAULT '',
-                    amount TEXT NOT NULL,
-                    token_address TEXT NOT NULL,
-                    memo TEXT NOT NULL,
-                    status TEXT DEFAULT 'PENDING',
-                    created_at TEXT NOT NULL,
-                    paid_at TEXT,
-                    expires_at TEXT,
-                    payment_link TEXT,
-                    tempo_tx_hash TEXT DEFAULT '',
-                    payer_address TEXT DEFAULT '',
-                    tempo_chain_id TEXT,
-                    tempo_rpc TEXT,
-                    stablecoin_name TEXT DEFAULT 'USD Stablecoin',
-                    fee_sponsored TEXT DEFAULT 'false'
-                )
-            """)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS contacts (
-                    id TEXT PRIMARY KEY,
-                    owner_wallet TEXT NOT NULL,
-                    name TEXT NOT NULL,
-                    wallet_address TEXT NOT NULL,
-                    email TEXT DEFAULT '',
-                    phone TEXT DEFAULT ''
-                )
-            """)
-            conn.commit()
-
-            # ── migrations for existing databases ──
-            migrations = [
-                "ALTER TABLE contacts ADD COLUMN phone TEXT DEFAULT ''",
-                "ALTER TABLE invoices ADD COLUMN fee_sponsored TEXT DEFAULT 'false'",
-            ]
-            for sql in migrations:
-                try:
-                    cursor.execute(sql)
-                    conn.commit()
-                except Exception:
-                    # Column already exists — ignore
-                    if DATABASE_URL:
-                        conn.rollback()
+            yield conn
+        return
+    conn = sqlite3.connect(DB_PATH, timeout=DB_POOL_TIMEOUT, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def get_placeholder():
+    return "%s" if DATABASE_URL else "?"
+
+
+def utc_timestamp(dt: datetime = None) -> str:
+    """Fixed-width UTC timestamp, so stored values compare correctly as strings."""
+    return (dt or datetime.utcnow()).isoformat(timespec="microseconds") + "Z"
 
-        print("database initialized")
-    except Exception as e:
-        print(f"Error initializing database: {e}")
-        if not DATABASE_URL:
-            print("CRITICAL: DATABASE_URL (Postgres) is not set.")
-            print("Vercel's filesystem is read-only, so SQLite ('mikuu.db') will FAIL.")
-            print("Please set DATABASE_URL in your Vercel Environment Variables.")
+
+def reported_status(status: str, expires_at) -> str:
+    """PENDING invoices past expires_at read as EXPIRED before the sweeper gets to them."""
+    if status == "PENDING" and expires_at and expires_at <= utc_timestamp():
+        return "EXPIRED"
+    return status
 
 
 def row_to_dict(row) -> dict:
@@ -128,7 +365,7 @@ def row_to_dict(row) -> dict:
         "amount": r.get("amount"),
         "tokenAddress": r.get("token_address"),
         "memo": r.get("memo"),
-        "status": r.get("status"),
+        "status": reported_status(r.get("status"), r.get("expires_at")),
         "createdAt": r.get("created_at"),
         "paidAt": r.get("paid_at"),
         "expiresAt": r.get("expires_at"),
@@ -139,4 +376,20 @@ def row_to_dict(row) -> dict:
         "tempoRpc": r.get("tempo_rpc"),
         "stablecoinName": r.get("stablecoin_name"),
         "feeSponsored": r.get("fee_sponsored", "false") == "true",
+        "verification": r.get("verification") or "",
+    }
+
+
+def contact_to_dict(row) -> dict:
+    try:
+        r = dict(row)
+    except (TypeError, ValueError):
+        return {}
+    return {
+        "id": r.get("id"),
+        "ownerWallet": r.get("owner_wallet"),
+        "name": r.get("name"),
+        "address": r.get("wallet_address"),
+        "email": r.get("email") or "",
+        "phone": r.get("phone") or "",
     }
@@ -0,0 +1,51 @@
+"""
+Invoice expiry.
+
+Invoices created with a TTL get an `expires_at`; once it passes they read as
+EXPIRED straight away (database.reported_status), and the sweeper makes that
+durable: it flips overdue PENDING rows to EXPIRED in bounded batches, each in
+its own short transaction, and publishes the change to SSE/long-poll waiters.
+
+The sweeper runs in-process every EXPIRY_SWEEP_INTERVAL seconds (started from
+the app lifespan), or as a one-shot for cron / serverless deployments:
+
+    python expiry.py
+"""
+import asyncio
+
+from starlette.concurrency import run_in_threadpool
+
+from config import EXPIRY_BATCH_SIZE
+from database import get_db, get_cursor, utc_timestamp
+from notifier import notifier
+import repository
+
+
+def sweep_expired(batch_size: int = EXPIRY_BATCH_SIZE) -> int:
+    """Expire every overdue invoice, batch_size rows per transaction. Returns the count."""
+    total = 0
+    while True:
+        with get_db() as conn:
+            rows = repository.expire_invoices(get_cursor(conn), utc_timestamp(), batch_size)
+            conn.commit()
+        for row in rows:
+            notifier.publish(row["id"])
+        total += len(rows)
+        if len(rows) < batch_size:
+            return total
+
+
+async def run_sweeper(interval: float):
+    """Sweep every `interval` seconds until cancelled."""
+    while True:
+        try:
+            expired = await run_in_threadpool(sweep_expired)
+            if expired:
+                print(f"Expired {expired} invoice(s)")
+        except Exception as e:
+            print(f"ERROR: invoice expiry sweep failed: {e}")
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    print(f"Expired {sweep_expired()} invoice(s)")
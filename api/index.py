@@ -1,29 +1,72 @@
 import sys
 import os
-from contextlib import asynccontextmanager
+import asyncio
+import anyio.to_thread
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
 
 # Add the current directory to sys.path to allow importing siblings
 sys.path.insert(0, os.path.dirname(__file__))
 
-from config import PORT, FRONTEND_BASE_URL
-from database import init_db
+from config import PORT, FRONTEND_BASE_URL, DB_ASYNC, METRICS_ENABLED, RATE_LIMIT_ENABLED, RATE_LIMIT_BACKEND, RATE_LIMIT_MAX_KEYS, EXPIRY_SWEEP_INTERVAL, VERIFY_PAYMENTS, VERIFY_INTERVAL, WEB_THREADS, ARCHIVE_AFTER_DAYS, ARCHIVE_INTERVAL
+from database import close_pool
+from coalescer import write_coalescer
+from notifier import notifier
+from migrations import init_db
 from routes import router
 from middleware import RateLimitMiddleware, WalletAuthMiddleware
+from ratelimit import RateLimiter, Limit, make_backend
+from metrics import MetricsMiddleware, exceptions, route_label
 
-# Initialize database globally to ensure it runs immediately on cold starts
+# Bring the schema up to date on cold starts (a single version check once it
+# is current). Set AUTO_MIGRATE=false and run `python migrations.py` on deploy
+# to skip even that.
 try:
     init_db()
 except Exception as e:
     print(f"CRITICAL: Failed to initialize database: {e}")
 
-app = FastAPI(title="mikuu", version="1.0.0")
+# Whether this process runs the expiry sweeper, payment verifier and archiver; serve.py
+# turns it off in all but one of its workers.
+background_tasks = True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Threads available to sync endpoints (and run_in_threadpool) in this process
+    anyio.to_thread.current_default_thread_limiter().total_tokens = WEB_THREADS
+    # Cross-instance invoice notifications: they also invalidate invoice_cache,
+    # so listen from the start rather than on the first SSE / long-poll client
+    notifier.start_listener()
+    workers = []
+    if background_tasks and EXPIRY_SWEEP_INTERVAL > 0:
+        from expiry import run_sweeper
+        workers.append(asyncio.create_task(run_sweeper(EXPIRY_SWEEP_INTERVAL)))
+    if background_tasks and VERIFY_PAYMENTS and VERIFY_INTERVAL > 0:
+        from verifier import run_verifier
+        workers.append(asyncio.create_task(run_verifier(VERIFY_INTERVAL)))
+    if background_tasks and ARCHIVE_AFTER_DAYS > 0 and ARCHIVE_INTERVAL > 0:
+        from archive import run_archiver
+        workers.append(asyncio.create_task(run_archiver(ARCHIVE_INTERVAL)))
+    yield
+    for worker in workers:
+        worker.cancel()
+        with suppress(asyncio.CancelledError):
+            await worker
+    write_coalescer.close()
+    close_pool()
+    if DB_ASYNC:
+        from async_database import close_async_pool
+        await close_async_pool()
+
+
+app = FastAPI(title="mikuu", version="1.0.0", lifespan=lifespan)
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     # Log the full error to Vercel logs
+    exceptions.inc(route_label(request.scope))
     print(f"ERROR: Global Exception Handler caught: {str(exc)}")
     import traceback
     traceback.print_exc()
@@ -42,6 +85,32 @@ origins = [
     "http://127.0.0.1:5173",
 ]
 
+# Rate limiting: 60 requests per minute per IP, tighter limits for writes
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        limiter=RateLimiter(make_backend(RATE_LIMIT_BACKEND, max_keys=RATE_LIMIT_MAX_KEYS)),
+        ip_limit=Limit(60, 60),
+        wallet_limit=Limit(30, 60),
+        route_limits={
+            ("POST", "/invoices/bulk"): Limit(10, 60),
+            ("POST", "/contacts/import"): Limit(10, 60),
+            ("POST", "/contacts/resolve"): Limit(30, 60),
+            ("GET", "/invoices/export"): Limit(10, 60),
+            ("GET", "/contacts/export"): Limit(10, 60),
+        },
+    )
+
+# Wallet auth: require X-Wallet-Address on mutating requests
+app.add_middleware(WalletAuthMiddleware)
+
+# Request timing (Server-Timing header, /metrics) wraps the rate-limit and
+# auth checks so they are counted in the request's latency.
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# CORS is added last so it is the outermost layer and also decorates the
+# 401/400/429 responses written by the middlewares above.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], # Allow all origins to unblock deployment
@@ -50,15 +119,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Rate limiting: 60 requests per minute per IP
-app.add_middleware(RateLimitMiddleware, max_requests=60, window_seconds=60)
-
-# Wallet auth: require X-Wallet-Address on mutating requests
-app.add_middleware(WalletAuthMiddleware)
-
 # We include the router WITHOUT the /api prefix because Vercel 
 # handles the /api mapping at the gateway level.
-app.include_router(router, prefix="")
+if DB_ASYNC:
+    # The async router serves the invoice/contact endpoints; everything else
+    # it doesn't define still comes from the sync router.
+    from fastapi import APIRouter
+    from async_routes import router as async_router
+
+    overridden = {(r.path, m) for r in async_router.routes for m in r.methods}
+    remaining = APIRouter()
+    remaining.routes.extend(
+        r for r in router.routes if not any((r.path, m) in overridden for m in r.methods)
+    )
+    # Sync-only routes go first so static paths (e.g. /invoices/export) are
+    # matched before the async router's /invoices/{invoice_id}.
+    app.include_router(remaining, prefix="")
+    app.include_router(async_router, prefix="")
+else:
+    app.include_router(router, prefix="")
 
 
 @app.get("/")
@@ -77,5 +156,8 @@ def health():
 
 
 if __name__ == "__main__":
+    # Development server with auto-reload; `python serve.py` runs production workers
     print(f"server listening on :{PORT}")
+    import uvicorn
+
     uvicorn.run("index:app", host="0.0.0.0", port=PORT, reload=True)
@@ -0,0 +1,292 @@
+"""
+Request and query instrumentation.
+
+Each request carries a small dict of phase timings (auth, db-connect, db,
+serialize) in a context variable; the layers that own a phase add to it, and
+MetricsMiddleware turns it into a `Server-Timing` header and records the
+per-route latency histogram. SQL statements are timed where cursors are
+handed out (routes.get_cursor, AsyncConnection) and logged when slower than
+SLOW_QUERY_MS. Everything is exposed in Prometheus text format at /metrics.
+
+Recording is a few perf_counter() calls and dict updates per request; there
+is no background thread and nothing is exported unless /metrics is scraped.
+"""
+import bisect
+import contextvars
+import re
+import threading
+import time
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+
+from config import SLOW_QUERY_MS
+
+# Seconds; the default buckets of every histogram
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Distinct SQL statements tracked before the rest are folded into "other"
+MAX_STATEMENTS = 300
+# Statement texts whose label is remembered (IN lists of every length map to one label)
+MAX_STATEMENT_TEXTS = 3000
+STATEMENT_LABEL_LENGTH = 120
+
+_timings: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("request_timings", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    return ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series: dict = {}  # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, seconds: float, *labels):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for values, series in sorted(snapshot.items()):
+            base = _labels(self.labels, values)
+            sep = "," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {cumulative}')
+            suffix = f"{{{base}}}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values: dict = {}
+
+    def inc(self, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = dict(self._values)
+        for values, count in sorted(snapshot.items()):
+            base = _labels(self.labels, values)
+            lines.append(f"{self.name}{{{base}}} {count}" if base else f"{self.name} {count}")
+        return lines
+
+
+request_duration = Histogram("mikuu_http_request_duration_seconds", "Request latency by route.", ("method", "route"))
+responses = Counter("mikuu_http_responses_total", "Responses by route and status code.", ("method", "route", "status"))
+phase_duration = Histogram("mikuu_request_phase_seconds", "Time per request spent in each phase.", ("phase",))
+query_duration = Histogram("mikuu_db_query_duration_seconds", "SQL statement execution time.", ("statement",))
+slow_queries = Counter("mikuu_db_slow_queries_total", f"Statements slower than SLOW_QUERY_MS ({SLOW_QUERY_MS:g} ms).")
+exceptions = Counter("mikuu_http_exceptions_total", "Unhandled exceptions by route.", ("route",))
+verifications = Counter("mikuu_payment_verifications_total", "On-chain payment checks by outcome.", ("outcome",))
+write_batch_size = Histogram(
+    "mikuu_write_batch_size", "Writes per group commit (WRITE_COALESCE).", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+write_wait = Histogram("mikuu_write_wait_seconds", "Time from queueing a coalesced write to its commit.")
+
+METRICS = (request_duration, responses, phase_duration, query_duration, slow_queries, exceptions, verifications, write_batch_size, write_wait)
+
+
+# ── per-request phase timings ─────────────────────────────
+
+def add_timing(phase: str, seconds: float):
+    """Attribute `seconds` to `phase` of the current request (no-op outside one)."""
+    timings = _timings.get()
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+
+class timed:
+    """`with timed("db-connect"): ...` adds the block's duration to that phase."""
+
+    __slots__ = ("phase", "start")
+
+    def __init__(self, phase: str):
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        add_timing(self.phase, time.perf_counter() - self.start)
+        return False
+
+
+# ── SQL statements ────────────────────────────────────────
+
+_statement_labels: dict = {}  # statement text -> label
+_known_labels: set = set()
+_SELECT_LIST_RE = re.compile(r"^(SELECT) .+? FROM ")
+_INSERT_COLUMNS_RE = re.compile(r"^(INSERT INTO \w+) \([^)]*\)")
+_IN_LIST_RE = re.compile(r"IN \((?:\?|%s)(?:, (?:\?|%s))*\)")
+
+
+def statement_label(sql) -> str:
+    label = _statement_labels.get(sql)
+    if label is None:
+        if len(_statement_labels) >= MAX_STATEMENT_TEXTS:
+            return "other"
+        text = " ".join((sql.decode(errors="replace") if isinstance(sql, bytes) else str(sql)).split())
+        # Column and IN lists are elided so statements differ where it matters (table, WHERE)
+        text = _SELECT_LIST_RE.sub(r"\1 … FROM ", text, count=1)
+        text = _INSERT_COLUMNS_RE.sub(r"\1 (…)", text, count=1)
+        text = _IN_LIST_RE.sub("IN (…)", text)
+        label = text[:STATEMENT_LABEL_LENGTH]
+        if label not in _known_labels:
+            if len(_known_labels) >= MAX_STATEMENTS:
+                label = "other"
+            else:
+                _known_labels.add(label)
+        _statement_labels[sql] = label
+    return label
+
+
+def observe_query(sql, seconds: float):
+    add_timing("db", seconds)
+    label = statement_label(sql)
+    query_duration.observe(seconds, label)
+    if SLOW_QUERY_MS and seconds * 1000 >= SLOW_QUERY_MS:
+        slow_queries.inc()
+        print(f"SLOW QUERY {seconds * 1000:.1f} ms: {label}")
+
+
+class TimedCursor:
+    """DB-API cursor proxy that times execute/executemany and row fetches."""
+
+    __slots__ = ("_cursor",)
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=None):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(sql) if params is None else self._cursor.execute(sql, params)
+        finally:
+            observe_query(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, seq)
+        finally:
+            observe_query(sql, time.perf_counter() - start)
+
+    def fetchone(self):
+        with timed("db"):
+            return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        with timed("db"):
+            return self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+
+    def fetchall(self):
+        with timed("db"):
+            return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+# ── middleware ────────────────────────────────────────────
+
+PHASES = ("auth", "db-connect", "db", "serialize")
+
+
+def route_label(scope) -> str:
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+def server_timing(timings: dict, total: float) -> str:
+    parts = [f"{phase};dur={timings[phase] * 1000:.2f}" for phase in PHASES if phase in timings]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request, adds a Server-Timing header with the phase
+    split, and records per-route latency and status counts. Routes are
+    labelled by their path template so ids don't multiply the series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: dict = {}
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing(timings, time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            label = route_label(scope)
+            request_duration.observe(time.perf_counter() - start, scope["method"], label)
+            responses.inc(scope["method"], label, status)
+            for phase, seconds in timings.items():
+                phase_duration.observe(seconds, phase)
+
+
+# ── exposition ────────────────────────────────────────────
+
+def render(gauges: dict) -> str:
+    """
+    Prometheus text format for all metrics plus `gauges`, a mapping of
+    metric name -> stats dict (e.g. pool_stats()); numeric entries become
+    `name{stat="key"} value`.
+    """
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    for name, stats in gauges.items():
+        lines.append(f"# TYPE {name} gauge")
+        for key, value in (stats or {}).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f'{name}{{stat="{_escape(key)}"}} {value}')
+    return "\n".join(lines) + "\n"
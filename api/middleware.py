@@ -1,9 +1,14 @@
 """Middleware for wallet-based auth and rate limiting."""
-import time
+import math
 import re
-from collections import defaultdict
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+import time
+from typing import Optional
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+
+from ratelimit import RateLimiter, Limit
+from metrics import add_timing
 
 # ── Address validation ──────────────────────────────────────
 ETH_ADDRESS_RE = re.compile(r"^0x[0-9a-fA-F]{40}$")
@@ -13,39 +18,111 @@ def is_valid_address(addr: str) -> bool:
     return bool(ETH_ADDRESS_RE.match(addr))
 
 
+def normalize_address(addr: str) -> str:
+    """Canonical stored form of an address: trimmed and lowercased."""
+    return (addr or "").strip().lower()
+
+
+def normalize_email(email: str) -> str:
+    """Canonical stored form of an email: trimmed and lowercased."""
+    return (email or "").strip().lower()
+
+
+TX_HASH_RE = re.compile(r"^0x[0-9a-fA-F]{64}$")
+
+
+def is_valid_tx_hash(tx_hash: str) -> bool:
+    """Check if a string is a 32-byte hex transaction hash."""
+    return bool(TX_HASH_RE.match(tx_hash))
+
+
+def normalize_tx_hash(tx_hash: str) -> str:
+    """Canonical stored form of a transaction hash: lowercased, like addresses."""
+    return (tx_hash or "").strip().lower()
+
+
+PHONE_SEPARATORS_RE = re.compile(r"[\s().\-/]")
+E164_RE = re.compile(r"^\+?[0-9]{3,15}$")
+
+
+def normalize_phone(phone: str) -> str:
+    """
+    Canonical stored form of a phone number, E.164 style: separators dropped
+    and a 00 international prefix written as "+". Numbers given without a
+    country code stay national (digits only); anything that isn't a phone
+    number is only trimmed.
+    """
+    raw = (phone or "").strip()
+    digits = PHONE_SEPARATORS_RE.sub("", raw)
+    if digits.startswith("00"):
+        digits = "+" + digits[2:]
+    return digits if E164_RE.match(digits) else raw
+
+
 # ── Rate limiter ────────────────────────────────────────────
-class RateLimitMiddleware(BaseHTTPMiddleware):
+# Both middlewares are plain ASGI callables rather than BaseHTTPMiddleware
+# subclasses: they inspect the scope, and either write an error response
+# directly or pass the untouched receive/send channels through.
+
+class RateLimitMiddleware:
     """
-    Simple sliding-window rate limiter.
-    Limits each IP to `max_requests` per `window_seconds`.
-    In serverless (Vercel), the window resets on cold starts,
-    but still prevents burst abuse within a single instance.
+    GCRA rate limiter (see ratelimit.py) applied per IP, per wallet and per route.
+    - every request counts against `ip_limit` for the client IP
+    - mutating requests with a valid X-Wallet-Address also count against
+      `wallet_limit`, per (IP, wallet): the header is not authenticated, so a
+      bucket keyed on the wallet alone would let anyone exhaust another
+      user's quota
+    - `route_limits` maps (METHOD, path) to a tighter per-IP limit for that route
+    With the in-memory backend the state resets on cold starts; the "db"
+    backend shares it across workers and instances.
     """
 
-    def __init__(self, app, max_requests: int = 60, window_seconds: int = 60):
-        super().__init__(app)
-        self.max_requests = max_requests
-        self.window_seconds = window_seconds
-        self.requests: dict[str, list[float]] = defaultdict(list)
+    def __init__(self, app, limiter: RateLimiter, ip_limit: Limit,
+                 wallet_limit: Optional[Limit] = None, route_limits: Optional[dict] = None):
+        self.app = app
+        self.limiter = limiter
+        self.ip_limit = ip_limit
+        self.wallet_limit = wallet_limit
+        self.route_limits = route_limits or {}
 
-    async def dispatch(self, request: Request, call_next):
-        client_ip = request.client.host if request.client else "unknown"
-        now = time.time()
-        cutoff = now - self.window_seconds
+    def rules(self, method: str, path: str, client_ip: str, wallet: str) -> list:
+        path = path[4:] if path.startswith("/api/") else path
+        rules = []
+        route_limit = self.route_limits.get((method, path))
+        if route_limit:
+            rules.append((f"route:{method} {path}:{client_ip}", route_limit))
+        if wallet and self.wallet_limit and method in PROTECTED_METHODS:
+            rules.append((f"wallet:{client_ip}:{wallet}", self.wallet_limit))
+        rules.append((f"ip:{client_ip}", self.ip_limit))
+        return rules
 
-        # Prune old entries
-        self.requests[client_ip] = [
-            t for t in self.requests[client_ip] if t > cutoff
-        ]
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        if len(self.requests[client_ip]) >= self.max_requests:
-            raise HTTPException(
+        start = time.perf_counter()
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
+        wallet = Headers(scope=scope).get("x-wallet-address", "")
+        wallet = wallet.lower() if is_valid_address(wallet) else ""
+        rules = self.rules(scope["method"], scope["path"], client_ip, wallet)
+
+        if getattr(self.limiter.backend, "is_blocking", False):
+            allowed, retry_after, _ = await run_in_threadpool(self.limiter.check, rules)
+        else:
+            allowed, retry_after, _ = self.limiter.check(rules)
+        add_timing("auth", time.perf_counter() - start)
+
+        if not allowed:
+            response = JSONResponse(
+                {"detail": "rate limit exceeded — try again later"},
                 status_code=429,
-                detail="rate limit exceeded — try again later",
+                headers={"Retry-After": str(math.ceil(retry_after))},
             )
-
-        self.requests[client_ip].append(now)
-        return await call_next(request)
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
 
 
 # ── Wallet auth ─────────────────────────────────────────────
@@ -55,30 +132,38 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
 PROTECTED_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
 PUBLIC_PATHS = {"/health", "/api/health", "/api/invoices"}  # GET invoices is public
 
-class WalletAuthMiddleware(BaseHTTPMiddleware):
+class WalletAuthMiddleware:
     """
     Requires X-Wallet-Address header on mutating requests.
     Validates the header is a proper Ethereum address.
-    Individual route handlers check ownership against this value.
+    Individual route handlers check ownership against this value
+    (exposed as `request.state.wallet`).
     """
 
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state = scope.setdefault("state", {})
         # Only protect mutating methods
-        if request.method in PROTECTED_METHODS:
-            wallet = request.headers.get("x-wallet-address", "")
+        if scope["method"] in PROTECTED_METHODS:
+            start = time.perf_counter()
+            wallet = Headers(scope=scope).get("x-wallet-address", "")
+            valid = is_valid_address(wallet)
+            add_timing("auth", time.perf_counter() - start)
             if not wallet:
-                raise HTTPException(
-                    status_code=401,
-                    detail="X-Wallet-Address header required",
-                )
-            if not is_valid_address(wallet):
-                raise HTTPException(
-                    status_code=400,
-                    detail="invalid wallet address format",
-                )
+                await JSONResponse({"detail": "X-Wallet-Address header required"}, status_code=401)(scope, receive, send)
+                return
+            if not valid:
+                await JSONResponse({"detail": "invalid wallet address format"}, status_code=400)(scope, receive, send)
+                return
             # Store for route handlers to use
-            request.state.wallet = wallet.lower()
+            state["wallet"] = wallet.lower()
         else:
-            request.state.wallet = None
+            state["wallet"] = None
 
-        return await call_next(request)
+        await self.app(scope, receive, send)
@@ -0,0 +1,399 @@
+"""
+Versioned schema migrations.
+
+Each migration runs once, in order, and records its number in the
+`schema_version` table. When the database is current, startup costs a single
+SELECT; with AUTO_MIGRATE=false it costs nothing and migrations are applied
+out-of-band before deploying:
+
+    python migrations.py          # apply pending migrations
+    python migrations.py status   # show current / latest version
+"""
+import os
+import sqlite3
+import sys
+
+from amounts import format_minor, parse_legacy
+from config import DB_PATH, DATABASE_URL, AUTO_MIGRATE
+from database import get_db, postgres_dsn
+from middleware import normalize_phone
+from search import search_index_statements, archive_search_index_statements, drop_fts_statements
+
+# Arbitrary constant key for pg_advisory_xact_lock, so concurrent deploys serialize
+MIGRATION_LOCK_ID = 7_201_533
+
+
+# ── helpers ───────────────────────────────────────────────
+
+def _columns(cursor, table: str) -> set:
+    if DATABASE_URL:
+        cursor.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s", (table,))
+        return {row[0] for row in cursor.fetchall()}
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+def _add_column(cursor, table: str, column: str, ddl: str):
+    """ALTER TABLE ... ADD COLUMN, skipped when a pre-versioning database already has it."""
+    if column not in _columns(cursor, table):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+# ── migrations ────────────────────────────────────────────
+
+def _base_tables(cursor):
+    # Note: SQLite uses 'id TEXT PRIMARY KEY', Postgres uses same.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS invoices (
+            id TEXT PRIMARY KEY,
+            merchant_address TEXT NOT NULL,
+            customer_email TEXT DEFAULT '',
+            amount TEXT NOT NULL,
+            token_address TEXT NOT NULL,
+            memo TEXT NOT NULL,
+            status TEXT DEFAULT 'PENDING',
+            created_at TEXT NOT NULL,
+            paid_at TEXT,
+            expires_at TEXT,
+            payment_link TEXT,
+            tempo_tx_hash TEXT DEFAULT '',
+            payer_address TEXT DEFAULT '',
+            tempo_chain_id TEXT,
+            tempo_rpc TEXT,
+            stablecoin_name TEXT DEFAULT 'USD Stablecoin',
+            fee_sponsored TEXT DEFAULT 'false'
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS contacts (
+            id TEXT PRIMARY KEY,
+            owner_wallet TEXT NOT NULL,
+            name TEXT NOT NULL,
+            wallet_address TEXT NOT NULL,
+            email TEXT DEFAULT '',
+            phone TEXT DEFAULT ''
+        )
+    """)
+
+
+def _legacy_columns(cursor):
+    # Columns added before migrations were versioned
+    _add_column(cursor, "contacts", "phone", "TEXT DEFAULT ''")
+    _add_column(cursor, "invoices", "fee_sponsored", "TEXT DEFAULT 'false'")
+
+
+def _lowercase_lookup_columns(cursor):
+    # Addresses and emails are stored lowercase so lookups can use plain
+    # equality against these indexes instead of LOWER() scans.
+    for sql in (
+        "UPDATE invoices SET merchant_address = LOWER(merchant_address) WHERE merchant_address <> LOWER(merchant_address)",
+        "UPDATE invoices SET payer_address = LOWER(payer_address) WHERE payer_address <> LOWER(payer_address)",
+        "UPDATE invoices SET token_address = LOWER(token_address) WHERE token_address <> LOWER(token_address)",
+        "UPDATE invoices SET customer_email = LOWER(customer_email) WHERE customer_email <> LOWER(customer_email)",
+        "UPDATE contacts SET owner_wallet = LOWER(owner_wallet) WHERE owner_wallet <> LOWER(owner_wallet)",
+        "UPDATE contacts SET wallet_address = LOWER(wallet_address) WHERE wallet_address <> LOWER(wallet_address)",
+        "UPDATE contacts SET email = LOWER(TRIM(email)) WHERE email <> LOWER(TRIM(email))",
+        "UPDATE contacts SET phone = TRIM(phone) WHERE phone <> TRIM(phone)",
+        "CREATE INDEX IF NOT EXISTS idx_invoices_merchant_created ON invoices (merchant_address, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_invoices_payer_created ON invoices (payer_address, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_contacts_owner_email ON contacts (owner_wallet, email)",
+        "CREATE INDEX IF NOT EXISTS idx_contacts_owner_phone ON contacts (owner_wallet, phone)",
+    ):
+        cursor.execute(sql)
+
+
+def _versions_table(cursor):
+    # Version counters behind the read endpoints' ETags (see repository.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS versions (
+            scope TEXT PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0
+        )
+    """)
+
+
+def _rate_limits_table(cursor):
+    # Shared GCRA state for RATE_LIMIT_BACKEND=db (see ratelimit.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            key TEXT PRIMARY KEY,
+            tat DOUBLE PRECISION NOT NULL
+        )
+    """)
+
+
+SUMMARY_COLUMNS = ("pending_count", "pending_minor", "paid_count", "received_minor", "sent_count", "sent_minor")
+
+
+def _amount_minor_units(cursor):
+    # Exact integer amounts (see amounts.py); `amount` is rewritten in canonical form
+    _add_column(cursor, "invoices", "amount_minor", "BIGINT NOT NULL DEFAULT 0")
+    p = "%s" if DATABASE_URL else "?"
+    cursor.execute("SELECT id, amount FROM invoices")
+    updates = []
+    for invoice_id, amount in cursor.fetchall():
+        minor = parse_legacy(amount)
+        updates.append((minor, format_minor(minor), invoice_id))
+    if updates:
+        cursor.executemany(f"UPDATE invoices SET amount_minor = {p}, amount = {p} WHERE id = {p}", updates)
+
+
+def _wallet_summaries(cursor):
+    # Per-wallet totals kept current by repository.update_summaries; bucket is
+    # 'all' or a YYYY-MM-DD day, token is the token address.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS wallet_summaries (
+            wallet TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            token TEXT NOT NULL,
+            pending_count BIGINT NOT NULL DEFAULT 0,
+            pending_minor BIGINT NOT NULL DEFAULT 0,
+            paid_count BIGINT NOT NULL DEFAULT 0,
+            received_minor BIGINT NOT NULL DEFAULT 0,
+            sent_count BIGINT NOT NULL DEFAULT 0,
+            sent_minor BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (wallet, bucket, token)
+        )
+    """)
+    # Backfill from existing invoices: pending amounts by creation day,
+    # payments received (merchant) and sent (payer) by payment day
+    paid_day = "SUBSTR(COALESCE(paid_at, created_at), 1, 10)"
+    sources = [
+        ("merchant_address", "SUBSTR(created_at, 1, 10)", "status = 'PENDING'", ("COUNT(*)", "SUM(amount_minor)", "0", "0", "0", "0")),
+        ("merchant_address", paid_day, "status = 'PAID'", ("0", "0", "COUNT(*)", "SUM(amount_minor)", "0", "0")),
+        ("payer_address", paid_day, "status = 'PAID' AND payer_address <> ''", ("0", "0", "0", "0", "COUNT(*)", "SUM(amount_minor)")),
+    ]
+    columns = ", ".join(SUMMARY_COLUMNS)
+    accumulate = ", ".join(f"{c} = wallet_summaries.{c} + excluded.{c}" for c in SUMMARY_COLUMNS)
+    for wallet, day, where, aggregates in sources:
+        # Postgres rejects a string constant in GROUP BY, so 'all' is left out of it
+        for bucket, group_by in (("'all'", f"{wallet}, token_address"), (day, f"{wallet}, {day}, token_address")):
+            cursor.execute(
+                f"INSERT INTO wallet_summaries (wallet, bucket, token, {columns}) "
+                f"SELECT {wallet}, {bucket}, token_address, {', '.join(aggregates)} FROM invoices "
+                f"WHERE {where} GROUP BY {group_by} "
+                f"ON CONFLICT (wallet, bucket, token) DO UPDATE SET {accumulate}"
+            )
+
+
+def _expiry_index(cursor):
+    # Lets the expiry sweeper find overdue PENDING invoices without a scan
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_status_expires ON invoices (status, expires_at)")
+
+
+def _payment_verification(cursor):
+    # verification: NULL (not checked), QUEUED, VERIFIED or REJECTED;
+    # verify_after: lease / retry time for the verifier's next look
+    _add_column(cursor, "invoices", "verification", "TEXT")
+    _add_column(cursor, "invoices", "verify_after", "TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_verification ON invoices (verification, paid_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_tx_hash ON invoices (tempo_tx_hash)")
+
+
+def _e164_phones(cursor):
+    # Contact phones are stored normalized (middleware.normalize_phone) so
+    # lookups and /contacts/resolve can match them with plain equality
+    p = "%s" if DATABASE_URL else "?"
+    cursor.execute("SELECT id, phone FROM contacts WHERE phone <> ''")
+    updates = [(normalize_phone(phone), contact_id) for contact_id, phone in cursor.fetchall() if normalize_phone(phone) != phone]
+    if updates:
+        cursor.executemany(f"UPDATE contacts SET phone = {p} WHERE id = {p}", updates)
+
+
+
+def _search_indexes(cursor):
+    # Full-text search (see search.py): FTS5 tables + sync triggers on SQLite,
+    # GIN expression indexes on Postgres
+    for sql in search_index_statements():
+        cursor.execute(sql)
+
+
+def _invoice_archive(cursor):
+    # Cold storage for old PAID / EXPIRED invoices (see archive.py). Same
+    # columns as invoices; a migration adding an invoice column adds it here too.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS invoices_archive (
+            id TEXT PRIMARY KEY,
+            merchant_address TEXT NOT NULL,
+            customer_email TEXT DEFAULT '',
+            amount TEXT NOT NULL,
+            amount_minor BIGINT NOT NULL DEFAULT 0,
+            token_address TEXT NOT NULL,
+            memo TEXT NOT NULL,
+            status TEXT DEFAULT 'PENDING',
+            created_at TEXT NOT NULL,
+            paid_at TEXT,
+            expires_at TEXT,
+            payment_link TEXT,
+            tempo_tx_hash TEXT DEFAULT '',
+            payer_address TEXT DEFAULT '',
+            tempo_chain_id TEXT,
+            tempo_rpc TEXT,
+            stablecoin_name TEXT DEFAULT 'USD Stablecoin',
+            fee_sponsored TEXT DEFAULT 'false',
+            verification TEXT,
+            verify_after TEXT
+        )
+    """)
+    for sql in (
+        # the archiver's scan of the hot table
+        "CREATE INDEX IF NOT EXISTS idx_invoices_status_created ON invoices (status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_invoices_archive_merchant_created ON invoices_archive (merchant_address, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_invoices_archive_payer_created ON invoices_archive (payer_address, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_invoices_archive_tx_hash ON invoices_archive (tempo_tx_hash)",
+    ):
+        cursor.execute(sql)
+    for sql in archive_search_index_statements():
+        cursor.execute(sql)
+
+
+def _fixed_width_timestamps(cursor):
+    # created_at / paid_at used to be written without ".ffffff" when the
+    # microseconds were 0; pad them to the utc_timestamp() width so they
+    # compare correctly as strings
+    for table in ("invoices", "invoices_archive"):
+        for column in ("created_at", "paid_at"):
+            cursor.execute(
+                f"UPDATE {table} SET {column} = SUBSTR({column}, 1, 19) || '.000000Z' "
+                f"WHERE LENGTH({column}) = 20"
+            )
+
+
+def _wallet_keyset_indexes(cursor):
+    # Wallet listings read each role's index in (created_at, id) order; with id
+    # in the index the keyset tie-break needs no sort either
+    for table in ("invoices", "invoices_archive"):
+        for column in ("merchant_address", "payer_address"):
+            role = column.split("_")[0]
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{role}_created_id ON {table} ({column}, created_at, id)")
+            cursor.execute(f"DROP INDEX IF EXISTS idx_{table}_{role}_created")
+
+
+def _lowercase_tx_hashes(cursor):
+    # Hashes are compared case-sensitively (verifier, idx_invoices_tx_hash), so
+    # store them lowercased like addresses
+    for table in ("invoices", "invoices_archive"):
+        cursor.execute(f"UPDATE {table} SET tempo_tx_hash = LOWER(tempo_tx_hash) WHERE tempo_tx_hash <> LOWER(tempo_tx_hash)")
+
+
+def _stable_search_keys(cursor):
+    # The first FTS5 tables were keyed on the implicit rowid of the TEXT-keyed
+    # tables, which VACUUM may renumber; rebuild them on explicit INTEGER keys
+    for sql in drop_fts_statements() + search_index_statements() + archive_search_index_statements():
+        cursor.execute(sql)
+
+
+# (version, description, function) — append only, never renumber
+MIGRATIONS = [
+    (1, "base invoices and contacts tables", _base_tables),
+    (2, "legacy phone / fee_sponsored columns", _legacy_columns),
+    (3, "lowercase lookup columns and wallet indexes", _lowercase_lookup_columns),
+    (4, "versions table", _versions_table),
+    (5, "rate_limits table", _rate_limits_table),
+    (6, "integer amount_minor column", _amount_minor_units),
+    (7, "wallet_summaries table", _wallet_summaries),
+    (8, "invoice expiry index", _expiry_index),
+    (9, "payment verification queue", _payment_verification),
+    (10, "E.164 contact phones", _e164_phones),
+    (11, "full-text search indexes", _search_indexes),
+    (12, "invoices_archive table", _invoice_archive),
+    (13, "fixed-width invoice timestamps", _fixed_width_timestamps),
+    (14, "wallet keyset indexes with id", _wallet_keyset_indexes),
+    (15, "lowercase transaction hashes", _lowercase_tx_hashes),
+    (16, "search indexes on stable integer keys", _stable_search_keys),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ── runner ────────────────────────────────────────────────
+
+def current_version() -> int:
+    """Schema version of the database, 0 if it has never been migrated."""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT MAX(version) FROM schema_version")
+        except Exception:
+            return 0
+        row = cursor.fetchone()
+    return (row[0] or 0) if row else 0
+
+
+def _connect():
+    """A dedicated connection with explicit transaction control, outside the pool."""
+    if DATABASE_URL:
+        import psycopg2
+
+        return psycopg2.connect(postgres_dsn(), connect_timeout=10)
+    return sqlite3.connect(DB_PATH, isolation_level=None)
+
+
+def migrate() -> list:
+    """Apply pending migrations, each in its own transaction. Returns the versions applied."""
+    conn = _connect()
+    applied = []
+    try:
+        cursor = conn.cursor()
+        cursor.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, applied_at TEXT NOT NULL)")
+        if DATABASE_URL:
+            conn.commit()
+        for version, description, apply in MIGRATIONS:
+            if DATABASE_URL:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            else:
+                cursor.execute("BEGIN IMMEDIATE")
+            p = "%s" if DATABASE_URL else "?"
+            cursor.execute(f"SELECT 1 FROM schema_version WHERE version = {p}", (version,))
+            if cursor.fetchone() is not None:
+                conn.commit() if DATABASE_URL else cursor.execute("COMMIT")
+                continue
+            try:
+                apply(cursor)
+                cursor.execute(
+                    f"INSERT INTO schema_version (version, applied_at) VALUES ({p}, CURRENT_TIMESTAMP)",
+                    (version,),
+                )
+            except Exception:
+                conn.rollback() if DATABASE_URL else cursor.execute("ROLLBACK")
+                raise
+            conn.commit() if DATABASE_URL else cursor.execute("COMMIT")
+            print(f"migration {version} applied: {description}")
+            applied.append(version)
+    finally:
+        conn.close()
+    return applied
+
+
+def init_db():
+    """Startup hook: bring the schema up to date unless AUTO_MIGRATE is off."""
+    if not AUTO_MIGRATE:
+        return
+    if not DATABASE_URL:
+        # Check if we are in a production/serverless environment like Vercel
+        # Vercel's filesystem is read-only except for /tmp
+        if os.getenv("VERCEL") or os.getenv("NOW_REGION"):
+            print("WARNING: DATABASE_URL not set in production. Skipping SQLite initialization as filesystem is read-only.")
+            return
+
+    try:
+        if current_version() >= LATEST_VERSION:
+            return
+        migrate()
+        print("database initialized")
+    except Exception as e:
+        print(f"Error initializing database: {e}")
+        if not DATABASE_URL:
+            print("CRITICAL: DATABASE_URL (Postgres) is not set.")
+            print("Vercel's filesystem is read-only, so SQLite ('mikuu.db') will FAIL.")
+            print("Please set DATABASE_URL in your Vercel Environment Variables.")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    if command == "status":
+        print(f"schema version {current_version()} (latest {LATEST_VERSION})")
+    elif command == "migrate":
+        applied = migrate()
+        print(f"applied {len(applied)} migration(s); schema version {current_version()}")
+    else:
+        sys.exit(f"unknown command: {command} (expected 'migrate' or 'status')")
@@ -1,13 +1,15 @@
-from typing import Optional
+from decimal import Decimal
+from typing import List, Optional
 from pydantic import BaseModel
 
 
 class CreateInvoiceRequest(BaseModel):
     merchantAddress: str
     customerEmail: Optional[str] = ""
-    amount: float
+    amount: Decimal  # parsed exactly; stored as integer minor units (see amounts.py)
     tokenAddress: str
     memo: Optional[str] = ""
+    ttlSeconds: Optional[int] = None  # expire after this long if unpaid; 0 = never
 
 
 class MarkPaidRequest(BaseModel):
@@ -21,3 +23,19 @@ class CreateContactRequest(BaseModel):
     walletAddress: str
     email: Optional[str] = ""
     phone: Optional[str] = ""
+
+
+class ResolveContactsRequest(BaseModel):
+    wallet: Optional[str] = ""  # defaults to the caller's address book
+    emails: List[str] = []
+    phones: List[str] = []
+
+
+class BulkInvoiceItem(CreateInvoiceRequest):
+    # When txHash is set the invoice is recorded as already PAID
+    txHash: Optional[str] = ""
+    payerAddress: Optional[str] = ""
+
+
+class BulkInvoiceRequest(BaseModel):
+    invoices: List[BulkInvoiceItem]
@@ -0,0 +1,103 @@
+"""
+Invoice status notifications for the SSE / long-poll endpoints.
+
+Waiters park an asyncio future per invoice id; `publish` resolves them from
+any thread (sync handlers run in the threadpool). With DATABASE_URL set,
+status changes are also sent with pg_notify and a background LISTEN thread
+republishes them locally, so waiters and caches on other instances see them
+too. The app starts that thread at startup (`start_listener`), not on the
+first subscriber, because the invoice cache relies on it as well.
+"""
+import asyncio
+import select
+import threading
+import time
+
+from config import DATABASE_URL
+
+CHANNEL = "invoice_status"
+
+
+class InvoiceNotifier:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: dict = {}  # invoice id -> set of (loop, future)
+        self._callbacks: list = []
+        self._listener = None
+
+    def add_callback(self, callback):
+        """Call `callback(invoice_id)` on every publish, in the publishing thread."""
+        self._callbacks.append(callback)
+
+    def subscribe(self, invoice_id: str) -> asyncio.Future:
+        """Future resolved on the next status change of `invoice_id`."""
+        self.start_listener()
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        with self._lock:
+            self._waiters.setdefault(invoice_id, set()).add((loop, fut))
+        return fut
+
+    def unsubscribe(self, invoice_id: str, fut: asyncio.Future):
+        with self._lock:
+            waiters = self._waiters.get(invoice_id)
+            if waiters:
+                waiters.discard((fut.get_loop(), fut))
+                if not waiters:
+                    del self._waiters[invoice_id]
+
+    def publish(self, invoice_id: str):
+        for callback in self._callbacks:
+            callback(invoice_id)
+        with self._lock:
+            waiters = self._waiters.pop(invoice_id, ())
+        for loop, fut in waiters:
+            loop.call_soon_threadsafe(_resolve, fut)
+
+    def waiting(self) -> int:
+        with self._lock:
+            return sum(len(w) for w in self._waiters.values())
+
+    # ── Postgres LISTEN ───────────────────────────────────
+
+    def start_listener(self):
+        """Start the LISTEN thread (once per process) when DATABASE_URL is set."""
+        if not DATABASE_URL:
+            return
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="invoice-listen", daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        import psycopg2
+        from database import postgres_dsn
+
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(postgres_dsn(), connect_timeout=10)
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {CHANNEL}")
+                backoff = 1
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.publish(conn.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"ERROR: invoice LISTEN connection lost: {e}")
+                if conn is not None:
+                    conn.close()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+
+def _resolve(fut: asyncio.Future):
+    if not fut.done():
+        fut.set_result(True)
+
+
+notifier = InvoiceNotifier()
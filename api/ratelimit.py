@@ -0,0 +1,139 @@
+"""
+GCRA rate limiting (the "generic cell rate algorithm", a token bucket that
+stores a single timestamp per key). Each check is O(1): one lookup and one
+write of the key's theoretical arrival time (TAT).
+
+Backends:
+- MemoryBackend: per-process, bounded LRU of client keys.
+- DatabaseBackend: one upsert per check against the `rate_limits` table, so
+  limits hold across uvicorn workers and serverless instances.
+"""
+import itertools
+import time
+from collections import OrderedDict
+
+from database import get_db, get_placeholder, DATABASE_URL
+
+
+class Limit:
+    """`count` requests per `period` seconds, allowing a burst of `count`."""
+
+    def __init__(self, count: int, period: float):
+        self.count = count
+        self.period = period
+        self.interval = period / count  # emission interval between requests
+
+    def __repr__(self):
+        return f"Limit({self.count}/{self.period}s)"
+
+
+def gcra(tat: float, now: float, limit: Limit):
+    """
+    Apply one request to a stored TAT. Returns (allowed, new_tat, retry_after).
+    A request is allowed while the TAT stays within one period of `now`.
+    """
+    new_tat = max(tat, now) + limit.interval
+    overshoot = new_tat - now - limit.period
+    if overshoot > 0:
+        return False, tat, overshoot
+    return True, new_tat, 0.0
+
+
+class MemoryBackend:
+    """In-process store. Least recently seen keys are evicted past `max_keys`."""
+
+    def __init__(self, max_keys: int = 10_000):
+        self.max_keys = max_keys
+        self._tats: OrderedDict = OrderedDict()
+
+    def hit(self, key: str, limit: Limit, now: float):
+        allowed, new_tat, retry_after = gcra(self._tats.get(key, 0.0), now, limit)
+        self._tats[key] = new_tat
+        self._tats.move_to_end(key)
+        if len(self._tats) > self.max_keys:
+            self._tats.popitem(last=False)
+        return allowed, retry_after
+
+    def refund(self, key: str, limit: Limit):
+        """Give back one allowed hit on `key`."""
+        if key in self._tats:
+            self._tats[key] -= limit.interval
+
+    def __len__(self):
+        return len(self._tats)
+
+
+class DatabaseBackend:
+    """
+    Shared store in the app database. The GCRA update is a single atomic
+    upsert whose WHERE clause rejects the write when the limit is exceeded.
+    Expired keys are purged every `purge_every` checks.
+    """
+
+    is_blocking = True
+
+    def __init__(self, purge_every: int = 1000):
+        p = get_placeholder()
+        greatest = "GREATEST" if DATABASE_URL else "MAX"
+        self.upsert_sql = f"""
+            INSERT INTO rate_limits (key, tat) VALUES ({p}, {p})
+            ON CONFLICT (key) DO UPDATE
+                SET tat = {greatest}(rate_limits.tat, {p}) + {p}
+                WHERE {greatest}(rate_limits.tat, {p}) + {p} - {p} <= {p}
+            RETURNING tat"""
+        self.select_sql = f"SELECT tat FROM rate_limits WHERE key = {p}"
+        self.purge_sql = f"DELETE FROM rate_limits WHERE tat < {p}"
+        self.refund_sql = f"UPDATE rate_limits SET tat = tat - {p} WHERE key = {p}"
+        self.purge_every = purge_every
+        self._calls = itertools.count(1)  # hit() runs in threadpool threads; next() is atomic
+
+    def hit(self, key: str, limit: Limit, now: float):
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                self.upsert_sql,
+                (key, now + limit.interval, now, limit.interval, now, limit.interval, now, limit.period),
+            )
+            allowed = cursor.fetchone() is not None
+            retry_after = 0.0
+            if not allowed:
+                cursor.execute(self.select_sql, (key,))
+                row = cursor.fetchone()
+                retry_after = max(row[0] + limit.interval - now - limit.period, 0.0) if row else 0.0
+            if next(self._calls) % self.purge_every == 0:
+                cursor.execute(self.purge_sql, (now,))
+            conn.commit()
+        return allowed, retry_after
+
+    def refund(self, key: str, limit: Limit):
+        with get_db() as conn:
+            conn.cursor().execute(self.refund_sql, (limit.interval, key))
+            conn.commit()
+
+
+class RateLimiter:
+    """
+    Checks a request against an ordered list of (key, Limit) pairs and stops
+    at the first one that is exhausted. A denied request is not counted: the
+    hits it already took from the earlier rules are refunded.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def check(self, rules):
+        """Returns (allowed, retry_after, limit) for the first failing rule, or (True, 0, None)."""
+        now = time.time()
+        for index, (key, limit) in enumerate(rules):
+            allowed, retry_after = self.backend.hit(key, limit, now)
+            if not allowed:
+                for taken_key, taken_limit in rules[:index]:
+                    self.backend.refund(taken_key, taken_limit)
+                return False, retry_after, limit
+        return True, 0.0, None
+
+
+def make_backend(name: str, max_keys: int):
+    if name == "db":
+        return DatabaseBackend()
+    return MemoryBackend(max_keys=max_keys)
@@ -0,0 +1,481 @@
+"""
+Write statements for invoices and contacts, shared by the sync routes and
+async_routes. Each mutation is a single round trip: INSERT/UPDATE/DELETE
+... RETURNING (SQLite >= 3.35 and Postgres) with ownership folded into the
+WHERE clause. Statement text is built once per process so the drivers'
+per-connection statement caches (sqlite3, asyncpg) keep them prepared.
+
+Every write also bumps the version counters (see `versions` in migrations.py)
+that the read endpoints turn into ETags, and applies its delta to the
+per-wallet `wallet_summaries` totals, in the same transaction.
+"""
+from config import VERIFY_PAYMENTS
+from database import get_placeholder, DATABASE_URL
+from notifier import CHANNEL
+from serializers import INVOICE_COLUMNS
+
+p = get_placeholder()
+
+
+def _notifying(sql: str) -> str:
+    """On Postgres, wrap a `... RETURNING *` invoice write so it also pg_notify()s the id."""
+    if not DATABASE_URL:
+        return sql
+    # Announce the change to other instances in the same round trip
+    return f"""WITH changed AS ({sql})
+    SELECT changed.* FROM changed, LATERAL (SELECT pg_notify('{CHANNEL}', changed.id)) AS notified"""
+
+
+# ── hot and archived invoices ─────────────────────────────
+# archive.py moves old PAID / EXPIRED invoices from `invoices` to
+# `invoices_archive`. Reads go over both tables as one UNION ALL, the hot
+# table first: with LIMIT 1 a lookup by id never reaches the archive when the
+# invoice is still hot. Such statements take their parameters once per table
+# (invoice_params).
+
+INVOICE_TABLES = ("invoices", "invoices_archive")
+# Every column of the invoices table, in the order used to copy rows between the two
+INVOICE_TABLE_COLUMNS = (
+    "id", "merchant_address", "customer_email", "amount", "amount_minor", "token_address", "memo", "status",
+    "created_at", "paid_at", "expires_at", "payment_link", "tempo_tx_hash", "payer_address", "tempo_chain_id",
+    "tempo_rpc", "stablecoin_name", "fee_sponsored", "verification", "verify_after",
+)
+_ALL_COLUMNS = ", ".join(INVOICE_TABLE_COLUMNS)
+
+
+def from_invoices(select: str, where: str = "") -> str:
+    """`{select} FROM <table> {where}` over the hot table and the archive, as one UNION ALL."""
+    return " UNION ALL ".join(f"{select} FROM {table} {where}".rstrip() for table in INVOICE_TABLES)
+
+
+def invoice_params(*params) -> tuple:
+    """Parameters for a from_invoices() statement: the same ones for each table."""
+    return params * len(INVOICE_TABLES)
+
+
+INSERT_INVOICE = f"""INSERT INTO invoices 
+    (id, merchant_address, customer_email, amount, amount_minor, token_address, memo, status, created_at, expires_at, payment_link, tempo_chain_id, tempo_rpc)
+    VALUES ({p}, {p}, {p}, {p}, {p}, {p}, {p}, 'PENDING', {p}, {p}, {p}, {p}, {p})
+    RETURNING *"""
+
+SELECT_INVOICE = from_invoices(f"SELECT {INVOICE_COLUMNS}", f"WHERE id = {p}") + " LIMIT 1"
+SELECT_INVOICE_ROW = from_invoices(f"SELECT {_ALL_COLUMNS}", f"WHERE id = {p}") + " LIMIT 1"
+# The invoice plus its version in one round trip: INVOICE_COLUMNS, then version
+SELECT_INVOICE_VERSIONED = from_invoices(
+    f"SELECT {INVOICE_COLUMNS}, (SELECT version FROM versions WHERE scope = {p})", f"WHERE id = {p}"
+) + " LIMIT 1"
+# Only an unexpired PENDING invoice can be paid, so each payment is counted once in the summaries.
+# With VERIFY_PAYMENTS the claimed transaction joins the verifier's queue.
+_PAID_VERIFICATION = "'QUEUED'" if VERIFY_PAYMENTS else "NULL"
+MARK_INVOICE_PAID = _notifying(
+    f"UPDATE invoices SET status = 'PAID', paid_at = {p}, tempo_tx_hash = {p}, payer_address = {p}, "
+    f"verification = {_PAID_VERIFICATION}, verify_after = NULL "
+    f"WHERE id = {p} AND status = 'PENDING' AND (expires_at IS NULL OR expires_at > {p}) RETURNING *"
+)
+DELETE_INVOICE = _notifying(f"DELETE FROM invoices WHERE id = {p} RETURNING *")
+DELETE_OWNED_INVOICE = _notifying(f"DELETE FROM invoices WHERE id = {p} AND merchant_address = {p} RETURNING *")
+INVOICE_EXISTS = f"SELECT 1 FROM invoices WHERE id = {p}"
+DELETE_ARCHIVED_INVOICE = _notifying(f"DELETE FROM invoices_archive WHERE id = {p} RETURNING *")
+DELETE_OWNED_ARCHIVED_INVOICE = _notifying(f"DELETE FROM invoices_archive WHERE id = {p} AND merchant_address = {p} RETURNING *")
+ARCHIVED_INVOICE_EXISTS = f"SELECT 1 FROM invoices_archive WHERE id = {p}"
+# One bounded batch of overdue invoices (idx_invoices_status_expires). On
+# Postgres, rows another sweeper or a payment holds are skipped, not waited on.
+EXPIRE_INVOICES = _notifying(
+    f"UPDATE invoices SET status = 'EXPIRED' WHERE status = 'PENDING' AND id IN "
+    f"(SELECT id FROM invoices WHERE status = 'PENDING' AND expires_at <= {p} ORDER BY expires_at LIMIT {p}"
+    f"{' FOR UPDATE SKIP LOCKED' if DATABASE_URL else ''}) RETURNING *"
+)
+
+# Lease the oldest queued payments to one verifier; the lease doubles as the retry delay
+CLAIM_UNVERIFIED = (
+    f"UPDATE invoices SET verify_after = {p} WHERE verification = 'QUEUED' AND id IN "
+    f"(SELECT id FROM invoices WHERE verification = 'QUEUED' AND (verify_after IS NULL OR verify_after <= {p}) "
+    f"ORDER BY paid_at LIMIT {p}{' FOR UPDATE SKIP LOCKED' if DATABASE_URL else ''}) RETURNING *"
+)
+VERIFY_CHUNK = 500
+# Archived invoices count too: a transaction can't settle a new invoice years later
+SELECT_VERIFIED_PAYMENTS = from_invoices(
+    "SELECT id, tempo_tx_hash, token_address, merchant_address, amount_minor, payer_address",
+    "WHERE verification = 'VERIFIED' AND tempo_tx_hash IN ({0})",
+)
+
+# Settled invoices old enough to archive (idx_invoices_status_created); a
+# payment still waiting for the verifier stays hot
+_ARCHIVABLE = (
+    f"SELECT id FROM invoices WHERE status IN ('PAID', 'EXPIRED') AND created_at < {p} "
+    f"AND (verification IS NULL OR verification <> 'QUEUED') LIMIT {p}"
+)
+# Postgres moves a batch in one statement, skipping rows a payment or another archiver holds
+ARCHIVE_INVOICES = (
+    f"WITH moved AS (DELETE FROM invoices WHERE id IN ({_ARCHIVABLE} FOR UPDATE SKIP LOCKED) RETURNING {_ALL_COLUMNS}) "
+    f"INSERT INTO invoices_archive ({_ALL_COLUMNS}) SELECT {_ALL_COLUMNS} FROM moved RETURNING id"
+)
+
+INSERT_CONTACT = f"""INSERT INTO contacts (id, owner_wallet, name, wallet_address, email, phone)
+    VALUES ({p}, {p}, {p}, {p}, {p}, {p})
+    RETURNING *"""
+DELETE_CONTACT = f"DELETE FROM contacts WHERE id = {p} RETURNING *"
+DELETE_OWNED_CONTACT = f"DELETE FROM contacts WHERE id = {p} AND owner_wallet = {p} RETURNING *"
+CONTACT_EXISTS = f"SELECT 1 FROM contacts WHERE id = {p}"
+
+SELECT_VERSION = f"SELECT version FROM versions WHERE scope = {p}"
+# All the per-wallet counters of one kind ("invoices:" / "contacts:"), as a range on the primary key
+SELECT_VERSION_TOTAL = f"SELECT COALESCE(SUM(version), 0) FROM versions WHERE scope > {p} AND scope < {p}"
+VERSION_BUMP_CHUNK = 500
+
+SUMMARY_COLUMNS = ("pending_count", "pending_minor", "paid_count", "received_minor", "sent_count", "sent_minor")
+SELECT_SUMMARY = (
+    f"SELECT bucket, token, {', '.join(SUMMARY_COLUMNS)} FROM wallet_summaries "
+    f"WHERE wallet = {p} AND (bucket = 'all' OR bucket >= {p})"
+)
+SUMMARY_CHUNK = 500
+# PENDING invoices past expires_at that the sweeper hasn't expired yet
+# (idx_invoices_status_expires); they read as EXPIRED, so the summary read
+# takes them back out of the pending totals. Only the hot table holds PENDING rows.
+SELECT_LAPSED_PENDING = (
+    "SELECT SUBSTR(created_at, 1, 10), token_address, COUNT(*), SUM(amount_minor) FROM invoices "
+    f"WHERE status = 'PENDING' AND expires_at <= {p} AND merchant_address = {p} "
+    "GROUP BY SUBSTR(created_at, 1, 10), token_address"
+)
+
+# Outcomes of an owner-scoped delete
+DELETED, NOT_FOUND, FORBIDDEN = "deleted", "not_found", "forbidden"
+
+
+# ── version scopes ────────────────────────────────────────
+# "invoice:<id>" covers one invoice and "invoices:<wallet>" a wallet's history
+# (as merchant or payer); contacts follow the same pattern keyed on the owner
+# wallet. There is no counter bumped by every write: that one row would
+# serialize all writers on its lock. The unfiltered listings ("invoices:*",
+# "contacts:*") use the sum of the per-wallet counters instead, which grows
+# with every write just the same.
+
+def invoice_scopes(row) -> list:
+    scopes = [f"invoice:{row['id']}", f"invoices:{row['merchant_address']}"]
+    if row["payer_address"]:
+        scopes.append(f"invoices:{row['payer_address']}")
+    return scopes
+
+
+def invoice_list_scope(wallet: str) -> str:
+    return f"invoices:{wallet or '*'}"
+
+
+def contact_scopes(row) -> list:
+    return [f"contacts:{row['owner_wallet']}"]
+
+
+def contact_list_scope(wallet: str) -> str:
+    return f"contacts:{wallet or '*'}"
+
+
+def _version_query(scope: str):
+    """SELECT for a scope's version: one row, or the total of a "<kind>:*" scope."""
+    if scope.endswith(":*"):
+        kind = scope[:-1]
+        # ";" sorts right after ":", so this spans exactly the "<kind>:..." scopes
+        return SELECT_VERSION_TOTAL, (kind, kind[:-1] + ";")
+    return SELECT_VERSION, (scope,)
+
+
+# ── wallet summaries ──────────────────────────────────────
+# An invoice contributes to its merchant's summary while PENDING (by creation
+# day) and, once PAID, to the merchant's received and the payer's sent totals
+# (by payment day). Each row is counted under its day and under bucket 'all'.
+
+def _contribution(row, sign: int, status: str = None) -> list:
+    status = status or row["status"]
+    amount = row["amount_minor"] * sign
+    token = row["token_address"]
+    if status == "PENDING":
+        entries = [(row["merchant_address"], row["created_at"][:10], (sign, amount, 0, 0, 0, 0))]
+    elif status == "PAID":
+        day = (row["paid_at"] or row["created_at"])[:10]
+        entries = [(row["merchant_address"], day, (0, 0, sign, amount, 0, 0))]
+        if row["payer_address"]:
+            entries.append((row["payer_address"], day, (0, 0, 0, 0, sign, amount)))
+    else:
+        return []
+    return [((wallet, bucket, token), delta) for wallet, day, delta in entries for bucket in ("all", day)]
+
+
+def invoice_created_deltas(row) -> list:
+    return _contribution(row, 1)
+
+
+def invoice_paid_deltas(row) -> list:
+    """Move a just-paid invoice from pending to paid."""
+    return _contribution(row, -1, status="PENDING") + _contribution(row, 1)
+
+
+def invoice_deleted_deltas(row) -> list:
+    return _contribution(row, -1)
+
+
+def invoice_expired_deltas(row) -> list:
+    return _contribution(row, -1, status="PENDING")
+
+
+def invoice_rejected_deltas(row) -> list:
+    """Move a paid invoice whose payment failed verification back to pending."""
+    return _contribution(row, -1) + _contribution(row, 1, status="PENDING")
+
+
+def _verification_statements(verified_ids: list, rejected_ids: list):
+    """(sql, params) pairs settling claimed payments, VERIFY_CHUNK ids per statement."""
+    outcomes = (
+        ("verification = 'VERIFIED'", verified_ids),
+        ("status = 'PENDING', paid_at = NULL, tempo_tx_hash = '', payer_address = '', verification = 'REJECTED'", rejected_ids),
+    )
+    for assignments, ids in outcomes:
+        for start in range(0, len(ids), VERIFY_CHUNK):
+            chunk = ids[start:start + VERIFY_CHUNK]
+            sql = (
+                f"UPDATE invoices SET {assignments}, verify_after = NULL "
+                f"WHERE verification = 'QUEUED' AND id IN ({', '.join([p] * len(chunk))}) RETURNING *"
+            )
+            yield _notifying(sql), tuple(chunk)
+
+
+def _summary_statements(deltas):
+    """(sql, params) pairs adding each delta, merged per key (an upsert may touch a row only once)."""
+    merged = {}
+    for key, delta in deltas:
+        total = merged.get(key, (0,) * len(SUMMARY_COLUMNS))
+        merged[key] = tuple(a + b for a, b in zip(total, delta))
+    keys = sorted(k for k, v in merged.items() if any(v))
+    columns = ", ".join(SUMMARY_COLUMNS)
+    accumulate = ", ".join(f"{c} = wallet_summaries.{c} + excluded.{c}" for c in SUMMARY_COLUMNS)
+    row_sql = "(" + ", ".join([p] * (3 + len(SUMMARY_COLUMNS))) + ")"
+    for start in range(0, len(keys), SUMMARY_CHUNK):
+        chunk = keys[start:start + SUMMARY_CHUNK]
+        yield (
+            f"INSERT INTO wallet_summaries (wallet, bucket, token, {columns}) VALUES {', '.join([row_sql] * len(chunk))} "
+            f"ON CONFLICT (wallet, bucket, token) DO UPDATE SET {accumulate}",
+            tuple(v for key in chunk for v in key + merged[key]),
+        )
+
+
+def _bump_statements(scopes):
+    """(sql, params) pairs upserting +1 for each scope, deduplicated and in a stable order."""
+    scopes = sorted(set(scopes))
+    for start in range(0, len(scopes), VERSION_BUMP_CHUNK):
+        chunk = scopes[start:start + VERSION_BUMP_CHUNK]
+        values = ", ".join([f"({p}, 1)"] * len(chunk))
+        yield (
+            f"INSERT INTO versions (scope, version) VALUES {values} "
+            "ON CONFLICT (scope) DO UPDATE SET version = versions.version + 1",
+            tuple(chunk),
+        )
+
+
+def _delete_args(owned_sql: str, any_sql: str, row_id: str, owner):
+    if owner:
+        return owned_sql, (row_id, owner)
+    return any_sql, (row_id,)
+
+
+# ── sync (DB-API cursor) ──────────────────────────────────
+
+def _fetch(cursor, sql: str, params: tuple):
+    cursor.execute(sql, params)
+    return cursor.fetchone()
+
+
+def bump_versions(cursor, scopes):
+    for sql, params in _bump_statements(scopes):
+        cursor.execute(sql, params)
+
+
+def update_summaries(cursor, deltas):
+    for sql, params in _summary_statements(deltas):
+        cursor.execute(sql, params)
+
+
+def get_summary_rows(cursor, wallet: str, since_day: str, now: str) -> list:
+    """
+    wallet_summaries rows (bucket, token, *counters) for `wallet`, followed by
+    rows in the same shape that subtract its lapsed, not yet swept invoices.
+    """
+    cursor.execute(SELECT_SUMMARY, (wallet, since_day))
+    rows = cursor.fetchall()
+    cursor.execute(SELECT_LAPSED_PENDING, (now, wallet))
+    for day, token, count, minor in cursor.fetchall():
+        values = (-count, -int(minor), 0, 0, 0, 0)
+        rows.append(("all", token, *values))
+        if day >= since_day:
+            rows.append((day, token, *values))
+    return rows
+
+
+def get_version(cursor, scope: str) -> int:
+    row = _fetch(cursor, *_version_query(scope))
+    return row[0] if row is not None else 0
+
+
+def _delete(cursor, owned_sql: str, any_sql: str, exists_sql: str, row_id: str, owner, scopes, deltas=None) -> str:
+    row = _fetch(cursor, *_delete_args(owned_sql, any_sql, row_id, owner))
+    if row is not None:
+        bump_versions(cursor, scopes(row))
+        if deltas is not None:
+            update_summaries(cursor, deltas(row))
+        return DELETED
+    # Nothing matched: only now pay for a second query to tell 404 from 403
+    return FORBIDDEN if _fetch(cursor, exists_sql, (row_id,)) is not None else NOT_FOUND
+
+
+def insert_invoice(cursor, params: tuple):
+    row = _fetch(cursor, INSERT_INVOICE, params)
+    bump_versions(cursor, invoice_scopes(row))
+    update_summaries(cursor, invoice_created_deltas(row))
+    return row
+
+
+def mark_invoice_paid(cursor, params: tuple):
+    """The paid invoice; an already-paid or expired one is returned unchanged, None if it doesn't exist."""
+    row = _fetch(cursor, MARK_INVOICE_PAID, params)
+    if row is None:
+        return _fetch(cursor, SELECT_INVOICE_ROW, invoice_params(params[3]))
+    bump_versions(cursor, invoice_scopes(row))
+    update_summaries(cursor, invoice_paid_deltas(row))
+    return row
+
+
+def delete_invoice(cursor, invoice_id: str, owner) -> str:
+    outcome = _delete(cursor, DELETE_OWNED_INVOICE, DELETE_INVOICE, INVOICE_EXISTS, invoice_id, owner, invoice_scopes, invoice_deleted_deltas)
+    if outcome != NOT_FOUND:
+        return outcome
+    return _delete(cursor, DELETE_OWNED_ARCHIVED_INVOICE, DELETE_ARCHIVED_INVOICE, ARCHIVED_INVOICE_EXISTS, invoice_id, owner, invoice_scopes, invoice_deleted_deltas)
+
+
+def expire_invoices(cursor, now: str, limit: int) -> list:
+    """Expire up to `limit` overdue PENDING invoices; returns the expired rows."""
+    cursor.execute(EXPIRE_INVOICES, (now, limit))
+    rows = cursor.fetchall()
+    if rows:
+        bump_versions(cursor, [s for r in rows for s in invoice_scopes(r)])
+        update_summaries(cursor, [d for r in rows for d in invoice_expired_deltas(r)])
+    return rows
+
+
+def archive_invoices(cursor, before: str, limit: int) -> int:
+    """
+    Move up to `limit` settled invoices created before `before` to the
+    archive. Returns how many moved. Their content doesn't change, so neither
+    do versions or summaries.
+    """
+    if DATABASE_URL:
+        cursor.execute(ARCHIVE_INVOICES, (before, limit))
+        return len(cursor.fetchall())
+    cursor.execute(_ARCHIVABLE, (before, limit))
+    ids = [row[0] for row in cursor.fetchall()]
+    if ids:
+        marks = ", ".join([p] * len(ids))
+        cursor.execute(f"INSERT INTO invoices_archive ({_ALL_COLUMNS}) SELECT {_ALL_COLUMNS} FROM invoices WHERE id IN ({marks})", ids)
+        cursor.execute(f"DELETE FROM invoices WHERE id IN ({marks})", ids)
+    return len(ids)
+
+
+def claim_unverified(cursor, now: str, lease_until: str, limit: int) -> list:
+    """Lease up to `limit` queued payments until `lease_until`; returns their rows."""
+    cursor.execute(CLAIM_UNVERIFIED, (lease_until, now, limit))
+    return cursor.fetchall()
+
+
+def verified_payments(cursor, tx_hashes: list) -> list:
+    """Invoices already settled by any of `tx_hashes` (idx_invoices_tx_hash)."""
+    rows = []
+    for start in range(0, len(tx_hashes), VERIFY_CHUNK):
+        chunk = tx_hashes[start:start + VERIFY_CHUNK]
+        cursor.execute(SELECT_VERIFIED_PAYMENTS.format(", ".join([p] * len(chunk))), invoice_params(*chunk))
+        rows += cursor.fetchall()
+    return rows
+
+
+def record_verification(cursor, verified: list, rejected: list) -> list:
+    """
+    Settle claimed rows: `verified` stay PAID, `rejected` go back to PENDING.
+    Rows no longer queued (deleted, or settled by another verifier) are
+    skipped. Returns the ids that changed.
+    """
+    claimed = {r["id"]: r for r in verified + rejected}
+    rejected_ids = {r["id"] for r in rejected}
+    changed = []
+    for sql, params in _verification_statements([r["id"] for r in verified], sorted(rejected_ids)):
+        cursor.execute(sql, params)
+        changed += [row["id"] for row in cursor.fetchall()]
+    if changed:
+        rows = [claimed[i] for i in changed]
+        bump_versions(cursor, [s for r in rows for s in invoice_scopes(r)])
+        update_summaries(cursor, [d for r in rows if r["id"] in rejected_ids for d in invoice_rejected_deltas(r)])
+    return changed
+
+
+def insert_contact(cursor, params: tuple):
+    row = _fetch(cursor, INSERT_CONTACT, params)
+    bump_versions(cursor, contact_scopes(row))
+    return row
+
+
+def delete_contact(cursor, contact_id: str, owner) -> str:
+    return _delete(cursor, DELETE_OWNED_CONTACT, DELETE_CONTACT, CONTACT_EXISTS, contact_id, owner, contact_scopes)
+
+
+# ── async (async_database.AsyncConnection) ────────────────
+
+async def abump_versions(db, scopes):
+    for sql, params in _bump_statements(scopes):
+        await db.execute(sql, params)
+
+
+async def aupdate_summaries(db, deltas):
+    for sql, params in _summary_statements(deltas):
+        await db.execute(sql, params)
+
+
+async def aget_version(db, scope: str) -> int:
+    row = await db.fetchone(*_version_query(scope))
+    return row[0] if row is not None else 0
+
+
+async def _adelete(db, owned_sql: str, any_sql: str, exists_sql: str, row_id: str, owner, scopes, deltas=None) -> str:
+    row = await db.fetchone(*_delete_args(owned_sql, any_sql, row_id, owner))
+    if row is not None:
+        await abump_versions(db, scopes(row))
+        if deltas is not None:
+            await aupdate_summaries(db, deltas(row))
+        return DELETED
+    return FORBIDDEN if await db.fetchone(exists_sql, (row_id,)) is not None else NOT_FOUND
+
+
+async def ainsert_invoice(db, params: tuple):
+    row = await db.fetchone(INSERT_INVOICE, params)
+    await abump_versions(db, invoice_scopes(row))
+    await aupdate_summaries(db, invoice_created_deltas(row))
+    return row
+
+
+async def amark_invoice_paid(db, params: tuple):
+    row = await db.fetchone(MARK_INVOICE_PAID, params)
+    if row is None:
+        return await db.fetchone(SELECT_INVOICE_ROW, invoice_params(params[3]))
+    await abump_versions(db, invoice_scopes(row))
+    await aupdate_summaries(db, invoice_paid_deltas(row))
+    return row
+
+
+async def adelete_invoice(db, invoice_id: str, owner) -> str:
+    outcome = await _adelete(db, DELETE_OWNED_INVOICE, DELETE_INVOICE, INVOICE_EXISTS, invoice_id, owner, invoice_scopes, invoice_deleted_deltas)
+    if outcome != NOT_FOUND:
+        return outcome
+    return await _adelete(db, DELETE_OWNED_ARCHIVED_INVOICE, DELETE_ARCHIVED_INVOICE, ARCHIVED_INVOICE_EXISTS, invoice_id, owner, invoice_scopes, invoice_deleted_deltas)
+
+
+async def ainsert_contact(db, params: tuple):
+    row = await db.fetchone(INSERT_CONTACT, params)
+    await abump_versions(db, contact_scopes(row))
+    return row
+
+
+async def adelete_contact(db, contact_id: str, owner) -> str:
+    return await _adelete(db, DELETE_OWNED_CONTACT, DELETE_CONTACT, CONTACT_EXISTS, contact_id, owner, contact_scopes)
@@ -1,26 +1,151 @@
 import uuid
 import os
-from datetime import datetime
+import io
+import asyncio
+import csv
+import json
+import base64
+import binascii
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Request, Response, Query
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 
-from config import FRONTEND_BASE_URL, TEMPO_CHAIN_ID, TEMPO_RPC_URL
-from database import get_db, row_to_dict, get_placeholder, DATABASE_URL
-from models import CreateInvoiceRequest, MarkPaidRequest, CreateContactRequest
-from middleware import is_valid_address
-import psycopg2.extras
+from config import FRONTEND_BASE_URL, TEMPO_CHAIN_ID, TEMPO_RPC_URL, DB_ASYNC, SSE_MAX_SECONDS, METRICS_ENABLED, INVOICE_DEFAULT_TTL, INVOICE_MAX_TTL, VERIFY_PAYMENTS, WRITE_COALESCE
+from database import get_db, get_cursor, get_stream_db, row_to_dict, contact_to_dict, get_placeholder, pool_stats, utc_timestamp, DATABASE_URL
+from models import CreateInvoiceRequest, MarkPaidRequest, CreateContactRequest, BulkInvoiceRequest, ResolveContactsRequest
+from middleware import is_valid_address, is_valid_tx_hash, normalize_address, normalize_email, normalize_phone, normalize_tx_hash
+import repository
+import search
+from notifier import notifier
+from cache import invoice_cache, MISS
+from coalescer import write_coalescer
+from amounts import to_minor, format_minor
+import metrics
+from serializers import (
+    FastJSONResponse,
+    dumps,
+    INVOICE_COLUMNS,
+    INVOICE_KEYS,
+    CONTACT_COLUMNS,
+    CONTACT_KEYS,
+    invoice_from_row,
+    contact_from_row,
+    json_array_chunk,
+    ndjson_chunk,
+    csv_chunk,
+    csv_value,
+)
 
 router = APIRouter()
 
 
-def get_cursor(conn):
-    if DATABASE_URL:
-        return conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    return conn.cursor()
+# ── pagination / streaming ────────────────────────────────
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STREAM_BATCH_SIZE = 500
+STREAM_FORMATS = {"json", "ndjson"}
+EXPORT_FORMATS = {"csv", "ndjson"}
+
+
+def json_dumps(obj) -> str:
+    return dumps(obj).decode()
+
+
+def encode_cursor(*key) -> str:
+    raw = json_dumps(list(key)).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    if not isinstance(key, list) or len(key) != size:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return key
+
+
+def stream_rows(sql: str, params: tuple, from_row, fmt: str) -> StreamingResponse:
+    """
+    Stream a query result as a JSON array or NDJSON without materializing it.
+    Rows are pulled from a server-side cursor in batches of STREAM_BATCH_SIZE
+    and each batch is encoded in one call.
+    """
+    if fmt not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be json or ndjson")
+
+    def generate():
+        first = True
+        if fmt == "json":
+            yield b"["
+        for rows in stream_batches(sql, params):
+            items = [from_row(r) for r in rows]
+            yield json_array_chunk(items, first) if fmt == "json" else ndjson_chunk(items)
+            first = False
+        if fmt == "json":
+            yield b"]"
+
+    media_type = "application/json" if fmt == "json" else "application/x-ndjson"
+    return StreamingResponse(generate(), media_type=media_type)
+
+
+def stream_batches(sql: str, params: tuple):
+    """Result rows in batches of STREAM_BATCH_SIZE, pulled from a server-side cursor."""
+    with get_stream_db() as conn:
+        cursor = get_cursor(conn, name="stream_rows", as_dict=False)
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+            if not rows:
+                break
+            yield rows
+        cursor.close()
+
+
+def export_rows(sql: str, params: tuple, from_row, keys: tuple, fmt: str, filename: str) -> StreamingResponse:
+    """Stream a query result as a CSV (header row first) or NDJSON download."""
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+
+    def generate():
+        if fmt == "csv":
+            yield csv_chunk([dict(zip(keys, keys))], keys)
+        for rows in stream_batches(sql, params):
+            items = [from_row(r) for r in rows]
+            yield csv_chunk(items, keys) if fmt == "csv" else ndjson_chunk(items)
+
+    media_type = "text/csv; charset=utf-8" if fmt == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    return StreamingResponse(generate(), media_type=media_type, headers=headers)
+
+
+def export_bound(value: Optional[str], name: str, end: bool = False) -> Optional[str]:
+    """
+    An ISO date / datetime filter as a stored-timestamp string. A bare date as
+    the (exclusive) end bound covers that whole day.
+    """
+    if not value:
+        return None
+    try:
+        bound = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO date or datetime")
+    if bound.tzinfo is not None:
+        bound = bound.astimezone(timezone.utc).replace(tzinfo=None)
+    if end and len(value) == 10:
+        bound += timedelta(days=1)
+    return utc_timestamp(bound)
 
 
 @router.get("/diagnostic")
 def diagnostic():
+    from async_database import async_pool_stats
     db_status = "not connected"
     db_error = None
     try:
@@ -37,8 +162,11 @@ def diagnostic():
             "type": "PostgreSQL" if DATABASE_URL else "SQLite",
             "connected": db_status == "connected",
             "error": db_error,
-            "url_provided": bool(DATABASE_URL)
+            "url_provided": bool(DATABASE_URL),
+            "pool": pool_stats(),
+            "async_pool": async_pool_stats() if DB_ASYNC else None,
         },
+        "invoice_cache": invoice_cache.stats(),
         "environment": {
             "vercel": bool(os.getenv("VERCEL")),
             "frontend_base_url": FRONTEND_BASE_URL
@@ -46,212 +174,902 @@ def diagnostic():
     }
 
 
-# ── invoices ──────────────────────────────────────────────
+@router.get("/metrics")
+def prometheus_metrics():
+    """Prometheus text exposition: request/query histograms plus pool and cache gauges."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="metrics disabled")
+    from async_database import async_pool_stats
+    if VERIFY_PAYMENTS:
+        from verifier import receipt_cache
+    body = metrics.render({
+        "mikuu_db_pool": pool_stats(),
+        "mikuu_db_async_pool": async_pool_stats() if DB_ASYNC else {},
+        "mikuu_invoice_cache": invoice_cache.stats(),
+        "mikuu_invoice_subscribers": {"waiting": notifier.waiting()},
+        "mikuu_receipt_cache": receipt_cache.stats() if VERIFY_PAYMENTS else {},
+    })
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
 
-@router.post("/invoices", status_code=201)
-def create_invoice(req: CreateInvoiceRequest, request: Request):
-    # Validate addresses
+
+# ── conditional GET ───────────────────────────────────────
+# ETags derive from the version counters bumped by every write (see
+# repository.py), so a matching If-None-Match is answered with 304 before
+# any row is fetched or serialized.
+
+CACHE_CONTROL = "public, max-age=0, s-maxage=1, must-revalidate"
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:24]}"'
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response if the client already holds `etag`, else None."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    if "*" in tags or etag in tags:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    return None
+
+
+def set_cache_headers(response: Response, etag: str) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
+
+
+# ── shared request handling (also used by async_routes) ──
+
+def write(fn, *args):
+    """Run `fn(cursor, *args)` and commit: in its own transaction, or with WRITE_COALESCE in the next group commit."""
+    if WRITE_COALESCE:
+        return write_coalescer.run(fn, *args)
+    with get_db() as conn:
+        result = fn(get_cursor(conn), *args)
+        conn.commit()
+    return result
+
+
+def wallet_invoices_query(wallet: str, where: list, params: list, descending: bool, limit: Optional[int] = None):
+    """
+    Invoices of `wallet` as merchant or payer, matching `where`, in
+    (created_at, id) order. Returns (sql, params).
+
+    An OR over the two roles can't be read in index order, so the query has
+    one branch per role and table instead. Each branch walks its
+    (merchant_address | payer_address, created_at, id) index with the same
+    conditions and, for a page, its own LIMIT; the outer ORDER BY merges at
+    most 4 * limit rows. The payer branches skip invoices the wallet also
+    issued, which the merchant branches already return.
+    """
+    p = get_placeholder()
+    direction = "DESC" if descending else "ASC"
+    wallet = normalize_address(wallet)
+    roles = ((f"merchant_address = {p}", [wallet]), (f"payer_address = {p} AND merchant_address <> {p}", [wallet, wallet]))
+    branches, all_params = [], []
+    for table in repository.INVOICE_TABLES:
+        for role, role_params in roles:
+            sql = f"SELECT {INVOICE_COLUMNS} FROM {table} WHERE " + " AND ".join([role, *where])
+            sql += f" ORDER BY created_at {direction}, id {direction}"
+            all_params += role_params + params
+            if limit is not None:
+                sql += f" LIMIT {p}"
+                all_params.append(limit)
+            branches.append(f"SELECT * FROM ({sql}) AS b{len(branches)}")
+    sql = " UNION ALL ".join(branches) + f' ORDER BY "createdAt" {direction}, "id" {direction}'
+    if limit is not None:
+        sql += f" LIMIT {p}"
+        all_params.append(limit)
+    return sql, tuple(all_params)
+
+
+def invoice_list_query(wallet: str, limit: Optional[int], cursor: str):
+    """
+    Build the invoice listing query. Returns (sql, params, page_size);
+    page_size is None when the caller asked for the full streamed history.
+    """
+    p = get_placeholder()
+    where, params = [], []
+    page_size = None
+    if limit is not None or cursor:
+        page_size = limit or DEFAULT_PAGE_SIZE
+        if cursor:
+            created_at, last_id = decode_cursor(cursor, 2)
+            # A row-value comparison, so each branch seeks straight to the cursor in its index
+            where.append(f"(created_at, id) < ({p}, {p})")
+            params += [created_at, last_id]
+    fetch = page_size + 1 if page_size is not None else None
+
+    if wallet:
+        sql, params = wallet_invoices_query(wallet, where, params, descending=True, limit=fetch)
+        return sql, params, page_size
+
+    # Hot and archived invoices, merged in order
+    sql = repository.from_invoices(f"SELECT {INVOICE_COLUMNS}", "WHERE " + " AND ".join(where) if where else "")
+    sql += ' ORDER BY "createdAt" DESC, "id" DESC'
+    params = list(repository.invoice_params(*params))
+    if fetch is not None:
+        sql += f" LIMIT {p}"
+        params.append(fetch)
+    return sql, tuple(params), page_size
+
+
+def invoice_page(rows, page_size: int) -> dict:
+    items = [invoice_from_row(r) for r in rows[:page_size]]
+    next_cursor = None
+    if len(rows) > page_size:
+        last = items[-1]
+        next_cursor = encode_cursor(last["createdAt"], last["id"])
+    return {"items": items, "nextCursor": next_cursor}
+
+
+SEARCH_PAGE_SIZE = 20
+
+
+def search_params(wallet: str, q: str, limit: Optional[int], cursor: str):
+    """Validate a search request: (wallet, terms, page_size, offset)."""
+    if not is_valid_address(wallet):
+        raise HTTPException(status_code=400, detail="wallet is required")
+    terms = search.search_terms(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="q must contain a word of at least 2 characters")
+    # Ranked results page by offset; the cursor is opaque like the list endpoints'
+    (offset,) = decode_cursor(cursor, 1) if cursor else (0,)
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return normalize_address(wallet), terms, limit or SEARCH_PAGE_SIZE, offset
+
+
+def search_page(rows, page_size: int, offset: int, from_row) -> dict:
+    items = [from_row(r) for r in rows[:page_size]]
+    next_cursor = encode_cursor(offset + page_size) if len(rows) > page_size else None
+    return {"items": items, "nextCursor": next_cursor}
+
+
+def search_rows(sql: str, params: tuple) -> list:
+    with get_db() as conn:
+        cursor = get_cursor(conn, as_dict=False)
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def invoice_export_query(wallet: str, start: Optional[str], end: Optional[str]):
+    """Invoices in created_at order, optionally for one wallet and within [start, end)."""
+    p = get_placeholder()
+    where, params = [], []
+    if start:
+        where.append(f"created_at >= {p}")
+        params.append(start)
+    if end:
+        where.append(f"created_at < {p}")
+        params.append(end)
+    if wallet:
+        return wallet_invoices_query(wallet, where, params, descending=False)
+
+    sql = repository.from_invoices(f"SELECT {INVOICE_COLUMNS}", "WHERE " + " AND ".join(where) if where else "")
+    return sql + ' ORDER BY "createdAt", "id"', repository.invoice_params(*params)
+
+
+def contact_list_query(wallet: str, limit: Optional[int], cursor: str):
+    """Same contract as invoice_list_query, keyed on contact id."""
+    p = get_placeholder()
+    where, params = [], []
+    if wallet:
+        where.append(f"owner_wallet = {p}")
+        params.append(normalize_address(wallet))
+
+    page_size = None
+    if limit is not None or cursor:
+        page_size = limit or DEFAULT_PAGE_SIZE
+        if cursor:
+            (last_id,) = decode_cursor(cursor, 1)
+            where.append(f"id > {p}")
+            params.append(last_id)
+
+    sql = f"SELECT {CONTACT_COLUMNS} FROM contacts"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id"
+    if page_size is not None:
+        sql += f" LIMIT {p}"
+        params.append(page_size + 1)
+    return sql, tuple(params), page_size
+
+
+def contact_page(rows, page_size: int) -> dict:
+    items = [contact_from_row(r) for r in rows[:page_size]]
+    next_cursor = encode_cursor(items[-1]["id"]) if len(rows) > page_size else None
+    return {"items": items, "nextCursor": next_cursor}
+
+
+def new_invoice_params(req: CreateInvoiceRequest) -> tuple:
+    """Validate a create request and return the INSERT parameters (id first)."""
     if not is_valid_address(req.merchantAddress):
         raise HTTPException(status_code=400, detail="invalid merchant address")
     if not is_valid_address(req.tokenAddress):
         raise HTTPException(status_code=400, detail="invalid token address")
+    try:
+        amount_minor = to_minor(req.amount)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if amount_minor <= 0:
+        raise HTTPException(status_code=400, detail="amount must be positive")
+
+    ttl = INVOICE_DEFAULT_TTL if req.ttlSeconds is None else req.ttlSeconds
+    if ttl < 0 or ttl > INVOICE_MAX_TTL:
+        raise HTTPException(status_code=400, detail=f"ttlSeconds must be between 0 and {INVOICE_MAX_TTL}")
 
     inv_id = str(uuid.uuid4())
     memo = req.memo or f"INV-{inv_id[:8]}"
     payment_link = f"{FRONTEND_BASE_URL}/?invoiceId={inv_id}"
-    now = datetime.utcnow().isoformat() + "Z"
+    created = datetime.utcnow()
+    now = utc_timestamp(created)
+    expires_at = utc_timestamp(created + timedelta(seconds=ttl)) if ttl else None
+    return (inv_id, normalize_address(req.merchantAddress), normalize_email(req.customerEmail), format_minor(amount_minor), amount_minor, normalize_address(req.tokenAddress), memo, now, expires_at, payment_link, TEMPO_CHAIN_ID, TEMPO_RPC_URL)
+
+
+INVOICE_INSERT_COLUMNS = (
+    "id", "merchant_address", "customer_email", "amount", "amount_minor", "token_address", "memo",
+    "created_at", "expires_at", "payment_link", "tempo_chain_id", "tempo_rpc",
+)
+# Column defaults from the schema (migrations.py), used to render rows that were never read back
+INVOICE_DEFAULTS = {"stablecoin_name": "USD Stablecoin", "fee_sponsored": "false"}
+BULK_MAX_INVOICES = 5000
+BULK_CHUNK_SIZE = 500
+
+
+def mark_paid_params(invoice_id: str, req: MarkPaidRequest) -> tuple:
+    # Validate payer address if provided
+    if req.payerAddress and not is_valid_address(req.payerAddress):
+        raise HTTPException(status_code=400, detail="invalid payer address")
+    if req.txHash and not is_valid_tx_hash(req.txHash):
+        raise HTTPException(status_code=400, detail="invalid transaction hash")
+    now = utc_timestamp()
+    return (now, normalize_tx_hash(req.txHash), normalize_address(req.payerAddress), invoice_id, now)
+
+
+def paid_invoice(row, req: MarkPaidRequest) -> dict:
+    """
+    Response for POST /invoices/{id}/pay given mark_invoice_paid's row. An
+    invoice that expired first, or that another transaction already paid,
+    can't take the payment: that is a 409 rather than the unchanged row, so
+    the client knows its txHash was not recorded. Repeating the request that
+    paid it (same txHash) returns the invoice again.
+    """
+    if row is None:
+        raise HTTPException(status_code=404, detail="invoice not found")
+    invoice = row_to_dict(row)
+    if invoice["status"] == "EXPIRED":
+        raise HTTPException(status_code=409, detail=f"invoice is {invoice['status']} and can no longer be paid")
+    if invoice["status"] == "PAID" and invoice["tempoTxHash"] != normalize_tx_hash(req.txHash):
+        raise HTTPException(status_code=409, detail=f"invoice is {invoice['status']} with another transaction")
+    return invoice
+
+
+def lookup_query(wallet: str, email: str, phone: str):
+    if not wallet:
+        raise HTTPException(status_code=400, detail="wallet is required")
+    if not email and not phone:
+        raise HTTPException(status_code=400, detail="email or phone required")
+
+    p = get_placeholder()
+    if email:
+        return f"SELECT {CONTACT_COLUMNS} FROM contacts WHERE owner_wallet = {p} AND email = {p}", (normalize_address(wallet), normalize_email(email))
+    return f"SELECT {CONTACT_COLUMNS} FROM contacts WHERE owner_wallet = {p} AND phone = {p}", (normalize_address(wallet), normalize_phone(phone))
+
+
+RESOLVE_MAX_ITEMS = 5000
+
+
+def any_of(column: str, values: list):
+    """`column` equal to any of `values`, bound as a single parameter: (sql, param)."""
+    if DATABASE_URL:
+        return f"{column} = ANY(%s)", list(values)
+    return f"{column} IN (SELECT value FROM json_each(?))", json.dumps(list(values))
+
+
+def resolve_query(wallet: str, emails: list, phones: list):
+    """
+    Normalize the emails and phones to look up in `wallet`'s address book.
+    Returns (sql, params, wanted): one query matching all of them (None when
+    there is nothing to look up) and the (type, value, normalized) entries.
+    """
+    if len(emails) + len(phones) > RESOLVE_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"at most {RESOLVE_MAX_ITEMS} emails and phones per request")
+    wanted = [("email", e, normalize_email(e)) for e in emails] + [("phone", ph, normalize_phone(ph)) for ph in phones]
+
     p = get_placeholder()
+    selects, params = [], []
+    for column, kind in (("email", "email"), ("phone", "phone")):
+        values = sorted({n for t, _, n in wanted if t == kind and n})
+        if values:
+            condition, param = any_of(column, values)
+            # One indexed (owner_wallet, column) probe per branch
+            selects.append(f"SELECT {CONTACT_COLUMNS} FROM contacts WHERE owner_wallet = {p} AND {condition}")
+            params += [normalize_address(wallet), param]
+    return (" UNION ALL ".join(selects) or None), tuple(params), wanted
+
+
+def resolve_result(wanted: list, rows) -> dict:
+    """Split the resolve entries into matches (with the contact) and misses, in request order."""
+    found = {}
+    # Lowest id wins when an address book has duplicates
+    for contact in sorted((contact_from_row(r) for r in rows), key=lambda c: c["id"]):
+        if contact["email"]:
+            found.setdefault(("email", contact["email"]), contact)
+        if contact["phone"]:
+            found.setdefault(("phone", contact["phone"]), contact)
+    matches, misses = [], []
+    for kind, value, normalized in wanted:
+        entry = {"type": kind, "value": value, "normalized": normalized}
+        contact = found.get((kind, normalized)) if normalized else None
+        if contact is None:
+            misses.append(entry)
+        else:
+            matches.append({**entry, "contact": contact})
+    return {"matches": matches, "misses": misses}
+
+
+def resolve_wallet(req: ResolveContactsRequest, caller: Optional[str]) -> str:
+    """Address book to resolve against: the caller's own."""
+    wallet = req.wallet or caller or ""
+    if not is_valid_address(wallet):
+        raise HTTPException(status_code=400, detail="wallet is required")
+    if caller and wallet.lower() != caller:
+        raise HTTPException(status_code=403, detail="wallet mismatch")
+    return wallet
+
+
+def new_contact_params(req: CreateContactRequest, caller: Optional[str]) -> tuple:
+    """Validate a create request and return the INSERT parameters (id first)."""
+    if not is_valid_address(req.ownerWallet):
+        raise HTTPException(status_code=400, detail="invalid owner wallet address")
+    if not is_valid_address(req.walletAddress):
+        raise HTTPException(status_code=400, detail="invalid contact wallet address")
+
+    # Ownership: caller must match owner
+    if caller and req.ownerWallet.lower() != caller:
+        raise HTTPException(status_code=403, detail="wallet mismatch")
+
+    contact_id = str(uuid.uuid4())
+    return (contact_id, normalize_address(req.ownerWallet), req.name, normalize_address(req.walletAddress), normalize_email(req.email), normalize_phone(req.phone))
+
+
+CONTACT_INSERT_COLUMNS = ("id", "owner_wallet", "name", "wallet_address", "email", "phone")
+# Same header as GET /contacts/export; other columns (id, ownerWallet) are ignored
+CONTACT_IMPORT_REQUIRED = ("name", "address")
+IMPORT_MAX_BYTES = 5 * 1024 * 1024
+IMPORT_MAX_CONTACTS = 5000
+
+
+async def read_body(request: Request, max_bytes: int) -> bytes:
+    """The request body, refused with 413 as soon as it exceeds max_bytes."""
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"upload larger than {max_bytes} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def contact_import_rows(body: bytes, owner: str):
+    """
+    Parse and validate a contacts CSV in a single pass. Returns (rows, errors):
+    insert-ready dicts and {"line", "error"} entries for the rows that failed.
+    """
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="upload must be UTF-8 CSV")
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [c for c in CONTACT_IMPORT_REQUIRED if c not in (reader.fieldnames or ())]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"missing CSV column(s): {', '.join(missing)}")
+
+    rows, errors = [], []
+    try:
+        for record in reader:
+            if len(rows) + len(errors) >= IMPORT_MAX_CONTACTS:
+                raise HTTPException(status_code=400, detail=f"at most {IMPORT_MAX_CONTACTS} contacts per import")
+            req = CreateContactRequest(
+                ownerWallet=owner,
+                name=csv_value((record["name"] or "").strip()),
+                walletAddress=csv_value((record["address"] or "").strip()),
+                email=csv_value(record.get("email") or ""),
+                phone=csv_value(record.get("phone") or ""),
+            )
+            try:
+                rows.append(dict(zip(CONTACT_INSERT_COLUMNS, new_contact_params(req, owner))))
+            except HTTPException as e:
+                errors.append({"line": reader.line_num, "error": e.detail})
+    except csv.Error as e:
+        raise HTTPException(status_code=400, detail=f"line {reader.line_num}: {e}")
+    return rows, errors
+
+
+# ── invoices ──────────────────────────────────────────────
+
+@router.post("/invoices", status_code=201)
+def create_invoice(req: CreateInvoiceRequest, request: Request):
+    params = new_invoice_params(req)
+    row = write(repository.insert_invoice, params)
+    notifier.publish(params[0])
+    return row_to_dict(row)
+
+
+def insert_many(cursor, table: str, rows: list):
+    """INSERT dict rows (all with the same keys) in chunks of BULK_CHUNK_SIZE."""
+    columns = list(rows[0])
+    values = [tuple(r[c] for c in columns) for r in rows]
+    if DATABASE_URL:
+        from psycopg2.extras import execute_values
+
+        # Multi-row INSERTs of BULK_CHUNK_SIZE rows instead of a round trip per row
+        execute_values(
+            cursor,
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s",
+            values,
+            page_size=BULK_CHUNK_SIZE,
+        )
+    else:
+        p = get_placeholder()
+        cursor.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join([p] * len(columns))})",
+            values,
+        )
+
+
+@router.post("/invoices/bulk", status_code=201)
+def create_invoices_bulk(req: BulkInvoiceRequest, request: Request):
+    """
+    Create up to BULK_MAX_INVOICES invoices in one transaction. Items carrying a
+    txHash are recorded as PAID in the same statement. Every item is validated
+    before anything is written; any invalid item rejects the whole request.
+    """
+    if not req.invoices:
+        raise HTTPException(status_code=400, detail="no invoices given")
+    if len(req.invoices) > BULK_MAX_INVOICES:
+        raise HTTPException(status_code=400, detail=f"at most {BULK_MAX_INVOICES} invoices per request")
+
+    rows, errors = [], []
+    for index, item in enumerate(req.invoices):
+        try:
+            values = dict(zip(INVOICE_INSERT_COLUMNS, new_invoice_params(item)))
+            if item.payerAddress and not is_valid_address(item.payerAddress):
+                raise HTTPException(status_code=400, detail="invalid payer address")
+            if item.txHash and not is_valid_tx_hash(item.txHash):
+                raise HTTPException(status_code=400, detail="invalid transaction hash")
+        except HTTPException as e:
+            errors.append({"index": index, "error": e.detail})
+            continue
+        paid = bool(item.txHash)
+        values.update(
+            status="PAID" if paid else "PENDING",
+            paid_at=values["created_at"] if paid else None,
+            tempo_tx_hash=normalize_tx_hash(item.txHash),
+            payer_address=normalize_address(item.payerAddress),
+            verification="QUEUED" if paid and VERIFY_PAYMENTS else None,
+        )
+        rows.append(values)
+    if errors:
+        raise HTTPException(status_code=400, detail=errors)
 
     with get_db() as conn:
         cursor = get_cursor(conn)
-        cursor.execute(
-            f"""INSERT INTO invoices 
-               (id, merchant_address, customer_email, amount, token_address, memo, status, created_at, payment_link, tempo_chain_id, tempo_rpc)
-               VALUES ({p}, {p}, {p}, {p}, {p}, {p}, 'PENDING', {p}, {p}, {p}, {p})""",
-            (inv_id, req.merchantAddress, req.customerEmail, str(req.amount), req.tokenAddress, memo, now, payment_link, TEMPO_CHAIN_ID, TEMPO_RPC_URL),
-        )
+        insert_many(cursor, "invoices", rows)
+        repository.bump_versions(cursor, [s for r in rows for s in repository.invoice_scopes(r)])
+        repository.update_summaries(cursor, [d for r in rows for d in repository.invoice_created_deltas(r)])
         conn.commit()
-        cursor.execute(f"SELECT * FROM invoices WHERE id = {p}", (inv_id,))
-        row = cursor.fetchone()
+    for r in rows:
+        notifier.publish(r["id"])
 
-    return row_to_dict(row)
+    return [row_to_dict({**INVOICE_DEFAULTS, **r}) for r in rows]
 
 
 @router.get("/invoices")
-def list_invoices(wallet: str = ""):
-    p = get_placeholder()
+def list_invoices(
+    request: Request,
+    wallet: str = "",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = "",
+    format: str = "json",
+):
+    """
+    Without `limit`/`cursor` the full history is streamed (JSON array, or
+    NDJSON with format=ndjson). With them, one keyset page is returned as
+    {"items": [...], "nextCursor": ...}, newest first.
+    """
+    sql, params, page_size = invoice_list_query(wallet, limit, cursor)
+    scope = repository.invoice_list_scope(normalize_address(wallet))
     with get_db() as conn:
-        cursor = get_cursor(conn)
-        if wallet:
-            cursor.execute(
-                f"SELECT * FROM invoices WHERE LOWER(merchant_address) = LOWER({p}) OR LOWER(payer_address) = LOWER({p}) ORDER BY created_at DESC",
-                (wallet, wallet),
-            )
-        else:
-            cursor.execute("SELECT * FROM invoices ORDER BY created_at DESC")
-        rows = cursor.fetchall()
-    return [row_to_dict(r) for r in rows]
+        cur = get_cursor(conn, as_dict=False)
+        etag = make_etag(scope, repository.get_version(cur, scope), limit, cursor, format)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        if page_size is not None:
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+
+    if page_size is None:
+        return set_cache_headers(stream_rows(sql, params, invoice_from_row, format), etag)
+    return set_cache_headers(FastJSONResponse(invoice_page(rows, page_size)), etag)
+
+
+def invoice_entry(invoice_id: str, row):
+    """
+    invoice_cache entry (body, etag) for a SELECT_INVOICE_VERSIONED row, and
+    the longest it may be cached. The ETag covers the reported status, so an
+    invoice that lapses into EXPIRED revalidates before the sweeper bumps it.
+    """
+    if row is None:
+        return None, None
+    item = invoice_from_row(row)  # zip() stops before the trailing version column
+    etag = make_etag("invoice", invoice_id, row[len(INVOICE_KEYS)] or 0, item["status"])
+    max_ttl = None
+    if item["status"] == "PENDING" and item["expiresAt"]:
+        try:
+            expires = datetime.fromisoformat(item["expiresAt"].removesuffix("Z"))
+            max_ttl = max(0.0, (expires - datetime.utcnow()).total_seconds())
+        except ValueError:
+            max_ttl = 0.0
+    return (dumps(item), etag), max_ttl
+
+
+def cached_invoice_response(request: Request, entry) -> Response:
+    """Answer GET /invoices/{id} from an invoice_cache entry."""
+    if entry is None:
+        raise HTTPException(status_code=404, detail="invoice not found")
+    body, etag = entry
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    return set_cache_headers(Response(body, media_type="application/json"), etag)
+
+
+@router.get("/invoices/search")
+def search_invoices(
+    wallet: str = "",
+    q: str = "",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = "",
+):
+    """
+    Invoices of `wallet` (as merchant or payer) whose memo or customer email
+    has words starting with every word of `q`, best match first.
+    """
+    wallet, terms, page_size, offset = search_params(wallet, q, limit, cursor)
+    rows = search_rows(*search.invoice_search_query(wallet, terms, page_size + 1, offset))
+    return FastJSONResponse(search_page(rows, page_size, offset, invoice_from_row))
+
+
+@router.get("/invoices/export")
+def export_invoices(
+    wallet: str = "",
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+    format: str = "csv",
+):
+    """
+    Download invoice history as CSV or NDJSON, oldest first. `from` / `to`
+    are ISO dates or datetimes (UTC unless an offset is given); `to` is
+    exclusive, and a bare date includes that whole day.
+    """
+    sql, params = invoice_export_query(wallet, export_bound(start, "from"), export_bound(end, "to", end=True))
+    return export_rows(sql, params, invoice_from_row, INVOICE_KEYS, format, "invoices")
 
 
 @router.get("/invoices/{invoice_id}")
-def get_invoice(invoice_id: str):
-    p = get_placeholder()
+def get_invoice(invoice_id: str, request: Request):
+    entry = invoice_cache.get(invoice_id)
+    if entry is not MISS:
+        return cached_invoice_response(request, entry)
+
+    token = invoice_cache.token(invoice_id)
     with get_db() as conn:
-        cursor = get_cursor(conn)
-        cursor.execute(f"SELECT * FROM invoices WHERE id = {p}", (invoice_id,))
+        cursor = get_cursor(conn, as_dict=False)
+        cursor.execute(repository.SELECT_INVOICE_VERSIONED, repository.invoice_params(f"invoice:{invoice_id}", invoice_id))
         row = cursor.fetchone()
-    if row is None:
-        raise HTTPException(status_code=404, detail="invoice not found")
-    return row_to_dict(row)
+    entry, max_ttl = invoice_entry(invoice_id, row)
+    invoice_cache.set(invoice_id, entry, token, max_ttl)
+    return cached_invoice_response(request, entry)
 
 
 @router.delete("/invoices/{invoice_id}", status_code=204)
 def delete_invoice(invoice_id: str, request: Request):
-    p = get_placeholder()
-    caller = request.state.wallet
-
     # Ownership check: only the merchant can delete their invoice
     with get_db() as conn:
-        cursor = get_cursor(conn)
-        cursor.execute(f"SELECT * FROM invoices WHERE id = {p}", (invoice_id,))
-        row = cursor.fetchone()
-        if row is None:
-            raise HTTPException(status_code=404, detail="invoice not found")
-        inv = row_to_dict(row)
-        if caller and inv.get("merchantAddress", "").lower() != caller:
-            raise HTTPException(status_code=403, detail="not your invoice")
-
-        cursor.execute(f"DELETE FROM invoices WHERE id = {p}", (invoice_id,))
+        outcome = repository.delete_invoice(get_cursor(conn), invoice_id, request.state.wallet)
         conn.commit()
+    if outcome == repository.NOT_FOUND:
+        raise HTTPException(status_code=404, detail="invoice not found")
+    if outcome == repository.FORBIDDEN:
+        raise HTTPException(status_code=403, detail="not your invoice")
+    notifier.publish(invoice_id)
     return None
 
 
 @router.post("/invoices/{invoice_id}/pay")
 def mark_paid(invoice_id: str, req: MarkPaidRequest, request: Request):
-    # Validate payer address if provided
-    if req.payerAddress and not is_valid_address(req.payerAddress):
-        raise HTTPException(status_code=400, detail="invalid payer address")
+    params = mark_paid_params(invoice_id, req)
+    row = write(repository.mark_invoice_paid, params)
+    invoice = paid_invoice(row, req)
+    notifier.publish(invoice_id)
+    return invoice
 
-    now = datetime.utcnow().isoformat() + "Z"
-    p = get_placeholder()
+
+# ── invoice status push (SSE / long-poll) ─────────────────
+
+SSE_HEARTBEAT_SECONDS = 15
+LONG_POLL_MAX_SECONDS = 55
+
+
+def fetch_invoice(invoice_id: str) -> Optional[dict]:
     with get_db() as conn:
-        cursor = get_cursor(conn)
-        cursor.execute(
-            f"UPDATE invoices SET status = 'PAID', paid_at = {p}, tempo_tx_hash = {p}, payer_address = {p} WHERE id = {p}",
-            (now, req.txHash, req.payerAddress, invoice_id),
-        )
-        conn.commit()
-        cursor.execute(f"SELECT * FROM invoices WHERE id = {p}", (invoice_id,))
+        cursor = get_cursor(conn, as_dict=False)
+        cursor.execute(repository.SELECT_INVOICE, repository.invoice_params(invoice_id))
         row = cursor.fetchone()
-    if row is None:
+    return invoice_from_row(row) if row is not None else None
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json_dumps(data)}\n\n"
+
+
+@router.get("/invoices/{invoice_id}/events")
+async def invoice_events(invoice_id: str):
+    """
+    Server-sent events for one invoice: the current state as a `status` event,
+    then (while PENDING) a second `status` event as soon as it changes.
+    The stream ends after SSE_MAX_SECONDS; EventSource reconnects by itself.
+    """
+    # Subscribe before reading so a change between the two isn't missed
+    changed = notifier.subscribe(invoice_id)
+    invoice = await run_in_threadpool(fetch_invoice, invoice_id)
+    if invoice is None:
+        notifier.unsubscribe(invoice_id, changed)
         raise HTTPException(status_code=404, detail="invoice not found")
-    return row_to_dict(row)
 
+    async def generate():
+        try:
+            yield f"retry: 3000\n{sse_event('status', invoice)}"
+            if invoice["status"] != "PENDING":
+                return
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + SSE_MAX_SECONDS
+            while not changed.done():
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                try:
+                    await asyncio.wait_for(asyncio.shield(changed), min(SSE_HEARTBEAT_SECONDS, remaining))
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+            updated = await run_in_threadpool(fetch_invoice, invoice_id)
+            if updated is not None:
+                yield sse_event("status", updated)
+        finally:
+            notifier.unsubscribe(invoice_id, changed)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-# ── contacts ──────────────────────────────────────────────
 
-def _contact_to_dict(row) -> dict:
+@router.get("/invoices/{invoice_id}/wait")
+async def wait_invoice(
+    invoice_id: str,
+    status: str = "PENDING",
+    timeout: float = Query(25, gt=0, le=LONG_POLL_MAX_SECONDS),
+):
+    """
+    Long-poll fallback: returns as soon as the invoice's status differs from
+    `status` (the one the client already has), or after `timeout` seconds.
+    """
+    changed = notifier.subscribe(invoice_id)
     try:
-        r = dict(row)
-    except (TypeError, ValueError):
-        return {}
+        invoice = await run_in_threadpool(fetch_invoice, invoice_id)
+        if invoice is None:
+            raise HTTPException(status_code=404, detail="invoice not found")
+        if invoice["status"] != status:
+            return invoice
+        try:
+            await asyncio.wait_for(changed, timeout)
+        except asyncio.TimeoutError:
+            return invoice
+    finally:
+        notifier.unsubscribe(invoice_id, changed)
+    return await run_in_threadpool(fetch_invoice, invoice_id) or invoice
+
+
+# ── wallet summaries ──────────────────────────────────────
+
+SUMMARY_MAX_DAYS = 366
+
+
+def _summary_totals(values) -> dict:
+    pending_count, pending_minor, paid_count, received_minor, sent_count, sent_minor = values
     return {
-        "id": r.get("id"),
-        "ownerWallet": r.get("owner_wallet"),
-        "name": r.get("name"),
-        "address": r.get("wallet_address"),
-        "email": r.get("email") or "",
-        "phone": r.get("phone") or "",
+        "pendingCount": pending_count,
+        "pendingAmount": format_minor(pending_minor),
+        "paidCount": paid_count,
+        "receivedAmount": format_minor(received_minor),
+        "sentCount": sent_count,
+        "sentAmount": format_minor(sent_minor),
     }
 
 
+def wallet_summary(wallet: str, rows) -> dict:
+    """Fold wallet_summaries rows (bucket, token, *counters) into the API shape."""
+    width = len(repository.SUMMARY_COLUMNS)
+    totals, tokens, days = [0] * width, {}, {}
+    for bucket, token, *values in rows:
+        if bucket == "all":
+            tokens[token] = [a + b for a, b in zip(tokens.get(token, [0] * width), values)]
+            totals = [a + b for a, b in zip(totals, values)]
+        else:
+            days[bucket] = [a + b for a, b in zip(days.get(bucket, [0] * width), values)]
+    return {
+        "wallet": wallet,
+        "totals": _summary_totals(totals),
+        "tokens": [{"tokenAddress": t, **_summary_totals(v)} for t, v in sorted(tokens.items())],
+        "days": [{"day": d, **_summary_totals(v)} for d, v in sorted(days.items(), reverse=True)],
+    }
+
+
+@router.get("/wallets/{address}/summary")
+def get_wallet_summary(address: str, request: Request, days: int = Query(30, ge=1, le=SUMMARY_MAX_DAYS)):
+    """
+    Invoice totals for a wallet as merchant (pending / received) and payer
+    (sent), overall, per token and per day for the last `days` days. Served
+    from the incrementally maintained wallet_summaries table; invoices that
+    have expired but weren't swept yet are left out of the pending totals.
+    """
+    if not is_valid_address(address):
+        raise HTTPException(status_code=400, detail="invalid wallet address")
+    wallet = normalize_address(address)
+    since = (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+    scope = repository.invoice_list_scope(wallet)
+    with get_db() as conn:
+        cursor = get_cursor(conn, as_dict=False)
+        version = repository.get_version(cursor, scope)
+        rows = repository.get_summary_rows(cursor, wallet, since, utc_timestamp())
+    # Invoices lapse into EXPIRED without a write, so the ETag covers the totals themselves
+    summary = wallet_summary(wallet, rows)
+    etag = make_etag("summary", scope, version, since, json_dumps(summary["totals"]))
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    return set_cache_headers(FastJSONResponse(summary), etag)
+
+
+# ── contacts ──────────────────────────────────────────────
+
 @router.get("/contacts")
-def list_contacts(wallet: str = ""):
-    p = get_placeholder()
+def list_contacts(
+    request: Request,
+    wallet: str = "",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = "",
+    format: str = "json",
+):
+    """Same paging/streaming contract as list_invoices, keyed on contact id."""
+    sql, params, page_size = contact_list_query(wallet, limit, cursor)
+    scope = repository.contact_list_scope(normalize_address(wallet))
     with get_db() as conn:
-        cursor = get_cursor(conn)
-        if wallet:
-            cursor.execute(
-                f"SELECT * FROM contacts WHERE LOWER(owner_wallet) = LOWER({p})",
-                (wallet,),
-            )
-        else:
-            cursor.execute("SELECT * FROM contacts")
-        rows = cursor.fetchall()
-    return [_contact_to_dict(r) for r in rows]
+        cur = get_cursor(conn, as_dict=False)
+        etag = make_etag(scope, repository.get_version(cur, scope), limit, cursor, format)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        if page_size is not None:
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+
+    if page_size is None:
+        return set_cache_headers(stream_rows(sql, params, contact_from_row, format), etag)
+    return set_cache_headers(FastJSONResponse(contact_page(rows, page_size)), etag)
 
 
 @router.get("/contacts/lookup")
 def lookup_contact(wallet: str = "", email: str = "", phone: str = ""):
     """Lookup a contact by email or phone within the user's address book."""
-    if not wallet:
-        raise HTTPException(status_code=400, detail="wallet is required")
-    if not email and not phone:
-        raise HTTPException(status_code=400, detail="email or phone required")
-
-    p = get_placeholder()
+    sql, params = lookup_query(wallet, email, phone)
     with get_db() as conn:
-        cursor = get_cursor(conn)
-        if email:
-            cursor.execute(
-                f"SELECT * FROM contacts WHERE LOWER(owner_wallet) = LOWER({p}) AND LOWER(email) = LOWER({p})",
-                (wallet, email),
-            )
-        else:
-            cursor.execute(
-                f"SELECT * FROM contacts WHERE LOWER(owner_wallet) = LOWER({p}) AND phone = {p}",
-                (wallet, phone),
-            )
+        cursor = get_cursor(conn, as_dict=False)
+        cursor.execute(sql, params)
         row = cursor.fetchone()
 
     if row is None:
-        return {"found": False, "contact": None}
-    return {"found": True, "contact": _contact_to_dict(row)}
+        return FastJSONResponse({"found": False, "contact": None})
+    return FastJSONResponse({"found": True, "contact": contact_from_row(row)})
 
 
-@router.post("/contacts", status_code=201)
-def create_contact(req: CreateContactRequest, request: Request):
-    # Validate wallet addresses
-    if not is_valid_address(req.ownerWallet):
-        raise HTTPException(status_code=400, detail="invalid owner wallet address")
-    if not is_valid_address(req.walletAddress):
-        raise HTTPException(status_code=400, detail="invalid contact wallet address")
+@router.post("/contacts/resolve")
+def resolve_contacts(req: ResolveContactsRequest, request: Request):
+    """
+    Resolve many emails and phones (e.g. a payout sheet's recipients) against
+    the caller's address book in one query. Values are normalized the way
+    contacts are stored: emails lowercased, phones E.164.
+    """
+    sql, params, wanted = resolve_query(resolve_wallet(req, request.state.wallet), req.emails, req.phones)
+    rows = []
+    if sql:
+        with get_db() as conn:
+            cursor = get_cursor(conn, as_dict=False)
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+    return FastJSONResponse(resolve_result(wanted, rows))
 
-    # Ownership: caller must match owner
-    caller = request.state.wallet
-    if caller and req.ownerWallet.lower() != caller:
-        raise HTTPException(status_code=403, detail="wallet mismatch")
 
-    contact_id = str(uuid.uuid4())
-    p = get_placeholder()
-    with get_db() as conn:
-        cursor = get_cursor(conn)
-        cursor.execute(
-            f"INSERT INTO contacts (id, owner_wallet, name, wallet_address, email, phone) VALUES ({p}, {p}, {p}, {p}, {p}, {p})",
-            (contact_id, req.ownerWallet, req.name, req.walletAddress, req.email, req.phone),
-        )
-        conn.commit()
-        cursor.execute(f"SELECT * FROM contacts WHERE id = {p}", (contact_id,))
-        row = cursor.fetchone()
-    return _contact_to_dict(row)
+@router.get("/contacts/search")
+def search_contacts(
+    wallet: str = "",
+    q: str = "",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = "",
+):
+    """Contacts in `wallet`'s address book by name or email prefix, best match first."""
+    wallet, terms, page_size, offset = search_params(wallet, q, limit, cursor)
+    rows = search_rows(*search.contact_search_query(wallet, terms, page_size + 1, offset))
+    return FastJSONResponse(search_page(rows, page_size, offset, contact_from_row))
+
+
+@router.get("/contacts/export")
+def export_contacts(wallet: str = "", format: str = "csv"):
+    """Download an address book (or every contact) as CSV or NDJSON."""
+    sql, params, _ = contact_list_query(wallet, None, "")
+    return export_rows(sql, params, contact_from_row, CONTACT_KEYS, format, "contacts")
+
+
+@router.post("/contacts/import", status_code=201)
+async def import_contacts(request: Request):
+    """
+    Add contacts to the caller's address book from a CSV request body with a
+    header row: name, address, and optionally email, phone. Every row is
+    validated before anything is written; any invalid row rejects the import
+    with per-line errors, otherwise all rows are inserted in one transaction.
+    """
+    owner = request.state.wallet
+    rows, errors = contact_import_rows(await read_body(request, IMPORT_MAX_BYTES), owner)
+    if errors:
+        raise HTTPException(status_code=400, detail=errors)
+    if not rows:
+        raise HTTPException(status_code=400, detail="no contacts given")
+
+    def insert():
+        with get_db() as conn:
+            cursor = get_cursor(conn)
+            insert_many(cursor, "contacts", rows)
+            repository.bump_versions(cursor, repository.contact_scopes(rows[0]))
+            conn.commit()
+
+    await run_in_threadpool(insert)
+    return [contact_to_dict(r) for r in rows]
+
+
+@router.post("/contacts", status_code=201)
+def create_contact(req: CreateContactRequest, request: Request):
+    params = new_contact_params(req, request.state.wallet)
+    row = write(repository.insert_contact, params)
+    return contact_to_dict(row)
 
 
 @router.delete("/contacts/{contact_id}", status_code=204)
 def delete_contact(contact_id: str, request: Request):
-    p = get_placeholder()
-    caller = request.state.wallet
-
     # Ownership check: only the owner can delete their contact
     with get_db() as conn:
-        cursor = get_cursor(conn)
-        cursor.execute(f"SELECT * FROM contacts WHERE id = {p}", (contact_id,))
-        row = cursor.fetchone()
-        if row is None:
-            raise HTTPException(status_code=404, detail="contact not found")
-        contact = _contact_to_dict(row)
-        if caller and contact.get("ownerWallet", "").lower() != caller:
-            raise HTTPException(status_code=403, detail="not your contact")
-
-        cursor.execute(f"DELETE FROM contacts WHERE id = {p}", (contact_id,))
+        outcome = repository.delete_contact(get_cursor(conn), contact_id, request.state.wallet)
         conn.commit()
+    if outcome == repository.NOT_FOUND:
+        raise HTTPException(status_code=404, detail="contact not found")
+    if outcome == repository.FORBIDDEN:
+        raise HTTPException(status_code=403, detail="not your contact")
     return None
@@ -0,0 +1,164 @@
+"""
+Full-text search over invoices (memo, customer email) and contacts (name,
+email), scoped to one wallet.
+
+Documents are split into words on anything that isn't a letter or digit, the
+same way on both backends, and every word of the query is matched as a prefix
+so the endpoints work for type-ahead:
+- SQLite: contentless FTS5 tables (invoices_fts, invoices_archive_fts,
+  contacts_fts) kept in sync by triggers, so bulk inserts, imports,
+  migrations and archiving are covered too. The wallet columns are indexed as
+  well so the wallet filter is part of the MATCH. Results are ranked by bm25().
+  The TEXT-keyed tables have no stable integer key of their own (VACUUM may
+  renumber an implicit rowid), so each has a `<table>_search_keys` table
+  giving every id an INTEGER PRIMARY KEY `doc`, used as the FTS rowid.
+- Postgres: GIN indexes on the to_tsvector() expressions below, matched with
+  prefix tsqueries and ranked by ts_rank(). The queries repeat the indexed
+  expressions verbatim so the planner can use them. Both backends match word
+  prefixes, not arbitrary substrings, so there are no pg_trgm indexes.
+"""
+import re
+
+from database import get_placeholder, DATABASE_URL
+from repository import INVOICE_TABLES
+from serializers import INVOICE_COLUMNS, CONTACT_COLUMNS
+
+p = get_placeholder()
+
+# Query words: runs of letters / digits (matching FTS5's unicode61 tokenizer).
+# Single characters are dropped: as prefixes they match most of the index.
+WORD_RE = re.compile(r"[^\W_]{2,}")
+MAX_TERMS = 8
+
+
+def _document(*columns: str) -> str:
+    text = " || ' ' || ".join(f"COALESCE({c}, '')" for c in columns)
+    return f"to_tsvector('simple', regexp_replace({text}, '[^[:alnum:]]+', ' ', 'g'))"
+
+
+INVOICE_DOCUMENT = _document("memo", "customer_email")
+INVOICE_FTS_COLUMNS = ("memo", "customer_email", "merchant_address", "payer_address")
+CONTACT_DOCUMENT = _document("name", "email")
+
+
+def search_terms(q: str) -> list:
+    """Lowercased words (of two or more characters) of a search string, at most MAX_TERMS."""
+    return WORD_RE.findall((q or "").lower())[:MAX_TERMS]
+
+
+def _fts_match(wallet_columns: str, text_columns: str, wallet: str, terms: list) -> str:
+    # Terms and the wallet are plain letters/digits, so quoting them is enough
+    prefixes = " AND ".join(f'"{t}"*' for t in terms)
+    return f'{{{wallet_columns}}} : "{wallet}" AND {{{text_columns}}} : ({prefixes})'
+
+
+def _tsquery(terms: list) -> str:
+    return " & ".join(f"{t}:*" for t in terms)
+
+
+def invoice_search_query(wallet: str, terms: list, limit: int, offset: int):
+    """
+    Invoices where `wallet` is merchant or payer, best match first, from the
+    hot table and the archive. Rows carry their score after INVOICE_COLUMNS.
+    """
+    order = f'ORDER BY score, "createdAt" DESC, "id" LIMIT {p} OFFSET {p}'
+    if DATABASE_URL:
+        branch = (
+            f"SELECT {INVOICE_COLUMNS}, -ts_rank({INVOICE_DOCUMENT}, to_tsquery('simple', {p})) AS score FROM {{}} "
+            f"WHERE (merchant_address = {p} OR payer_address = {p}) AND {INVOICE_DOCUMENT} @@ to_tsquery('simple', {p})"
+        )
+        params = (_tsquery(terms), wallet, wallet, _tsquery(terms))
+    else:
+        # Each table contributes its best offset + limit hits, merged by score;
+        # bm25 weights: memo, customer_email count, the wallet columns only filter
+        branch = (
+            f"SELECT {INVOICE_COLUMNS}, hits.score AS score FROM ("
+            f"SELECT rowid AS hit, bm25({{0}}_fts, 1.0, 1.0, 0.0, 0.0) AS score FROM {{0}}_fts "
+            f"WHERE {{0}}_fts MATCH {p} ORDER BY score, rowid LIMIT {p}"
+            f") AS hits JOIN {{0}}_search_keys AS k ON k.doc = hits.hit JOIN {{0}} USING (id)"
+        )
+        params = (_fts_match("merchant_address payer_address", "memo customer_email", wallet, terms), offset + limit)
+    sql = " UNION ALL ".join(branch.format(table) for table in INVOICE_TABLES)
+    return f"{sql} {order}", params * len(INVOICE_TABLES) + (limit, offset)
+
+
+def contact_search_query(wallet: str, terms: list, limit: int, offset: int):
+    """Contacts in `wallet`'s address book, best match first."""
+    if DATABASE_URL:
+        sql = f"""SELECT {CONTACT_COLUMNS} FROM contacts
+            WHERE owner_wallet = {p} AND {CONTACT_DOCUMENT} @@ to_tsquery('simple', {p})
+            ORDER BY ts_rank({CONTACT_DOCUMENT}, to_tsquery('simple', {p})) DESC, name, id
+            LIMIT {p} OFFSET {p}"""
+        return sql, (wallet, _tsquery(terms), _tsquery(terms), limit, offset)
+    sql = f"""WITH hits AS (
+            SELECT rowid AS hit, bm25(contacts_fts, 1.0, 1.0, 0.0) AS score FROM contacts_fts
+            WHERE contacts_fts MATCH {p} ORDER BY score, rowid LIMIT {p} OFFSET {p}
+        )
+        SELECT {CONTACT_COLUMNS} FROM hits
+        JOIN contacts_search_keys AS k ON k.doc = hits.hit JOIN contacts USING (id)
+        ORDER BY hits.score, hits.hit"""
+    return sql, (_fts_match("owner_wallet", "name email", wallet, terms), limit, offset)
+
+
+# ── schema (applied by migrations.py) ─────────────────────
+
+def _fts_table(table: str, columns: tuple) -> list:
+    """
+    Contentless FTS5 index over `columns` of `table`, keyed on
+    `{table}_search_keys.doc`, with the triggers that keep both current.
+    """
+    fts, keys = f"{table}_fts", f"{table}_search_keys"
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    old_doc, new_doc = (f"(SELECT doc FROM {keys} WHERE id = {row}.id)" for row in ("old", "new"))
+    # A contentless table deletes a document given the values it was indexed with
+    delete = f"INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', {old_doc}, {old});"
+    insert = f"INSERT INTO {fts} (rowid, {cols}) VALUES ({new_doc}, {new});"
+    return [
+        f"CREATE TABLE IF NOT EXISTS {keys} (doc INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE)",
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {cols}, content='',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )""",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {keys} (id) VALUES (new.id); {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN "
+        f"{delete} DELETE FROM {keys} WHERE id = old.id; END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {cols} ON {table} BEGIN {delete} {insert} END",
+        f"INSERT INTO {keys} (id) SELECT id FROM {table}",
+        f"INSERT INTO {fts} (rowid, {cols}) SELECT {keys}.doc, {cols} FROM {table} JOIN {keys} ON {keys}.id = {table}.id",
+    ]
+
+
+def drop_fts_statements() -> list:
+    """Drop the SQLite search indexes, so they can be rebuilt from scratch."""
+    if DATABASE_URL:
+        return []
+    return [
+        statement
+        for table in ("invoices", "invoices_archive", "contacts")
+        for statement in (
+            *(f"DROP TRIGGER IF EXISTS {table}_fts_{event}" for event in ("insert", "delete", "update")),
+            f"DROP TABLE IF EXISTS {table}_fts",
+            f"DROP TABLE IF EXISTS {table}_search_keys",
+        )
+    ]
+
+
+def search_index_statements() -> list:
+    if DATABASE_URL:
+        return [
+            f"CREATE INDEX IF NOT EXISTS idx_invoices_search ON invoices USING GIN ({INVOICE_DOCUMENT})",
+            f"CREATE INDEX IF NOT EXISTS idx_contacts_search ON contacts USING GIN ({CONTACT_DOCUMENT})",
+        ]
+    return (
+        _fts_table("invoices", INVOICE_FTS_COLUMNS)
+        + _fts_table("contacts", ("name", "email", "owner_wallet"))
+    )
+
+
+def archive_search_index_statements() -> list:
+    if DATABASE_URL:
+        return [f"CREATE INDEX IF NOT EXISTS idx_invoices_archive_search ON invoices_archive USING GIN ({INVOICE_DOCUMENT})"]
+    return _fts_table("invoices_archive", INVOICE_FTS_COLUMNS)
@@ -0,0 +1,136 @@
+"""
+Fast serialization path for the read endpoints.
+
+Read queries select the API fields directly, aliased to their camelCase names
+and in a fixed order, so a row (tuple, sqlite3.Row or asyncpg Record) maps to
+a response object with a single dict(zip(...)). Responses are encoded with
+orjson when it is installed and returned as ready-made bodies, which skips
+FastAPI's jsonable_encoder pass over every item.
+
+row_to_dict / contact_to_dict in database.py remain for `RETURNING *` rows.
+"""
+import csv
+import io
+import json
+
+from fastapi.responses import Response
+
+from database import reported_status
+from metrics import timed
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to the stdlib encoder
+    orjson = None
+
+
+def dumps(obj) -> bytes:
+    """Compact UTF-8 JSON, same output as Starlette's JSONResponse."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        with timed("serialize"):
+            return dumps(content)
+
+
+# ── projections ───────────────────────────────────────────
+
+def _projection(fields) -> str:
+    return ", ".join(f'{expr} AS "{key}"' for expr, key in fields)
+
+
+# (SQL expression, API field) in response order
+INVOICE_FIELDS = (
+    ("id", "id"),
+    ("merchant_address", "merchantAddress"),
+    ("COALESCE(customer_email, '')", "customerEmail"),
+    ("amount", "amount"),
+    ("token_address", "tokenAddress"),
+    ("memo", "memo"),
+    ("status", "status"),
+    ("created_at", "createdAt"),
+    ("paid_at", "paidAt"),
+    ("expires_at", "expiresAt"),
+    ("payment_link", "paymentLink"),
+    ("COALESCE(tempo_tx_hash, '')", "tempoTxHash"),
+    ("COALESCE(payer_address, '')", "payerAddress"),
+    ("tempo_chain_id", "tempoChainId"),
+    ("tempo_rpc", "tempoRpc"),
+    ("stablecoin_name", "stablecoinName"),
+    ("fee_sponsored", "feeSponsored"),
+    ("COALESCE(verification, '')", "verification"),
+)
+INVOICE_KEYS = tuple(key for _, key in INVOICE_FIELDS)
+INVOICE_COLUMNS = _projection(INVOICE_FIELDS)
+
+CONTACT_FIELDS = (
+    ("id", "id"),
+    ("owner_wallet", "ownerWallet"),
+    ("name", "name"),
+    ("wallet_address", "address"),
+    ("COALESCE(email, '')", "email"),
+    ("COALESCE(phone, '')", "phone"),
+)
+CONTACT_KEYS = tuple(key for _, key in CONTACT_FIELDS)
+CONTACT_COLUMNS = _projection(CONTACT_FIELDS)
+
+
+def invoice_from_row(row) -> dict:
+    """Map a row selected with INVOICE_COLUMNS to the API shape."""
+    item = dict(zip(INVOICE_KEYS, row))
+    item["feeSponsored"] = item["feeSponsored"] == "true"
+    if item["expiresAt"]:
+        item["status"] = reported_status(item["status"], item["expiresAt"])
+    return item
+
+
+def contact_from_row(row) -> dict:
+    """Map a row selected with CONTACT_COLUMNS to the API shape."""
+    return dict(zip(CONTACT_KEYS, row))
+
+
+# ── streaming chunks ──────────────────────────────────────
+
+def json_array_chunk(items: list, first: bool) -> bytes:
+    """Items of a streamed JSON array, comma-joined, without the brackets."""
+    body = dumps(items)[1:-1]
+    return body if first else b"," + body
+
+
+def ndjson_chunk(items: list) -> bytes:
+    return b"".join(dumps(item) + b"\n" for item in items)
+
+
+# Leading characters spreadsheets treat as a formula
+_CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str) and value.startswith(_CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_value(cell: str) -> str:
+    """Undo _csv_cell's formula escaping on a cell read back from an export."""
+    if cell.startswith("'") and cell[1:].startswith(_CSV_FORMULA_PREFIXES):
+        return cell[1:]
+    return cell
+
+
+def csv_chunk(items: list, keys: tuple) -> bytes:
+    """CSV lines for `items`, columns in `keys` order (pass the keys themselves for a header)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerows([_csv_cell(item[key]) for key in keys] for item in items)
+    return buffer.getvalue().encode()
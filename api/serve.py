@@ -0,0 +1,167 @@
+"""
+Production server.
+
+    python serve.py [--workers N] [--host HOST] [--port PORT]
+
+`python index.py` is a single auto-reloading process for development. This is
+the multi-core setup: the parent process applies pending migrations, imports
+the app and binds the listening socket once, then forks WEB_WORKERS workers
+(default: one per CPU) that inherit all three. Workers serve with uvloop and
+httptools when they are installed (uvicorn[standard]).
+
+Each worker gets its own DB pool of DB_POOL_MAX_SIZE connections (or an even
+share of DB_MAX_CONNECTIONS) and WEB_THREADS threads for sync endpoints. Only
+the first worker runs the expiry sweeper, payment verifier and archiver. State
+kept in process memory is per worker: in-memory rate limits (use
+RATE_LIMIT_BACKEND=db), the invoice cache and /metrics. Cached invoices are
+invalidated across workers via Postgres LISTEN/NOTIFY; on SQLite the cache is
+off with more than one worker unless CACHE_REDIS_URL is set.
+
+SIGTERM or SIGINT drains the server: workers stop accepting connections and
+finish in-flight requests for up to WEB_GRACEFUL_TIMEOUT seconds. A worker that
+dies on its own is replaced. Needs fork(), so POSIX only.
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+from dotenv import load_dotenv
+
+# A worker that exits sooner than this after starting is restarted with a delay
+MIN_WORKER_LIFETIME = 1.0
+
+
+def parse_args():
+    # config is imported only once the worker count is known (see main), so
+    # the defaults are read from the environment here
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_WORKERS", "0")) or os.cpu_count() or 1)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8080")))
+    parser.add_argument("--backlog", type=int, default=2048)
+    return parser.parse_args()
+
+
+def bind(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _exit(signum, frame):
+    raise SystemExit(0)
+
+
+def run_worker(sock: socket.socket, background_tasks: bool):
+    """Worker process body: serve the preloaded app on the inherited socket."""
+    import uvicorn
+    import index
+    from config import WEB_GRACEFUL_TIMEOUT
+
+    # uvicorn installs its own drain handlers while serving; outside of that
+    # (and when it re-raises the signal after draining) a signal just exits
+    signal.signal(signal.SIGTERM, _exit)
+    signal.signal(signal.SIGINT, _exit)
+    index.background_tasks = background_tasks
+    config = uvicorn.Config(
+        index.app,
+        loop="auto",
+        http="auto",
+        lifespan="on",
+        timeout_graceful_shutdown=WEB_GRACEFUL_TIMEOUT,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    """Forks the workers, replaces the ones that die and forwards shutdown signals."""
+
+    def __init__(self, sock: socket.socket, workers: int):
+        self.sock = sock
+        self.workers = max(1, workers)
+        self.children = {}  # pid -> (slot, started)
+        self.stopping = False
+
+    def spawn(self, slot: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                run_worker(self.sock, background_tasks=slot == 0)
+                code = 0
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 0
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        self.children[pid] = (slot, time.monotonic())
+
+    def stop(self, signum, frame):
+        if not self.stopping:
+            print(f"shutting down {len(self.children)} worker(s)")
+        self.stopping = True
+        for pid in list(self.children):
+            # SIGTERM even for Ctrl-C: a second SIGINT would make uvicorn skip the drain
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for slot in range(self.workers):
+            self.spawn(slot)
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            if pid not in self.children:
+                continue
+            slot, started = self.children.pop(pid)
+            if self.stopping:
+                continue
+            print(f"ERROR: worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; restarting")
+            if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                time.sleep(MIN_WORKER_LIFETIME)
+            if not self.stopping:
+                self.spawn(slot)
+
+
+def main():
+    args = parse_args()
+    # Read by config, which sizes the per-worker DB pool from it
+    os.environ["WEB_WORKERS"] = str(args.workers)
+
+    from config import AUTO_MIGRATE
+    from database import close_pool
+    import migrations
+
+    # Migrate once, before any worker exists; a failure stops the deploy here
+    if AUTO_MIGRATE:
+        migrations.migrate()
+    # Preload: workers inherit the imported app instead of each importing it
+    import index  # noqa: F401
+
+    # Connections opened so far belong to this process and must not be shared
+    close_pool()
+    sock = bind(args.host, args.port, args.backlog)
+    print(f"server listening on {args.host}:{args.port} with {args.workers} worker(s)")
+    Supervisor(sock, args.workers).run()
+
+
+if __name__ == "__main__":
+    main()
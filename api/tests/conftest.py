@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# config is read at import time, so the test environment is set up before
+# anything from the app is imported: a throwaway SQLite database and no
+# rate limits or background workers.
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="mikuu-tests-"), "mikuu.db")
+os.environ.pop("DATABASE_URL", None)
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["EXPIRY_SWEEP_INTERVAL"] = "0"
+os.environ["ARCHIVE_AFTER_DAYS"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MERCHANT = "0x" + "a1" * 20
+TOKEN = "0x" + "20" * 20
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    import index
+
+    with TestClient(index.app) as c:
+        yield c
+
+
+@pytest.fixture
+def invoice(client):
+    """A fresh PENDING invoice owned by MERCHANT."""
+    res = client.post(
+        "/invoices",
+        json={"merchantAddress": MERCHANT, "amount": "12.5", "tokenAddress": TOKEN},
+        headers={"X-Wallet-Address": MERCHANT},
+    )
+    assert res.status_code == 201, res.text
+    return res.json()
@@ -0,0 +1,27 @@
+import pytest
+
+import cache
+
+
+def race(c):
+    """A read that fetched the row before a write invalidated it must not cache it."""
+    token = c.token("inv")
+    c.invalidate("inv")
+    c.set("inv", (b"stale", '"e1"'), token)
+    assert c.get("inv") is cache.MISS
+    c.set("inv", (b"fresh", '"e2"'), c.token("inv"))
+    assert c.get("inv") == (b"fresh", '"e2"')
+
+
+def test_memory_cache_drops_stale_sets():
+    race(cache.MemoryCache(max_entries=10, ttl=60, negative_ttl=5))
+
+
+def test_redis_cache_drops_stale_sets(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # fakeredis needs it for EVALSHA
+    import redis
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis.Redis, "from_url", classmethod(lambda cls, url: fakeredis.FakeRedis(server=server)))
+    race(cache.RedisCache("redis://test", ttl=60, negative_ttl=5))
@@ -0,0 +1,28 @@
+OWNER = "0x" + "c3" * 20
+FRIEND = "0x" + "d4" * 20
+
+
+def test_export_import_round_trip(client):
+    headers = {"X-Wallet-Address": OWNER}
+    created = client.post(
+        "/contacts",
+        json={"ownerWallet": OWNER, "name": "=Ada", "walletAddress": FRIEND, "email": "ada@example.com", "phone": "+1 555 123 4567"},
+        headers=headers,
+    )
+    assert created.status_code == 201, created.text
+    assert created.json()["phone"] == "+15551234567"
+
+    exported = client.get("/contacts/export", params={"wallet": OWNER})
+    assert exported.status_code == 200
+    # Formula-like cells are escaped for spreadsheets...
+    assert "'+15551234567" in exported.text
+    assert "'=Ada" in exported.text
+
+    imported = client.post("/contacts/import", content=exported.content, headers=headers)
+    assert imported.status_code == 201, imported.text
+    # ...and read back unescaped
+    (contact,) = imported.json()
+    assert contact["name"] == "=Ada"
+    assert contact["address"] == FRIEND
+    assert contact["email"] == "ada@example.com"
+    assert contact["phone"] == "+15551234567"
@@ -0,0 +1,125 @@
+from database import get_db, get_cursor, get_placeholder, utc_timestamp
+
+PAYER = "0x" + "b2" * 20
+TX_HASH = "0x" + "cd" * 32
+
+
+def pay(client, invoice_id):
+    return client.post(
+        f"/invoices/{invoice_id}/pay",
+        json={"txHash": TX_HASH, "payerAddress": PAYER},
+        headers={"X-Wallet-Address": PAYER},
+    )
+
+
+def test_timestamps_are_fixed_width(client, invoice):
+    paid = pay(client, invoice["id"]).json()
+    assert len(invoice["createdAt"]) == len(paid["paidAt"]) == len(utc_timestamp())
+
+
+def test_pay(client, invoice):
+    res = pay(client, invoice["id"])
+    assert res.status_code == 200
+    assert res.json()["status"] == "PAID"
+    assert res.json()["tempoTxHash"] == TX_HASH
+
+
+def test_pay_again(client, invoice):
+    assert pay(client, invoice["id"]).status_code == 200
+    # A retry of the same payment is idempotent...
+    retry = pay(client, invoice["id"])
+    assert retry.status_code == 200
+    assert retry.json()["tempoTxHash"] == TX_HASH
+    # ...another transaction is refused and not recorded
+    other = client.post(
+        f"/invoices/{invoice['id']}/pay",
+        json={"txHash": "0x" + "ef" * 32, "payerAddress": PAYER},
+        headers={"X-Wallet-Address": PAYER},
+    )
+    assert other.status_code == 409
+    assert client.get(f"/invoices/{invoice['id']}").json()["tempoTxHash"] == TX_HASH
+
+
+def test_pay_unknown_invoice(client):
+    assert pay(client, "no-such-invoice").status_code == 404
+
+
+def test_pay_expired_invoice_conflicts(client, invoice):
+    p = get_placeholder()
+    with get_db() as conn:
+        get_cursor(conn).execute(
+            f"UPDATE invoices SET expires_at = {p} WHERE id = {p}",
+            ("2000-01-01T00:00:00.000000Z", invoice["id"]),
+        )
+        conn.commit()
+
+    res = pay(client, invoice["id"])
+    assert res.status_code == 409
+    assert "EXPIRED" in res.json()["detail"]
+    current = client.get(f"/invoices/{invoice['id']}").json()
+    assert current["status"] == "EXPIRED"
+    assert current["tempoTxHash"] == ""
+
+
+
+def create(client, merchant, amount="1"):
+    res = client.post(
+        "/invoices",
+        json={"merchantAddress": merchant, "amount": amount, "tokenAddress": "0x" + "20" * 20},
+        headers={"X-Wallet-Address": merchant},
+    )
+    assert res.status_code == 201, res.text
+    return res.json()
+
+
+def test_wallet_listing_pages_merge_both_roles(client):
+    wallet, other = "0x" + "e5" * 20, "0x" + "f6" * 20
+    issued = [create(client, wallet) for _ in range(3)]
+    received = [create(client, other) for _ in range(3)]
+    self_paid = create(client, wallet)
+    for invoice in received + [self_paid]:
+        client.post(f"/invoices/{invoice['id']}/pay", json={"txHash": TX_HASH, "payerAddress": wallet}, headers={"X-Wallet-Address": wallet})
+
+    seen, cursor = [], ""
+    while True:
+        page = client.get("/invoices", params={"wallet": wallet, "limit": 2, "cursor": cursor}).json()
+        seen += page["items"]
+        cursor = page["nextCursor"]
+        if not cursor:
+            break
+    keys = [(i["createdAt"], i["id"]) for i in seen]
+    assert keys == sorted(keys, reverse=True)
+    assert sorted(i["id"] for i in seen) == sorted(i["id"] for i in issued + received + [self_paid])
+
+
+def test_unfiltered_listing_etag_changes_on_any_write(client):
+    before = client.get("/invoices", params={"limit": 1}).headers["ETag"]
+    assert client.get("/invoices", params={"limit": 1}, headers={"If-None-Match": before}).status_code == 304
+    create(client, "0x" + "17" * 20)
+    after = client.get("/invoices", params={"limit": 1}, headers={"If-None-Match": before})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != before
+
+
+def test_summary_leaves_out_lapsed_invoices(client):
+    wallet = "0x" + "28" * 20
+    kept, lapsed = create(client, wallet, "2"), create(client, wallet, "3")
+    summary = client.get(f"/wallets/{wallet}/summary")
+    assert summary.json()["totals"]["pendingAmount"] == "5"
+
+    p = get_placeholder()
+    with get_db() as conn:
+        get_cursor(conn).execute(
+            f"UPDATE invoices SET expires_at = {p} WHERE id = {p}",
+            ("2000-01-01T00:00:00.000000Z", lapsed["id"]),
+        )
+        conn.commit()
+
+    # Not swept yet: nothing bumped the version, yet the totals (and ETag) change
+    res = client.get(f"/wallets/{wallet}/summary", headers={"If-None-Match": summary.headers["ETag"]})
+    assert res.status_code == 200
+    body = res.json()
+    assert body["totals"]["pendingCount"] == 1
+    assert body["totals"]["pendingAmount"] == "2"
+    assert body["tokens"][0]["pendingAmount"] == "2"
+    assert sum(d["pendingCount"] for d in body["days"]) == 1
@@ -0,0 +1,12 @@
+from ratelimit import DatabaseBackend, Limit, MemoryBackend, RateLimiter
+
+
+def test_denied_requests_are_not_counted():
+    for backend in (MemoryBackend(), DatabaseBackend()):
+        limiter = RateLimiter(backend)
+        route, ip = Limit(2, 60), Limit(3, 60)
+        # The tight route limit denies after two; the IP bucket keeps its third slot
+        rules = [(f"ip:{id(backend)}", ip), (f"route:{id(backend)}", route)]
+        assert [limiter.check(rules)[0] for _ in range(4)] == [True, True, False, False]
+        assert limiter.check([(f"ip:{id(backend)}", ip)])[0]
+        assert not limiter.check([(f"ip:{id(backend)}", ip)])[0]
@@ -0,0 +1,40 @@
+import sqlite3
+
+import pytest
+
+import archive
+from config import DB_PATH, DATABASE_URL
+from database import get_db, get_cursor, get_placeholder
+
+MERCHANT = "0x" + "5c" * 20
+PAYER = "0x" + "6d" * 20
+TOKEN = "0x" + "20" * 20
+
+
+def search(client, wallet, q):
+    return [i["memo"] for i in client.get("/invoices/search", params={"wallet": wallet, "q": q}).json()["items"]]
+
+
+@pytest.mark.skipif(bool(DATABASE_URL), reason="SQLite FTS5 index")
+def test_search_index_follows_writes_archiving_and_vacuum(client):
+    headers = {"X-Wallet-Address": MERCHANT}
+    ids = [
+        client.post("/invoices", json={"merchantAddress": MERCHANT, "amount": "1", "tokenAddress": TOKEN, "memo": memo}, headers=headers).json()["id"]
+        for memo in ("espresso beans", "espresso cups", "rent")
+    ]
+    # Paying sets payer_address, which is indexed too (update trigger)
+    client.post(f"/invoices/{ids[0]}/pay", json={"txHash": "0x" + "9e" * 32, "payerAddress": PAYER}, headers=headers)
+    assert search(client, PAYER, "espresso") == ["espresso beans"]
+
+    client.delete(f"/invoices/{ids[1]}", headers=headers)
+    p = get_placeholder()
+    with get_db() as conn:
+        get_cursor(conn).execute(f"UPDATE invoices SET created_at = {p} WHERE id = {p}", ("2000-01-01T00:00:00.000000Z", ids[0]))
+        conn.commit()
+    assert archive.archive_settled(days=1) >= 1
+
+    db = sqlite3.connect(DB_PATH)
+    db.execute("VACUUM")
+    db.close()
+    assert search(client, MERCHANT, "espresso") == ["espresso beans"]
+    assert search(client, MERCHANT, "rent") == ["rent"]
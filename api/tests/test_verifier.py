@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import verifier
+from database import get_db, get_cursor, get_placeholder
+
+MERCHANT = "0x" + "3a" * 20
+PAYER = "0x" + "4b" * 20
+TOKEN = "0x" + "20" * 20
+TX_HASH = "0x" + "ab" * 32
+
+
+class FakeRPC:
+    """httpx.AsyncClient stand-in answering eth_getTransactionReceipt case-insensitively."""
+
+    def __init__(self, receipts: dict):
+        self.receipts = {k.lower(): v for k, v in receipts.items()}
+
+    async def post(self, url, content, headers):
+        results = [
+            {"jsonrpc": "2.0", "id": call["id"], "result": self.receipts.get(call["params"][0].lower())}
+            for call in json.loads(content)
+        ]
+        return FakeResponse(results)
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+def transfer_receipt(value: int) -> dict:
+    return {
+        "status": "0x1",
+        "logs": [{
+            "address": TOKEN,
+            "topics": [verifier.TRANSFER_TOPIC, "0x" + PAYER[2:].rjust(64, "0"), "0x" + MERCHANT[2:].rjust(64, "0")],
+            "data": hex(value),
+        }],
+    }
+
+
+def test_hash_case_variants_settle_one_invoice(client):
+    headers = {"X-Wallet-Address": MERCHANT}
+    invoices = [
+        client.post("/invoices", json={"merchantAddress": MERCHANT, "amount": "1", "tokenAddress": TOKEN}, headers=headers).json()
+        for _ in range(2)
+    ]
+    for invoice, tx_hash in zip(invoices, (TX_HASH.upper().replace("0X", "0x"), TX_HASH)):
+        res = client.post(f"/invoices/{invoice['id']}/pay", json={"txHash": tx_hash, "payerAddress": PAYER}, headers=headers)
+        assert res.status_code == 200, res.text
+        assert res.json()["tempoTxHash"] == TX_HASH
+
+    p = get_placeholder()
+    with get_db() as conn:
+        get_cursor(conn).execute(
+            f"UPDATE invoices SET verification = 'QUEUED' WHERE id IN ({p}, {p})", tuple(i["id"] for i in invoices)
+        )
+        conn.commit()
+
+    asyncio.run(verifier.verify_batch(FakeRPC({TX_HASH: transfer_receipt(1_000_000)})))
+    states = sorted((i["status"], i["verification"]) for i in (client.get(f"/invoices/{x['id']}").json() for x in invoices))
+    assert states == [("PAID", "VERIFIED"), ("PENDING", "REJECTED")]
+
+
+def test_invalid_hash_is_rejected(client):
+    headers = {"X-Wallet-Address": MERCHANT}
+    invoice = client.post("/invoices", json={"merchantAddress": MERCHANT, "amount": "1", "tokenAddress": TOKEN}, headers=headers).json()
+    res = client.post(f"/invoices/{invoice['id']}/pay", json={"txHash": "0xabc"}, headers=headers)
+    assert res.status_code == 400
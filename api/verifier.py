@@ -0,0 +1,249 @@
+"""
+On-chain payment verification.
+
+`POST /invoices/{id}/pay` records the client's txHash and payerAddress as
+claimed. With VERIFY_PAYMENTS the invoice is queued (verification =
+QUEUED), and this worker checks each claim against TEMPO_RPC_URL. A payment
+is VERIFIED once its receipt shows a successful transaction with a token
+Transfer of at least the invoice amount to the merchant (from the payer, if
+one was given) that no other invoice has already been settled with.
+Otherwise it is REJECTED and the invoice goes back to PENDING. Hashes that
+have not been mined yet are retried, until VERIFY_TIMEOUT after payment.
+
+Each round leases up to VERIFY_BATCH_SIZE queued invoices and looks their
+receipts up with batched JSON-RPC (VERIFY_RPC_BATCH eth_getTransactionReceipt
+calls per HTTP request, VERIFY_CONCURRENCY requests in flight over one
+keep-alive connection pool). It then settles the whole batch in one
+transaction. Receipts of mined transactions are final, so they are cached.
+
+The worker runs in-process every VERIFY_INTERVAL seconds (started from the
+app lifespan) or as a one-shot for cron / serverless deployments:
+
+    python verifier.py
+
+benchmarks/stub_rpc.py serves canned receipts for local testing.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from starlette.concurrency import run_in_threadpool
+
+from config import (
+    TEMPO_RPC_URL,
+    VERIFY_BATCH_SIZE,
+    VERIFY_RPC_BATCH,
+    VERIFY_CONCURRENCY,
+    VERIFY_RETRY_DELAY,
+    VERIFY_TIMEOUT,
+    VERIFY_CACHE_SIZE,
+)
+from cache import MemoryCache, MISS
+from database import get_db, get_cursor, utc_timestamp
+from notifier import notifier
+from serializers import dumps
+import metrics
+import repository
+
+# keccak256("Transfer(address,address,uint256)"), emitted by TIP-20 / ERC-20 tokens
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+RPC_TIMEOUT = 10.0
+
+# tx hash -> (succeeded, transfers); only mined receipts are stored
+receipt_cache = MemoryCache(max_entries=VERIFY_CACHE_SIZE, ttl=24 * 3600, negative_ttl=0)
+
+
+def _word(value) -> int:
+    return int(value, 16) if value and value != "0x" else 0
+
+
+def parse_receipt(receipt: dict) -> tuple:
+    """(succeeded, transfers) with transfers as (token, from, to, value) tuples."""
+    transfers = []
+    for log in receipt.get("logs") or ():
+        topics = log.get("topics") or ()
+        if len(topics) == 3 and topics[0].lower() == TRANSFER_TOPIC:
+            sender, recipient = ("0x" + t[-40:].lower() for t in topics[1:])
+            transfers.append((log.get("address", "").lower(), sender, recipient, _word(log.get("data"))))
+    return receipt.get("status") == "0x1", tuple(transfers)
+
+
+def check_payment(row, receipt: tuple, used: set):
+    """
+    None if a transfer in `receipt` settles the invoice in `row`, else the
+    reason it doesn't. Each transfer settles one invoice: matches are recorded
+    in `used` as (lowercased tx hash, log position) and skipped afterwards.
+    """
+    succeeded, transfers = receipt
+    if not succeeded:
+        return "transaction reverted"
+    payer = row["payer_address"]
+    tx_hash = row["tempo_tx_hash"].lower()
+    for position, (token, sender, recipient, value) in enumerate(transfers):
+        if (
+            (tx_hash, position) not in used
+            and token == row["token_address"]
+            and recipient == row["merchant_address"]
+            and value >= row["amount_minor"]
+            and (not payer or sender == payer)
+        ):
+            used.add((tx_hash, position))
+            return None
+    return "no matching transfer"
+
+
+async def fetch_receipts(client, hashes: list) -> tuple:
+    """
+    Look `hashes` up on TEMPO_RPC_URL. Returns (receipts, unavailable): parsed
+    receipts of the mined transactions, and the hashes whose request failed
+    (as opposed to not being mined yet).
+    """
+    receipts, missing, unavailable = {}, [], set()
+    for tx_hash in hashes:
+        cached = receipt_cache.get(tx_hash)
+        if cached is MISS:
+            missing.append(tx_hash)
+        else:
+            receipts[tx_hash] = cached
+    semaphore = asyncio.Semaphore(VERIFY_CONCURRENCY)
+
+    async def fetch(chunk: list):
+        payload = [
+            {"jsonrpc": "2.0", "id": i, "method": "eth_getTransactionReceipt", "params": [tx_hash]}
+            for i, tx_hash in enumerate(chunk)
+        ]
+        async with semaphore:
+            try:
+                response = await client.post(TEMPO_RPC_URL, content=dumps(payload), headers={"Content-Type": "application/json"})
+                response.raise_for_status()
+                results = response.json()
+            except Exception as e:
+                print(f"ERROR: receipt lookup for {len(chunk)} transaction(s) failed: {e}")
+                unavailable.update(chunk)
+                return
+        if not isinstance(results, list):
+            print(f"ERROR: receipt lookup returned {results!r:.200}")
+            unavailable.update(chunk)
+            return
+        answered = set()
+        for item in results:
+            index = item.get("id") if isinstance(item, dict) else None
+            if not isinstance(index, int) or not 0 <= index < len(chunk):
+                continue
+            answered.add(index)
+            if "error" in item:
+                unavailable.add(chunk[index])
+            elif item.get("result"):
+                receipt = receipts[chunk[index]] = parse_receipt(item["result"])
+                receipt_cache.set(chunk[index], receipt)
+        unavailable.update(tx_hash for i, tx_hash in enumerate(chunk) if i not in answered)
+
+    await asyncio.gather(*(fetch(missing[i:i + VERIFY_RPC_BATCH]) for i in range(0, len(missing), VERIFY_RPC_BATCH)))
+    return receipts, unavailable
+
+
+def _hashed(rows) -> list:
+    """Rows as dicts with a lowercased tempo_tx_hash: receipts, the cache and `used` are keyed on that."""
+    return [{**r, "tempo_tx_hash": (r["tempo_tx_hash"] or "").lower()} for r in rows]
+
+
+def _claim(now: datetime) -> tuple:
+    """Lease a batch of queued payments; returns (rows, verified invoices sharing their hashes)."""
+    with get_db() as conn:
+        cursor = get_cursor(conn)
+        rows = repository.claim_unverified(
+            cursor,
+            utc_timestamp(now),
+            utc_timestamp(now + timedelta(seconds=VERIFY_RETRY_DELAY)),
+            VERIFY_BATCH_SIZE,
+        )
+        rows = _hashed(rows)
+        settled = repository.verified_payments(cursor, sorted({r["tempo_tx_hash"] for r in rows if r["tempo_tx_hash"]}))
+        conn.commit()
+    return rows, _hashed(settled)
+
+
+def _record(verified: list, rejected: list) -> list:
+    with get_db() as conn:
+        changed = repository.record_verification(get_cursor(conn), verified, rejected)
+        conn.commit()
+    for invoice_id in changed:
+        notifier.publish(invoice_id)
+    return changed
+
+
+async def verify_batch(client) -> int:
+    """Check one leased batch of queued payments. Returns how many were claimed."""
+    now = datetime.utcnow()
+    rows, settled = await run_in_threadpool(_claim, now)
+    if not rows:
+        return 0
+    receipts, unavailable = await fetch_receipts(client, sorted({r["tempo_tx_hash"] for r in rows if r["tempo_tx_hash"]}))
+
+    # Transfers already credited to verified invoices can't settle another one
+    used = set()
+    for row in settled:
+        if row["tempo_tx_hash"] in receipts:
+            check_payment(row, receipts[row["tempo_tx_hash"]], used)
+
+    deadline = utc_timestamp(now - timedelta(seconds=VERIFY_TIMEOUT))
+    verified, rejected = [], []
+    for row in rows:
+        tx_hash = row["tempo_tx_hash"]
+        if tx_hash in receipts:
+            reason = check_payment(row, receipts[tx_hash], used)
+        elif not tx_hash:
+            reason = "no transaction hash"
+        elif tx_hash not in unavailable and (row["paid_at"] or "") <= deadline:
+            reason = "transaction not found"
+        else:
+            metrics.verifications.inc("retry")  # not mined yet, or the RPC failed: the lease expires into a retry
+            continue
+        if reason is None:
+            verified.append(row)
+        else:
+            print(f"Payment for invoice {row['id']} rejected: {reason}")
+            rejected.append(row)
+
+    if verified or rejected:
+        await run_in_threadpool(_record, verified, rejected)
+    for outcome, settled in (("verified", verified), ("rejected", rejected)):
+        for _ in settled:
+            metrics.verifications.inc(outcome)
+    return len(rows)
+
+
+def http_client():
+    import httpx
+
+    limits = httpx.Limits(max_connections=VERIFY_CONCURRENCY, max_keepalive_connections=VERIFY_CONCURRENCY)
+    return httpx.AsyncClient(limits=limits, timeout=RPC_TIMEOUT)
+
+
+async def verify_pending(client) -> int:
+    """Work through every payment due for a check. Returns how many were checked."""
+    total = 0
+    while True:
+        claimed = await verify_batch(client)
+        total += claimed
+        if claimed < VERIFY_BATCH_SIZE:
+            return total
+
+
+async def run_verifier(interval: float):
+    """Verify queued payments every `interval` seconds until cancelled."""
+    async with http_client() as client:
+        while True:
+            try:
+                await verify_pending(client)
+            except Exception as e:
+                print(f"ERROR: payment verification failed: {e}")
+            await asyncio.sleep(interval)
+
+
+async def _main():
+    async with http_client() as client:
+        print(f"Checked {await verify_pending(client)} payment(s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -15,7 +15,7 @@ export function isValidAddress(addr: string): boolean {
  * Defaulting to '/api' allows the frontend and backend to work together 
  * automatically when deployed as a single Vercel project.
  */
-const API_BASE_URL = import.meta.env.VITE_API_URL || '/api';
+export const API_BASE_URL = import.meta.env.VITE_API_URL || '/api';
 
 if (!import.meta.env.VITE_API_URL && import.meta.env.PROD) {
   console.info("[api] project is using relative '/api' path. ensure your deployment routes /api to the backend.");
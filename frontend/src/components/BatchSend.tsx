@@ -5,7 +5,7 @@ import { parseUnits, encodeFunctionData } from 'viem';
 import { Abis } from 'viem/tempo';
 import axios from 'axios';
 import { toast } from 'react-hot-toast';
-import { isValidAddress } from '../api';
+import { isValidAddress, authAxios } from '../api';
 
 
 interface Recipient {
@@ -236,6 +236,21 @@ export default function BatchSend() {
       if (receipt.status === 'success') {
         setBatchStatus('confirmed');
         toast.success(`batch confirmed! ${validRecipients.length} transfers in 1 tx`);
+        // Record every payout as a paid invoice in a single backend request
+        try {
+          await authAxios(address).post('/invoices/bulk', {
+            invoices: validRecipients.map(r => ({
+              merchantAddress: r.address,
+              amount: parseFloat(r.amount),
+              tokenAddress: TOKEN_ADDRESS,
+              memo: r.memo || `sent $${r.amount}`,
+              txHash: hash,
+              payerAddress: address,
+            })),
+          });
+        } catch {
+          // on-chain succeeded, backend logging failed. not critical.
+        }
       } else {
         setBatchStatus('failed');
         toast.error('batch reverted — all transfers rolled back');
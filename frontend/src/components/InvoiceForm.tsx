@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Send, Loader2, Mail, Phone, Wallet, Link2 } from 'lucide-react';
 
 import { useAccount, useWalletClient, useSwitchChain, usePublicClient } from 'wagmi';
@@ -30,6 +30,8 @@ const InvoiceForm: React.FC<InvoiceFormProps> = ({ onCreated, prefillAddress })
   const [lookupValue, setLookupValue] = useState('');
   const [resolvedName, setResolvedName] = useState('');
   const [contacts, setContacts] = useState<{name: string, address: string}[]>([]);
+  const [suggestions, setSuggestions] = useState<{id: string, name: string, address: string, email: string, phone: string}[]>([]);
+  const pickedSuggestion = useRef(false);
   const [txHash, setTxHash] = useState('');
   const [recipientAddress, setRecipientAddress] = useState(prefillAddress || '');
   const [amount, setAmount] = useState('');
@@ -51,6 +53,33 @@ const InvoiceForm: React.FC<InvoiceFormProps> = ({ onCreated, prefillAddress })
       .catch(() => {});
   }, [address]);
 
+  // Type-ahead: contacts whose name or email starts with what was typed
+  useEffect(() => {
+    if (pickedSuggestion.current) {
+      pickedSuggestion.current = false;
+      return;
+    }
+    if (!address || recipientMode === 'wallet' || lookupValue.trim().length < 2) {
+      setSuggestions([]);
+      return;
+    }
+    const timer = setTimeout(() => {
+      const params = new URLSearchParams({ wallet: address, q: lookupValue, limit: '5' });
+      baseApi.get(`/contacts/search?${params.toString()}`)
+        .then(r => setSuggestions((r.data.items || []).filter((c: any) => recipientMode === 'email' ? c.email : c.phone)))
+        .catch(() => setSuggestions([]));
+    }, 150);
+    return () => clearTimeout(timer);
+  }, [address, recipientMode, lookupValue]);
+
+  const pickSuggestion = (c: {id: string, name: string, address: string, email: string, phone: string}) => {
+    pickedSuggestion.current = true;
+    setLookupValue(recipientMode === 'email' ? c.email : c.phone);
+    setRecipientAddress(c.address);
+    setResolvedName(c.name);
+    setSuggestions([]);
+  };
+
   const handleLookup = async () => {
     if (!address || !lookupValue) return;
     setLookingUp(true);
@@ -131,19 +160,18 @@ const InvoiceForm: React.FC<InvoiceFormProps> = ({ onCreated, prefillAddress })
 
       if (receipt.status === 'success') {
         toast.success(`sent $${amount} successfully!`);
-        // Also record this as a paid invoice in the backend
+        // Also record this as a paid invoice in the backend (create + pay in one request)
         try {
-          const api = authAxios(address);
-          const inv = await api.post('/invoices', {
-            merchantAddress: recipientAddress,
-            amount: parseFloat(amount),
-            tokenAddress,
-            memo: memo || `sent $${amount}`,
-            customerEmail: '',
-          });
-          await api.post(`/invoices/${inv.data.id}/pay`, {
-            txHash: hash,
-            payerAddress: address,
+          await authAxios(address).post('/invoices/bulk', {
+            invoices: [{
+              merchantAddress: recipientAddress,
+              amount: parseFloat(amount),
+              tokenAddress,
+              memo: memo || `sent $${amount}`,
+              customerEmail: '',
+              txHash: hash,
+              payerAddress: address,
+            }],
           });
         } catch {
           // on-chain succeeded, backend logging failed. not critical.
@@ -356,6 +384,26 @@ const InvoiceForm: React.FC<InvoiceFormProps> = ({ onCreated, prefillAddress })
                     {lookingUp ? <Loader2 className="animate-spin" size={16} /> : 'lookup'}
                   </button>
                 </div>
+                {suggestions.length > 0 && (
+                  <div style={{
+                    marginTop: '0.3rem', border: '1px solid var(--border)', borderRadius: '0.5rem',
+                    overflow: 'hidden', fontSize: '0.8rem'
+                  }}>
+                    {suggestions.map(c => (
+                      <button
+                        key={c.id}
+                        type="button"
+                        onClick={() => pickSuggestion(c)}
+                        style={{
+                          display: 'block', width: '100%', textAlign: 'left', padding: '0.4rem 0.75rem',
+                          background: 'transparent', border: 'none', color: 'var(--fg)', cursor: 'pointer'
+                        }}
+                      >
+                        {c.name} <span style={{ color: 'var(--fg-secondary)' }}>{recipientMode === 'email' ? c.email : c.phone}</span>
+                      </button>
+                    ))}
+                  </div>
+                )}
                 {resolvedName && (
                   <div style={{
                     marginTop: '0.5rem', padding: '0.5rem 0.75rem',
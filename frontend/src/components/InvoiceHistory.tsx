@@ -17,21 +17,36 @@ interface InvoiceHistoryProps {
   onSelect: (id: string) => void;
 }
 
+const PAGE_SIZE = 50;
+
 const InvoiceHistory: React.FC<InvoiceHistoryProps> = ({ onSelect }) => {
   const [invoices, setInvoices] = useState<Invoice[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
   const { address } = useAccount();
 
-  const fetchInvoices = async () => {
+  const fetchInvoices = async (cursor?: string) => {
     try {
-      const url = address ? `/invoices?wallet=${address}` : '/invoices';
-      const resp = await baseApi.get(url);
-      setInvoices(resp.data || []);
+      const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+      if (address) params.set('wallet', address);
+      if (cursor) params.set('cursor', cursor);
+      const resp = await baseApi.get(`/invoices?${params.toString()}`);
+      const items: Invoice[] = resp.data?.items || [];
+      setInvoices(prev => (cursor ? [...prev, ...items] : items));
+      setNextCursor(resp.data?.nextCursor || null);
     } catch (err) {
       console.error(err);
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    await fetchInvoices(nextCursor);
+    setLoadingMore(false);
+  };
+
   useEffect(() => {
     fetchInvoices();
   }, [address]);
@@ -121,6 +136,11 @@ const InvoiceHistory: React.FC<InvoiceHistoryProps> = ({ onSelect }) => {
               </div>
             </div>
           ))}
+          {nextCursor && (
+            <button className="btn-secondary" onClick={loadMore} disabled={loadingMore}>
+              {loadingMore ? 'loading...' : 'Load more'}
+            </button>
+          )}
         </div>
       )}
     </div>
@@ -6,7 +6,7 @@ import { parseUnits } from 'viem';
 import { Abis } from 'viem/tempo';
 import { useAccount, useWriteContract, useSwitchChain, usePublicClient } from 'wagmi';
 import { toast } from 'react-hot-toast';
-import { authAxios, baseApi } from '../api';
+import { authAxios, baseApi, API_BASE_URL } from '../api';
 import Receipt from './Receipt';
 
 
@@ -53,13 +53,34 @@ export default function PaymentPage({ invoiceId, onBack }: { invoiceId: string,
     };
 
     fetchInvoice();
-    const interval = setInterval(() => {
-      if (invoice?.status !== 'PAID') {
-        fetchInvoice();
-      }
-    }, 5000);
+    if (invoice?.status === 'PAID') return;
+
+    // Push status updates instead of polling: SSE where available, long-poll otherwise
+    if (typeof EventSource !== 'undefined') {
+      const source = new EventSource(`${API_BASE_URL}/invoices/${invoiceId}/events`);
+      source.addEventListener('status', (e) => {
+        const data = JSON.parse((e as MessageEvent).data);
+        setInvoice(data);
+        if (data.status !== 'PENDING') source.close();
+      });
+      return () => source.close();
+    }
 
-    return () => clearInterval(interval);
+    let cancelled = false;
+    const longPoll = async () => {
+      while (!cancelled) {
+        try {
+          const resp = await baseApi.get(`/invoices/${invoiceId}/wait`, { params: { status: 'PENDING', timeout: 25 } });
+          if (cancelled) return;
+          setInvoice(resp.data);
+          if (resp.data.status !== 'PENDING') return;
+        } catch {
+          await new Promise(r => setTimeout(r, 5000));
+        }
+      }
+    };
+    longPoll();
+    return () => { cancelled = true; };
   }, [invoiceId, invoice?.status]);
 
   if (!invoice) return <div style={{ textAlign: 'center', padding: '3rem' }}>loading invoice...</div>;
@@ -185,6 +206,13 @@ export default function PaymentPage({ invoiceId, onBack }: { invoiceId: string,
             </div>
           )}
         </>
+      ) : invoice.status === 'EXPIRED' ? (
+        <div className="glass-card" style={{ textAlign: 'center' }}>
+          <span className="status-badge status-pending">expired</span>
+          <p style={{ marginTop: '1rem', color: 'var(--fg-secondary)' }}>
+            this invoice has expired and can no longer be paid. ask the merchant for a new one.
+          </p>
+        </div>
       ) : (
         <div style={{ display: 'flex', flexDirection: 'row', flexWrap: 'wrap', gap: '1.5rem' }}>
           <div className="glass-card" style={{ flex: '1 1 300px', textAlign: 'center', display: 'flex', flexDirection: 'column', alignItems: 'center', justifyContent: 'center' }}>